@@ -0,0 +1,144 @@
+"""Operational commands.
+
+Run: python -m app.cli <command> [args]
+
+  migrate             Apply pending schema migrations
+  export DATASET PATH Write curve_data, mtm_history or matches to Arrow (.arrow) or Parquet (.parquet)
+  import-curve PATH --curve CODE
+                      Upsert a Parquet file of curve points into a curve
+  mtm-backfill START END [--snapshot-policy P] [--snapshot-date D]
+                      Rebuild portfolio MTM for every day of a date range
+  positions rebuild   Recompute the contract_positions rollup from raw rows
+  positions check     Compare the rollup against raw rows (exit 1 on drift)
+"""
+
+import argparse
+import sys
+
+from app.database import SessionLocal, Base, engine
+from app.schemas.common import SnapshotPolicy
+import app.models  # noqa: F401 — ensure all models registered before create_all
+
+
+def _migrate(args: argparse.Namespace) -> int:
+    from app.migrations import run_migrations
+
+    applied = run_migrations(engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    return 0
+
+
+def _export(args: argparse.Namespace) -> int:
+    from app.services.columnar_service import export_to_file
+
+    fmt = args.format or ("parquet" if args.path.endswith(".parquet") else "arrow")
+    filters = {"start_date": args.start_date, "end_date": args.end_date}
+    if args.dataset == "curve_data":
+        filters["curve_id"] = args.curve_id
+    elif args.dataset == "mtm_history":
+        filters["contract_id"] = args.contract_id
+    size = export_to_file(engine, args.dataset, fmt, args.path, **filters)
+    print(f"Wrote {size:,} bytes to {args.path}")
+    return 0
+
+
+def _import_curve(args: argparse.Namespace) -> int:
+    from fastapi import HTTPException
+    from app.services.columnar_service import import_curve_parquet
+    from app.services.price_curve_service import get_curve_by_code
+
+    db = SessionLocal()
+    try:
+        curve = get_curve_by_code(db, args.curve)
+        if curve is None:
+            print(f"Unknown curve code: {args.curve}", file=sys.stderr)
+            return 1
+        result = import_curve_parquet(db, curve.id, args.path)
+    except HTTPException as e:
+        print(e.detail, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(f"Upserted {result.rows:,} rows into {args.curve} (sha256 {result.checksum})")
+    return 0
+
+
+def _mtm_backfill(args: argparse.Namespace) -> int:
+    from fastapi import HTTPException
+    from app.services.mtm_service import backfill_mtm
+
+    db = SessionLocal()
+    try:
+        result = backfill_mtm(db, args.start, args.end, args.snapshot_policy, args.snapshot_date)
+    except HTTPException as e:
+        print(e.detail, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(
+        f"Valued {result.contracts} contracts over {len(result.totals)} dates: "
+        f"{result.records_written:,} records written, {result.records_replaced:,} replaced"
+    )
+    return 0
+
+
+def _positions(args: argparse.Namespace) -> int:
+    from app.services.position_service import rebuild_positions, check_positions
+
+    db = SessionLocal()
+    try:
+        if args.action == "rebuild":
+            count = rebuild_positions(db)
+            print(f"Rebuilt positions for {count} contracts")
+            return 0
+        result = check_positions(db)
+        for m in result.mismatches:
+            print(f"  contract {m.contract_id} {m.field}: stored={m.stored} expected={m.expected}")
+        print(f"Checked {result.contracts_checked} contracts, {len(result.mismatches)} mismatches")
+        return 1 if result.mismatches else 0
+    finally:
+        db.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="apply pending schema migrations")
+    migrate.set_defaults(handler=_migrate)
+
+    export = commands.add_parser("export", help="columnar export of a bulk table")
+    export.add_argument("dataset", choices=["curve_data", "mtm_history", "matches"])
+    export.add_argument("path")
+    export.add_argument("--format", choices=["arrow", "parquet"], help="default: from the file suffix")
+    export.add_argument("--start-date")
+    export.add_argument("--end-date")
+    export.add_argument("--curve-id", type=int, help="curve_data only")
+    export.add_argument("--contract-id", type=int, help="mtm_history only")
+    export.set_defaults(handler=_export)
+
+    import_curve = commands.add_parser("import-curve", help="load a Parquet file into curve_data")
+    import_curve.add_argument("path")
+    import_curve.add_argument("--curve", required=True, help="target curve code")
+    import_curve.set_defaults(handler=_import_curve)
+
+    backfill = commands.add_parser("mtm-backfill", help="rebuild MTM history over a date range")
+    backfill.add_argument("start", help="first valuation date (YYYY-MM-DD)")
+    backfill.add_argument("end", help="last valuation date, inclusive")
+    backfill.add_argument(
+        "--snapshot-policy", choices=[p.value for p in SnapshotPolicy], default=SnapshotPolicy.VALUATION_DATE.value,
+    )
+    backfill.add_argument("--snapshot-date", help="FIXED policy only")
+    backfill.set_defaults(handler=_mtm_backfill)
+
+    positions = commands.add_parser("positions", help="contract position rollup")
+    positions.add_argument("action", choices=["rebuild", "check"])
+    positions.set_defaults(handler=_positions)
+
+    args = parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,43 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./kargo.db"
     DEBUG: bool = True
 
+    # PostgreSQL connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_STATEMENT_TIMEOUT_MS: int = 60000  # 0 disables
+
+    # SQLite
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Long valuations (MTM runs, value-all-positions) run on their own pool
+    VALUATION_WORKERS: int = 2
+    VALUATION_QUEUE: int = 8  # further requests wait; beyond this they get 503
+
+    # Portfolio MTM partitions loaded and valued on worker processes (0 or 1 = serial)
+    MTM_PARALLEL_WORKERS: int = 0
+    MTM_PARALLEL_MIN_CONTRACTS: int = 5000  # smaller books stay serial: process overhead outweighs the gain
+    MTM_BACKFILL_MAX_DAYS: int = 3660  # longest valuation date range one backfill may cover
+    SCENARIO_MAX: int = 1000  # most what-if scenarios one /scenarios/run call may evaluate
+
+    # Background jobs (/api/v1/jobs)
+    JOB_WORKERS: int = 2
+    JOB_EXECUTOR: str = "process"  # "process" pool, or "thread" to run in the API process
+    JOB_HEARTBEAT_SECONDS: float = 15  # how often a running job records it is alive
+    JOB_STALE_SECONDS: float = 60  # a RUNNING job silent this long at startup was abandoned
+
+    # Query-count and latency instrumentation, served at /metrics
+    METRICS_ENABLED: bool = True
+
+    # List endpoints (keyset pagination)
+    PAGE_SIZE_DEFAULT: int = 200
+    PAGE_SIZE_MAX: int = 1000
+
+    # Streaming curve ingestion
+    CURVE_INGEST_BATCH_SIZE: int = 5000  # rows per upsert statement batch
+    CURVE_INGEST_SPOOL_BYTES: int = 8 * 1024 * 1024  # request body kept in memory up to this size
+
     model_config = {"env_prefix": "KARGO_"}
 
 
@@ -1,24 +1,106 @@
+"""Engine and session setup.
+
+The backend is chosen from KARGO_DATABASE_URL:
+
+  sqlite:///./kargo.db                          file database, WAL journal
+  postgresql+psycopg://user:pw@host/kargo       pooled PostgreSQL
+
+Async routes use a second engine on the same database through its async
+driver (aiosqlite, or psycopg's async mode).
+"""
+
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import StaticPool
 
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=settings.DEBUG,
-)
+# Async drivers used for the same database by the async session layer
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+psycopg"}
+
+
+def _sqlite_in_memory(url: URL) -> bool:
+    return url.database in (None, "", ":memory:")
+
+
+def _sqlite_kwargs(url: URL) -> dict:
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if _sqlite_in_memory(url):
+        # One shared connection, otherwise each thread would see its own empty database
+        kwargs["poolclass"] = StaticPool
+    return kwargs
+
+
+def _set_sqlite_pragmas(engine: Engine, in_memory: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if not in_memory:
+            # WAL lets readers proceed while a writer (e.g. an MTM run) holds the lock
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 
+def _postgres_kwargs() -> dict:
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "connect_args": connect_args,
+    }
 
-@event.listens_for(engine, "connect")
-def _set_sqlite_pragma(dbapi_conn, connection_record):
-    cursor = dbapi_conn.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
 
+def build_engine(database_url: str, echo: bool = False) -> Engine:
+    """Create an engine tuned for the backend named in database_url."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        engine = create_engine(url, echo=echo, **_sqlite_kwargs(url))
+        _set_sqlite_pragmas(engine, _sqlite_in_memory(url))
+        return engine
+    if backend == "postgresql":
+        return create_engine(url, echo=echo, **_postgres_kwargs())
+    return create_engine(url, pool_pre_ping=True, echo=echo)
+
+
+def async_url(database_url: str) -> URL:
+    """The same database addressed through its async driver (aiosqlite / psycopg async)."""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=driver)
+
+
+def build_async_engine(database_url: str, echo: bool = False) -> AsyncEngine:
+    """Async counterpart of build_engine, with the same pool and pragma tuning."""
+    url = async_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        engine = create_async_engine(url, echo=echo, **_sqlite_kwargs(url))
+        _set_sqlite_pragmas(engine.sync_engine, _sqlite_in_memory(url))
+        return engine
+    return create_async_engine(url, echo=echo, **_postgres_kwargs())
+
+
+engine = build_engine(settings.DATABASE_URL, echo=settings.DEBUG)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Created lazily: no connection is made until the first async request
+async_engine = build_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -30,3 +112,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """AsyncSession for async routes; sync service code runs on it via run_sync()."""
+    async with AsyncSessionLocal() as db:
+        yield db
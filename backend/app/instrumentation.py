@@ -0,0 +1,284 @@
+"""Per-request and per-service query counts and latency, exported for Prometheus.
+
+Three pieces share one context variable:
+
+- InstrumentationMiddleware opens a scope per HTTP request, tagged with the
+  matched route template, and reports it in response headers
+  (Server-Timing, X-DB-Statements, X-DB-Rows).
+- @instrumented service functions open a nested scope tagged with the
+  function name, e.g. pnl_service.get_pnl_summary.
+- Engine hooks (install) add each statement's count and database time to
+  all open scopes, and count the rows its result hands out through a
+  wrapper around the result's fetch strategy; the DBAPI cursor is left as
+  the driver made it.
+
+Closed scopes are folded into in-process counters and histograms, served in
+the Prometheus text format at /metrics. Statements run outside any scope
+(startup, job workers in other processes) are not counted, so the hooks cost
+a context variable lookup there. Headers are set when the response starts: a
+streamed response reports the work done before its first chunk, the metrics
+all of it.
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Callable, Iterator, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import CursorResult, Engine
+from sqlalchemy.engine.cursor import ResultFetchStrategy
+
+T = TypeVar("T")
+
+# Upper bounds (seconds) of the request and service latency histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+@dataclass(slots=True)
+class Scope:
+    statements: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# Scopes open in the current request/call chain, outermost first
+_scopes: ContextVar[tuple[Scope, ...]] = ContextVar("instrumentation_scopes", default=())
+
+
+@contextmanager
+def _opened() -> Iterator[Scope]:
+    scope = Scope()
+    token = _scopes.set(_scopes.get() + (scope,))
+    try:
+        yield scope
+    finally:
+        _scopes.reset(token)
+
+
+# --- SQL hooks ---
+
+class _RowCountingFetch(ResultFetchStrategy):
+    """Fetch strategy counting the rows a result hands out, around the one SQLAlchemy chose."""
+
+    __slots__ = ("_strategy", "_scopes")
+
+    def __init__(self, strategy: ResultFetchStrategy, scopes: tuple[Scope, ...]):
+        self._strategy = strategy
+        self._scopes = scopes
+
+    @property
+    def alternate_cursor_description(self):
+        return self._strategy.alternate_cursor_description
+
+    def _count(self, n: int) -> None:
+        for scope in self._scopes:
+            scope.rows += n
+
+    def fetchone(self, result, dbapi_cursor, hard_close=False):
+        row = self._strategy.fetchone(result, dbapi_cursor, hard_close)
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, result, dbapi_cursor, size=None):
+        rows = self._strategy.fetchmany(result, dbapi_cursor, size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self, result, dbapi_cursor):
+        rows = self._strategy.fetchall(result, dbapi_cursor)
+        self._count(len(rows))
+        return rows
+
+    def yield_per(self, result, dbapi_cursor, num):
+        self._strategy.yield_per(result, dbapi_cursor, num)
+        if result.cursor_strategy is not self:
+            # Swapped for a buffering strategy: keep counting through it
+            result.cursor_strategy = _RowCountingFetch(result.cursor_strategy, self._scopes)
+
+    def soft_close(self, result, dbapi_cursor):
+        self._strategy.soft_close(result, dbapi_cursor)
+
+    def hard_close(self, result, dbapi_cursor):
+        self._strategy.hard_close(result, dbapi_cursor)
+
+    def handle_exception(self, result, dbapi_cursor, err):
+        self._strategy.handle_exception(result, dbapi_cursor, err)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _scopes.get():
+        conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scopes = _scopes.get()
+    if not scopes:
+        return
+    elapsed = time.perf_counter() - conn.info["query_start"]
+    for scope in scopes:
+        scope.statements += 1
+        scope.db_seconds += elapsed
+
+
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    scopes = _scopes.get()
+    if scopes and isinstance(result, CursorResult) and result.returns_rows:
+        result.cursor_strategy = _RowCountingFetch(result.cursor_strategy, scopes)
+
+
+def install() -> None:
+    """Hook executions on every engine, sync or async, present or future."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "after_execute", _after_execute)
+
+
+# --- Registry ---
+
+@dataclass(slots=True)
+class _Series:
+    count: int = 0
+    seconds: float = 0.0
+    statements: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    buckets: list[int] | None = None
+
+
+_lock = threading.Lock()
+_requests: dict[tuple[str, str, str], _Series] = {}  # (method, route, status)
+_services: dict[tuple[str], _Series] = {}  # (function,)
+
+
+def _record(series: dict, labels: tuple, seconds: float, scope: Scope) -> None:
+    with _lock:
+        s = series.get(labels)
+        if s is None:
+            s = series[labels] = _Series(buckets=[0] * len(BUCKETS))
+        s.count += 1
+        s.seconds += seconds
+        s.statements += scope.statements
+        s.db_seconds += scope.db_seconds
+        s.rows += scope.rows
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                s.buckets[i] += 1
+
+
+def clear() -> None:
+    """Drop every recorded series (tests)."""
+    with _lock:
+        _requests.clear()
+        _services.clear()
+
+
+def instrumented(fn: Callable[..., T]) -> Callable[..., T]:
+    """Record calls of a service function under <module>.<name>."""
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _opened() as scope:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(_services, (name,), scope.seconds, scope)
+
+    return wrapper
+
+
+# --- HTTP ---
+
+def _route_template(scope: dict) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one series rather than one per URL
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _headers(scope: Scope) -> list[tuple[bytes, bytes]]:
+    return [
+        (b"server-timing", f"db;dur={scope.db_seconds * 1000:.2f}, app;dur={scope.seconds * 1000:.2f}".encode()),
+        (b"x-db-statements", str(scope.statements).encode()),
+        (b"x-db-rows", str(scope.rows).encode()),
+    ]
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware opening an instrumentation scope per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        with _opened() as request:
+            async def send_with_headers(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message["headers"] = [*message.get("headers", ()), *_headers(request)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                _record(_requests, (scope["method"], _route_template(scope), str(status)), request.seconds, request)
+
+
+# --- Exposition ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _family(out: list[str], prefix: str, what: str, names: tuple[str, ...], series: dict) -> None:
+    counters = [
+        ("total", f"Number of {what}", "count"),
+        ("db_statements_total", f"SQL statements executed by {what}", "statements"),
+        ("db_seconds_total", f"Time {what} spent executing SQL", "db_seconds"),
+        ("db_rows_total", f"Rows {what} fetched from the database", "rows"),
+    ]
+    for suffix, help_text, attr in counters:
+        out.append(f"# HELP {prefix}_{suffix} {help_text}.")
+        out.append(f"# TYPE {prefix}_{suffix} counter")
+        for labels, s in series.items():
+            out.append(f"{prefix}_{suffix}{_labels(names, labels)} {getattr(s, attr)}")
+    hist = f"{prefix}_duration_seconds"
+    out.append(f"# HELP {hist} Wall time of {what}.")
+    out.append(f"# TYPE {hist} histogram")
+    for labels, s in series.items():
+        for bound, n in zip(BUCKETS, s.buckets):
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            out.append(f"{hist}_bucket{_labels(names, labels, le=le)} {n}")
+        out.append(f"{hist}_sum{_labels(names, labels)} {s.seconds}")
+        out.append(f"{hist}_count{_labels(names, labels)} {s.count}")
+
+
+def render_metrics() -> str:
+    """Every series in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        requests = {k: replace(v, buckets=list(v.buckets)) for k, v in _requests.items()}
+        services = {k: replace(v, buckets=list(v.buckets)) for k, v in _services.items()}
+    out: list[str] = []
+    _family(out, "kargo_http_requests", "HTTP requests", ("method", "route", "status"), requests)
+    _family(out, "kargo_service_calls", "service calls", ("function",), services)
+    return "\n".join(out) + "\n"
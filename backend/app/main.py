@@ -1,17 +1,31 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
 
+from app import instrumentation
 from app.config import settings
-from app.database import Base, engine
+from app.database import Base, async_engine, engine, get_db
+from app.migrations import run_migrations
+from app.schemas.position import PositionCheckResult
+from app.services import (
+    curve_cache, formula_cache, job_runner, mtm_compute, position_service, result_cache, valuation_executor,
+)
 import app.models  # noqa: F401 — ensure all models registered before create_all
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    job_runner.requeue_pending(engine)
     yield
+    job_runner.shutdown()
+    valuation_executor.shutdown()
+    mtm_compute.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -26,12 +40,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Statements", "X-DB-Rows", "ETag", "X-Next-Cursor"],
 )
 
+result_cache.install()
+
+if settings.METRICS_ENABLED:
+    instrumentation.install()
+    app.add_middleware(instrumentation.InstrumentationMiddleware)
+
 
 from app.routes import (
     price_curves, pricing_formulas, contracts, shipments, assays,
-    mtm, exposure, matching, pnl, dashboard,
+    mtm, exposure, matching, pnl, dashboard, jobs, scenarios,
 )
 
 app.include_router(price_curves.router)
@@ -44,6 +65,8 @@ app.include_router(exposure.router)
 app.include_router(matching.router)
 app.include_router(pnl.router)
 app.include_router(dashboard.router)
+app.include_router(jobs.router)
+app.include_router(scenarios.router)
 
 
 @app.get("/health")
@@ -51,6 +74,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Admin"])
+def metrics():
+    """Request and service-call statement counts, DB time, rows and latency (Prometheus format)."""
+    return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/seed", tags=["Admin"])
 def seed_database():
     from app.seed.seed_data import seed
@@ -58,9 +87,27 @@ def seed_database():
     return {"status": "seeded"}
 
 
+@app.post("/positions/rebuild", tags=["Admin"])
+def rebuild_positions(db: Session = Depends(get_db)):
+    """Recompute the contract position rollup from raw shipment rows."""
+    return {"contracts": position_service.rebuild_positions(db)}
+
+
+@app.get("/positions/check", response_model=PositionCheckResult, tags=["Admin"])
+def check_positions(db: Session = Depends(get_db)):
+    """Compare the contract position rollup against raw shipment rows."""
+    return position_service.check_positions(db)
+
+
 @app.post("/clear", tags=["Admin"])
-def clear_database():
+def clear_database(db: Session = Depends(get_db)):
     """Drop all tables and recreate them (full reset)."""
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    bind = db.get_bind()
+    db.close()  # hand its connection back before the schema is dropped
+    Base.metadata.drop_all(bind=bind)
+    Base.metadata.create_all(bind=bind)
+    run_migrations(bind)
+    curve_cache.clear()
+    formula_cache.clear()
+    result_cache.clear()
     return {"status": "cleared"}
@@ -0,0 +1,141 @@
+"""Forward-only schema migrations for existing databases.
+
+create_all() builds a new database at the latest schema but never alters a
+table that already exists. Each migration below brings an older database
+forward and is recorded in schema_migrations once applied. Migrations are
+written to be idempotent, so running them on a freshly created database is
+harmless.
+
+Run: python -m app.cli migrate   (also runs at application startup)
+"""
+
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Column, Integer, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import Base
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", String, nullable=False),
+)
+
+
+def _create_model_indexes(conn: Connection, *table_names: str) -> None:
+    """Create any index declared on the models that the database lacks.
+
+    Indexes on columns a later migration adds are left to that migration.
+    """
+    inspector = inspect(conn)
+    for name in table_names:
+        existing = {c["name"] for c in inspector.get_columns(name)}
+        for index in Base.metadata.tables[name].indexes:
+            if all(c.name in existing for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def _0001_hot_path_indexes(conn: Connection) -> None:
+    _create_model_indexes(conn, "curve_data", "shipments", "mtm_history", "matches")
+
+
+# (table, column) pairs stored as ISO-8601 strings before they became DATE
+DATE_COLUMNS = [
+    ("curve_data", "price_date"),
+    ("curve_data", "snapshot_date"),
+    ("contracts", "delivery_start"),
+    ("contracts", "delivery_end"),
+    ("shipments", "bl_date"),
+    ("mtm_history", "valuation_date"),
+    ("matches", "match_date"),
+]
+
+
+def _0002_native_date_columns(conn: Connection) -> None:
+    # SQLite has no column types to change: DATE values are the same
+    # 'YYYY-MM-DD' text the string columns already held.
+    if conn.dialect.name != "postgresql":
+        return
+    inspector = inspect(conn)
+    for table, column in DATE_COLUMNS:
+        types = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+        if type(types[column]).__name__.upper() != "DATE":
+            conn.execute(text(
+                f'ALTER TABLE {table} ALTER COLUMN {column} TYPE DATE USING {column}::date'
+            ))
+
+
+def _0003_listing_indexes(conn: Connection) -> None:
+    _create_model_indexes(conn, "contracts", "mtm_history")
+
+
+def _0004_mtm_snapshot_key(conn: Connection) -> None:
+    # Older databases appended a record per run, with no snapshot_date.
+    # Pre-existing rows are keyed on their valuation date (the default
+    # snapshot) and only the newest run per key is kept.
+    columns = {c["name"] for c in inspect(conn).get_columns("mtm_history")}
+    if "snapshot_date" not in columns:
+        conn.execute(text("ALTER TABLE mtm_history ADD COLUMN snapshot_date DATE"))
+        conn.execute(text("UPDATE mtm_history SET snapshot_date = valuation_date"))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE mtm_history ALTER COLUMN snapshot_date SET NOT NULL"))
+    conn.execute(text(
+        "DELETE FROM mtm_history WHERE id NOT IN ("
+        " SELECT MAX(id) FROM mtm_history GROUP BY contract_id, valuation_date, snapshot_date)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_mtm_history_contract_date"))
+    _create_model_indexes(conn, "mtm_history")
+
+
+def _0005_latest_mtm(conn: Connection) -> None:
+    # Fill the latest-record projection from the history already written
+    Base.metadata.tables["latest_mtm"].create(conn, checkfirst=True)
+    conn.execute(text("DELETE FROM latest_mtm"))
+    conn.execute(text(
+        "INSERT INTO latest_mtm (contract_id, valuation_date, snapshot_date, curve_price,"
+        " contract_price, open_quantity, direction, mtm_value)"
+        " SELECT contract_id, valuation_date, snapshot_date, curve_price,"
+        " contract_price, open_quantity, direction, mtm_value FROM ("
+        "  SELECT m.*, ROW_NUMBER() OVER (PARTITION BY contract_id"
+        "   ORDER BY valuation_date DESC, snapshot_date DESC) AS rank FROM mtm_history m"
+        " ) ranked WHERE rank = 1 AND contract_id IN (SELECT id FROM contracts)"
+    ))
+
+
+def _0006_job_heartbeat(conn: Connection) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns("jobs")}
+    if "heartbeat_at" not in columns:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at VARCHAR"))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "hot_path_indexes", _0001_hot_path_indexes),
+    (2, "native_date_columns", _0002_native_date_columns),
+    (3, "listing_indexes", _0003_listing_indexes),
+    (4, "mtm_snapshot_key", _0004_mtm_snapshot_key),
+    (5, "latest_mtm", _0005_latest_mtm),
+    (6, "job_heartbeat", _0006_job_heartbeat),
+]
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Apply pending migrations in order. Returns the versions applied."""
+    applied_now = []
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.now(timezone.utc).isoformat(),
+            ))
+            applied_now.append(version)
+    return applied_now
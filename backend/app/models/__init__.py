@@ -3,8 +3,10 @@ from app.models.pricing_formula import PricingFormula, FormulaAdjustment
 from app.models.contract import Contract
 from app.models.shipment import Shipment
 from app.models.assay import Assay
-from app.models.mtm import MtmRecord
-from app.models.match import Match
+from app.models.mtm import MtmRecord, LatestMtm
+from app.models.match import Match, MatchingInput
+from app.models.position import ContractPosition
+from app.models.job import Job
 
 __all__ = [
     "PriceCurve",
@@ -15,5 +17,9 @@ __all__ = [
     "Shipment",
     "Assay",
     "MtmRecord",
+    "LatestMtm",
     "Match",
+    "MatchingInput",
+    "ContractPosition",
+    "Job",
 ]
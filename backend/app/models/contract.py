@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import ISODate
 
 
 class Contract(Base):
@@ -15,8 +16,8 @@ class Contract(Base):
     quantity = Column(Float, nullable=False)  # MT
     uom = Column(String, nullable=False, default="DMT")
     incoterm = Column(String, nullable=False, default="CFR")
-    delivery_start = Column(String, nullable=False)  # ISO date
-    delivery_end = Column(String, nullable=False)
+    delivery_start = Column(ISODate, nullable=False)
+    delivery_end = Column(ISODate, nullable=False)
     status = Column(String, nullable=False, default="OPEN")  # OPEN, EXECUTED, CLOSED, CANCELLED
 
     # QP convention
@@ -37,4 +38,6 @@ class Contract(Base):
             "qp_convention IN ('MONTH_OF_BL', 'MONTH_PRIOR_BL', 'MONTH_AFTER_BL', 'CUSTOM')",
             name="ck_qp_convention",
         ),
+        # Keyset order for contract listings
+        Index("ix_contracts_delivery_start", "delivery_start", "id"),
     )
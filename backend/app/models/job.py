@@ -0,0 +1,39 @@
+from sqlalchemy import Boolean, CheckConstraint, Column, Index, Integer, JSON, String, Text
+
+from app.database import Base
+
+
+class Job(Base):
+    """A background run of a long service call (MTM, revaluation, FIFO matching).
+
+    Written by job_service; executed out of the request by job_runner.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # see job_service.JOB_KINDS
+    status = Column(String, nullable=False, default="QUEUED")  # QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+    params = Column(JSON, nullable=False, default=dict)
+    idempotency_key = Column(String, unique=True, nullable=True)
+
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)  # unknown until the run has loaded its inputs
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # ISO-8601 UTC timestamps
+    created_at = Column(String, nullable=False)
+    started_at = Column(String, nullable=True)
+    heartbeat_at = Column(String, nullable=True)  # refreshed by the worker while RUNNING
+    finished_at = Column(String, nullable=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', 'CANCELLED')",
+            name="ck_job_status",
+        ),
+        Index("ix_jobs_status", "status", "id"),
+    )
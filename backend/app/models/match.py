@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index, String
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import ISODate
 
 
 class Match(Base):
@@ -14,7 +15,29 @@ class Match(Base):
     buy_price = Column(Float, nullable=True)
     sell_price = Column(Float, nullable=True)
     realized_pnl = Column(Float, nullable=True)
-    match_date = Column(String, nullable=False)  # ISO date
+    match_date = Column(ISODate, nullable=False)
 
     buy_contract = relationship("Contract", foreign_keys=[buy_contract_id])
     sell_contract = relationship("Contract", foreign_keys=[sell_contract_id])
+
+    __table_args__ = (
+        Index("ix_matches_buy_contract", "buy_contract_id"),
+        Index("ix_matches_sell_contract", "sell_contract_id"),
+    )
+
+
+class MatchingInput(Base):
+    """A contract's FIFO inputs as of the last matching run.
+
+    Written by matching_service; an incremental run compares the book
+    against these rows to find where matching has to resume.
+    """
+
+    __tablename__ = "matching_inputs"
+
+    # No foreign key: a deleted contract has to remain visible as a change
+    contract_id = Column(Integer, primary_key=True)
+    direction = Column(String, nullable=False)
+    delivery_start = Column(ISODate, nullable=False)
+    quantity = Column(Float, nullable=False)
+    price = Column(Float, nullable=True)  # weighted-average shipment price
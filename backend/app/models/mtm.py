@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import ISODate
 
 
 class MtmRecord(Base):
@@ -9,7 +10,11 @@ class MtmRecord(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False)
-    valuation_date = Column(String, nullable=False)  # ISO date
+    valuation_date = Column(ISODate, nullable=False)
+    # Curve snapshot the run was asked for; defaults to the valuation date like the runs do
+    snapshot_date = Column(
+        ISODate, nullable=False, default=lambda ctx: ctx.get_current_parameters()["valuation_date"],
+    )
 
     # Snapshot of values at valuation time
     curve_price = Column(Float, nullable=False)      # market price from curve
@@ -19,3 +24,30 @@ class MtmRecord(Base):
     mtm_value = Column(Float, nullable=False)         # computed MTM
 
     contract = relationship("Contract")
+
+    __table_args__ = (
+        # One record per run key; rerunning a key overwrites it. Also serves
+        # the latest-per-contract lookup (valuation_date, snapshot_date DESC).
+        Index("ux_mtm_history_key", "contract_id", "valuation_date", "snapshot_date", unique=True),
+        # Keyset order for history listings
+        Index("ix_mtm_history_date_id", "valuation_date", "id"),
+    )
+
+
+class LatestMtm(Base):
+    """Newest MTM record per contract, by valuation date then snapshot date.
+
+    Maintained by mtm_service on every MTM write, so P&L reads one row per
+    contract instead of searching mtm_history.
+    """
+
+    __tablename__ = "latest_mtm"
+
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    valuation_date = Column(ISODate, nullable=False)
+    snapshot_date = Column(ISODate, nullable=False)
+    curve_price = Column(Float, nullable=False)
+    contract_price = Column(Float, nullable=True)
+    open_quantity = Column(Float, nullable=False)
+    direction = Column(String, nullable=False)
+    mtm_value = Column(Float, nullable=False)
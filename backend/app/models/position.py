@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+
+from app.database import Base
+
+
+class ContractPosition(Base):
+    """Per-contract rollup of shipped/open quantity and weighted price.
+
+    Maintained by the services on every shipment write; see position_service.
+    """
+
+    __tablename__ = "contract_positions"
+
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    shipped_qty = Column(Float, nullable=False, default=0.0)   # non-cancelled BL quantity
+    open_qty = Column(Float, nullable=False, default=0.0)      # contract quantity - shipped
+    priced_qty = Column(Float, nullable=False, default=0.0)    # shipped quantity with a price
+    priced_value = Column(Float, nullable=False, default=0.0)  # sum(price × qty) over priced
+    avg_price = Column(Float, nullable=True)                   # priced_value / priced_qty
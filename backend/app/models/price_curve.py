@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import ISODate
 
 
 class PriceCurve(Base):
@@ -21,12 +22,15 @@ class CurveData(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     curve_id = Column(Integer, ForeignKey("price_curves.id", ondelete="CASCADE"), nullable=False)
-    price_date = Column(String, nullable=False)      # ISO-8601 date
+    price_date = Column(ISODate, nullable=False)     # ISO-8601 date
     price = Column(Float, nullable=False)
-    snapshot_date = Column(String, nullable=False)    # for MTM re-runs
+    snapshot_date = Column(ISODate, nullable=False)  # for MTM re-runs
 
     curve = relationship("PriceCurve", back_populates="data_points")
 
     __table_args__ = (
         UniqueConstraint("curve_id", "price_date", "snapshot_date", name="uq_curve_date_snapshot"),
+        # Covering indexes for the latest-snapshot and exact-snapshot curve loads
+        Index("ix_curve_data_curve_date", "curve_id", "price_date", "snapshot_date", "price"),
+        Index("ix_curve_data_curve_snapshot", "curve_id", "snapshot_date", "price_date", "price"),
     )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import ISODate
 
 
 class Shipment(Base):
@@ -11,7 +12,7 @@ class Shipment(Base):
     reference = Column(String, unique=True, nullable=False)
     contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False)
     vessel_name = Column(String, nullable=True)
-    bl_date = Column(String, nullable=True)       # bill of lading date (ISO)
+    bl_date = Column(ISODate, nullable=True)      # bill of lading date
     bl_quantity = Column(Float, nullable=True)     # actual BL quantity
     status = Column(String, nullable=False, default="PLANNED")
 
@@ -28,4 +29,9 @@ class Shipment(Base):
             "status IN ('PLANNED', 'IN_TRANSIT', 'DELIVERED', 'COMPLETED', 'CANCELLED')",
             name="ck_shipment_status",
         ),
+        # Covering index for per-contract shipped quantity / weighted price aggregates
+        Index(
+            "ix_shipments_contract_status",
+            "contract_id", "status", "bl_quantity", "final_price", "provisional_price",
+        ),
     )
@@ -0,0 +1,26 @@
+from datetime import date
+
+from sqlalchemy.types import Date, TypeDecorator
+
+
+class ISODate(TypeDecorator):
+    """Native DATE column that speaks ISO-8601 strings on the Python side.
+
+    The database stores a real DATE (TEXT 'YYYY-MM-DD' on SQLite, DATE on
+    PostgreSQL); models, schemas and query parameters keep using strings.
+    Input is checked at the edge (schemas.common.ISODateStr), so the bind
+    only ever sees valid dates.
+    """
+
+    impl = Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, date):
+            return value
+        return date.fromisoformat(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value.isoformat()
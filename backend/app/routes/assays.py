@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, get_db
 from app.schemas.assay import AssayCreate, AssayUpdate, AssayOut
 from app.services import assay_service as svc
 
@@ -9,8 +12,24 @@ router = APIRouter(prefix="/api/v1/assays", tags=["Assays"])
 
 
 @router.get("/", response_model=list[AssayOut])
-def list_assays(shipment_id: int | None = Query(None), db: Session = Depends(get_db)):
-    return svc.list_assays(db, shipment_id)
+async def list_assays(
+    response: Response,
+    shipment_id: int | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of assays by id; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.list_assays, shipment_id, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/stream")
+def stream_assays(shipment_id: int | None = Query(None), db: Session = Depends(get_db)):
+    """Every matching assay as NDJSON."""
+    return StreamingResponse(svc.stream_assays(db, shipment_id), media_type="application/x-ndjson")
 
 
 @router.post("/", response_model=AssayOut, status_code=201)
@@ -19,8 +38,8 @@ def create_assay(data: AssayCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{assay_id}", response_model=AssayOut)
-def get_assay(assay_id: int, db: Session = Depends(get_db)):
-    return svc.get_assay(db, assay_id)
+async def get_assay(assay_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_assay, assay_id)
 
 
 @router.patch("/{assay_id}", response_model=AssayOut)
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, get_db
 from app.schemas.contract import (
     ContractCreate,
     ContractUpdate,
@@ -15,12 +18,29 @@ router = APIRouter(prefix="/api/v1/contracts", tags=["Contracts"])
 
 
 @router.get("/", response_model=list[ContractOut])
-def list_contracts(
+async def list_contracts(
+    response: Response,
+    direction: str | None = Query(None),
+    status: str | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of contracts by delivery_start; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.list_contracts, direction, status, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/stream")
+def stream_contracts(
     direction: str | None = Query(None),
     status: str | None = Query(None),
     db: Session = Depends(get_db),
 ):
-    return svc.list_contracts(db, direction, status)
+    """Every matching contract as NDJSON."""
+    return StreamingResponse(svc.stream_contracts(db, direction, status), media_type="application/x-ndjson")
 
 
 @router.post("/", response_model=ContractOut, status_code=201)
@@ -29,8 +49,8 @@ def create_contract(data: ContractCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{contract_id}", response_model=ContractOut)
-def get_contract(contract_id: int, db: Session = Depends(get_db)):
-    return svc.get_contract(db, contract_id)
+async def get_contract(contract_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_contract, contract_id)
 
 
 @router.patch("/{contract_id}", response_model=ContractOut)
@@ -49,5 +69,5 @@ def delete_contract(contract_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{contract_id}/open-quantity", response_model=ContractOpenQuantity)
-def get_open_quantity(contract_id: int, db: Session = Depends(get_db)):
-    return svc.get_open_quantity(db, contract_id)
+async def get_open_quantity(contract_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_open_quantity, contract_id)
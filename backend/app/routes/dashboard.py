@@ -1,17 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.contract import Contract
 from app.models.shipment import Shipment
 from app.schemas.dashboard import DashboardSummary
-from app.services import exposure_service, pnl_service, pricing_service
+from app.services import exposure_service, pnl_service, pricing_service, result_cache
+from app.services.valuation_executor import run_valuation
 
 router = APIRouter(prefix="/api/v1/dashboard", tags=["Dashboard"])
 
 
-@router.get("/summary", response_model=DashboardSummary)
-def get_dashboard(db: Session = Depends(get_db)):
+def _summary(db: Session) -> DashboardSummary:
     total_contracts = db.query(Contract).count()
     open_contracts = db.query(Contract).filter(Contract.status.in_(["OPEN", "EXECUTED"])).count()
     total_shipments = db.query(Shipment).count()
@@ -32,7 +33,15 @@ def get_dashboard(db: Session = Depends(get_db)):
     )
 
 
+@router.get("/summary", response_model=DashboardSummary)
+async def get_dashboard(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Cached until contracts, shipments, curves, formulas, matches or MTM change; honours If-None-Match."""
+    return await result_cache.conditional(
+        request, response, "dashboard", result_cache.DASHBOARD_DEPS, lambda: db.run_sync(_summary),
+    )
+
+
 @router.post("/value-all-positions")
-def value_all_positions(db: Session = Depends(get_db)):
-    """Compute provisional/final prices for all eligible shipments."""
-    return pricing_service.value_all_positions(db)
+async def value_all_positions(db: Session = Depends(get_db)):
+    """Compute provisional/final prices for all eligible shipments (valuation pool)."""
+    return await run_valuation(pricing_service.value_all_positions, db)
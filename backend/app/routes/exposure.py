@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.exposure import ExposureSummary
 from app.services import exposure_service as svc
+from app.services import result_cache
 
 router = APIRouter(prefix="/api/v1/exposure", tags=["Exposure"])
 
 
 @router.get("/", response_model=ExposureSummary)
-def get_exposure(db: Session = Depends(get_db)):
-    return svc.compute_exposure(db)
+async def get_exposure(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    return await result_cache.conditional(
+        request, response, "exposure", result_cache.EXPOSURE_DEPS, lambda: db.run_sync(svc.compute_exposure),
+    )
@@ -0,0 +1,66 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.schemas.job import JobOut, JobSubmit
+from app.services import job_runner
+from app.services import job_service as svc
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+
+@router.post("/", response_model=JobOut, status_code=202)
+def submit_job(
+    data: JobSubmit,
+    response: Response,
+    idempotency_key: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Queue a background run; poll GET /jobs/{id} for progress.
+
+    Repeating a request with the same Idempotency-Key returns the original
+    job (200) instead of starting the work again.
+    """
+    job, created = svc.submit_job(db, data.kind, data.params, idempotency_key or data.idempotency_key)
+    if created:
+        job_runner.dispatch(db.get_bind(), job.id)
+    else:
+        response.status_code = 200
+    response.headers["Location"] = f"{router.prefix}/{job.id}"
+    return job
+
+
+@router.get("/", response_model=list[JobOut])
+async def list_jobs(
+    response: Response,
+    kind: str | None = Query(None),
+    status: str | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of jobs, newest first; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.list_jobs, kind, status, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_job, job_id)
+
+
+@router.get("/{job_id}/result", response_model=Any)
+async def get_job_result(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """The stored output of a SUCCEEDED job, shaped like the synchronous route's response."""
+    return await db.run_sync(svc.get_job_result, job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=JobOut)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    return svc.cancel_job(db, job_id)
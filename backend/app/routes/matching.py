@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.schemas.match import MatchCreate, MatchOut
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.schemas.common import ISODateStr, MatchingStrategy
+from app.schemas.match import BulkMatchCreate, MatchCreate, MatchOut
+from app.services import columnar_service
 from app.services import matching_service as svc
 
 router = APIRouter(prefix="/api/v1/matching", tags=["Matching"])
 
 
 @router.post("/fifo", response_model=list[MatchOut])
-def run_fifo(db: Session = Depends(get_db)):
-    return svc.run_fifo_matching(db)
+def run_fifo(incremental: bool = Query(False), db: Session = Depends(get_db)):
+    """Run FIFO matching; incremental re-matches only from the earliest change since the last run."""
+    return svc.run_fifo_matching(db, incremental=incremental)
+
+
+@router.post("/run", response_model=list[MatchOut])
+def run_matching(
+    strategy: MatchingStrategy = Query(MatchingStrategy.FIFO),
+    incremental: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Match the book with a strategy: FIFO, LIFO, NEAREST (closest delivery) or OPTIMAL (most realized P&L)."""
+    return svc.run_matching(db, strategy, incremental=incremental)
 
 
 @router.post("/manual", response_model=MatchOut, status_code=201)
@@ -20,9 +36,52 @@ def create_manual_match(data: MatchCreate, db: Session = Depends(get_db)):
     )
 
 
+@router.post("/manual/batch", response_model=list[MatchOut], status_code=201)
+def create_manual_matches(payload: BulkMatchCreate, db: Session = Depends(get_db)):
+    """Create many manual matches at once; an invalid pair rejects the whole batch."""
+    return svc.create_manual_matches(db, payload.matches)
+
+
 @router.get("/", response_model=list[MatchOut])
-def list_matches(db: Session = Depends(get_db)):
-    return svc.list_matches(db)
+async def list_matches(
+    response: Response,
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of matches by id; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.list_matches, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/stream")
+def stream_matches(db: Session = Depends(get_db)):
+    """Every match as NDJSON."""
+    return StreamingResponse(svc.stream_matches(db), media_type="application/x-ndjson")
+
+
+@router.get("/export")
+def export_matches(
+    format: str = Query("arrow", pattern="^(arrow|parquet)$"),
+    buy_contract_id: int | None = Query(None),
+    sell_contract_id: int | None = Query(None),
+    start_date: ISODateStr | None = Query(None),
+    end_date: ISODateStr | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Stream matches as an Arrow IPC stream or Parquet file."""
+    chunks = columnar_service.export_chunks(
+        db.get_bind(), "matches", format,
+        start_date=start_date, end_date=end_date,
+        buy_contract_id=buy_contract_id, sell_contract_id=sell_contract_id,
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=columnar_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="matches.{format}"'},
+    )
 
 
 @router.delete("/{match_id}", status_code=204)
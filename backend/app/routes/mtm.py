@@ -1,36 +1,101 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.schemas.mtm import MtmRunRequest, MtmRecordOut, MtmPortfolioOut
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.schemas.common import ISODateStr
+from app.schemas.mtm import (
+    MtmBackfillRequest, MtmBackfillResult, MtmRunRequest, MtmRecordOut, MtmPortfolioOut,
+)
+from app.services import columnar_service
+from app.services.valuation_executor import run_valuation
 from app.services import mtm_service as svc
 
 router = APIRouter(prefix="/api/v1/mtm", tags=["Mark-to-Market"])
 
 
 @router.post("/run", response_model=MtmPortfolioOut)
-def run_mtm_portfolio(req: MtmRunRequest, db: Session = Depends(get_db)):
-    return svc.run_mtm_portfolio(db, req.valuation_date, req.snapshot_date)
+async def run_mtm_portfolio(req: MtmRunRequest, db: Session = Depends(get_db)):
+    return await run_valuation(svc.run_mtm_portfolio, db, req.valuation_date, req.snapshot_date)
+
+
+@router.post("/backfill", response_model=MtmBackfillResult)
+async def backfill_mtm(req: MtmBackfillRequest, db: Session = Depends(get_db)):
+    """Rebuild portfolio MTM for every day of a date range, replacing existing records.
+
+    For long ranges, submit a mtm_backfill job (/api/v1/jobs) instead.
+    """
+    return await run_valuation(
+        svc.backfill_mtm, db, req.start_date, req.end_date, req.snapshot_policy, req.snapshot_date,
+    )
 
 
 @router.post("/run/{contract_id}", response_model=MtmRecordOut)
-def run_mtm_contract(contract_id: int, req: MtmRunRequest, db: Session = Depends(get_db)):
-    return svc.run_mtm_for_contract(db, contract_id, req.valuation_date, req.snapshot_date)
+async def run_mtm_contract(contract_id: int, req: MtmRunRequest, db: Session = Depends(get_db)):
+    return await run_valuation(svc.run_mtm_for_contract, db, contract_id, req.valuation_date, req.snapshot_date)
 
 
 @router.get("/history", response_model=list[MtmRecordOut])
-def get_mtm_history(
+async def get_mtm_history(
+    response: Response,
+    contract_id: int | None = Query(None),
+    valuation_date: ISODateStr | None = Query(None),
+    snapshot_date: ISODateStr | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of history, newest first; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.get_mtm_history, contract_id, valuation_date, cursor, limit, snapshot_date)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/history/stream")
+def stream_mtm_history(
     contract_id: int | None = Query(None),
-    valuation_date: str | None = Query(None),
+    valuation_date: ISODateStr | None = Query(None),
+    snapshot_date: ISODateStr | None = Query(None),
     db: Session = Depends(get_db),
 ):
-    return svc.get_mtm_history(db, contract_id, valuation_date)
+    """All matching history rows as NDJSON."""
+    return StreamingResponse(
+        svc.stream_mtm_history(db, contract_id, valuation_date, snapshot_date), media_type="application/x-ndjson",
+    )
+
+
+@router.get("/history/export")
+def export_mtm_history(
+    format: str = Query("arrow", pattern="^(arrow|parquet)$"),
+    contract_id: int | None = Query(None),
+    start_date: ISODateStr | None = Query(None),
+    end_date: ISODateStr | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Stream MTM history as an Arrow IPC stream or Parquet file."""
+    chunks = columnar_service.export_chunks(
+        db.get_bind(), "mtm_history", format,
+        start_date=start_date, end_date=end_date, contract_id=contract_id,
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=columnar_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="mtm_history.{format}"'},
+    )
 
 
 @router.get("/portfolio", response_model=MtmPortfolioOut)
-def get_portfolio_mtm(valuation_date: str = Query(...), db: Session = Depends(get_db)):
-    """Get previously computed MTM for a specific date, or compute fresh."""
-    existing = svc.get_mtm_history(db, valuation_date=valuation_date)
+async def get_portfolio_mtm(
+    valuation_date: ISODateStr = Query(...),
+    adb: AsyncSession = Depends(get_async_db),
+    db: Session = Depends(get_db),
+):
+    """Get previously computed MTM for a specific date (its own snapshot), or compute fresh."""
+    page = await adb.run_sync(svc.get_mtm_history, None, valuation_date, None, None, valuation_date)
+    existing = page.items
     if existing:
         total = sum(r.mtm_value for r in existing)
         return MtmPortfolioOut(
@@ -38,4 +103,4 @@ def get_portfolio_mtm(valuation_date: str = Query(...), db: Session = Depends(ge
             records=[MtmRecordOut.model_validate(r) for r in existing],
             total_mtm=round(total, 2),
         )
-    return svc.run_mtm_portfolio(db, valuation_date)
+    return await run_valuation(svc.run_mtm_portfolio, db, valuation_date)
@@ -1,23 +1,26 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.pnl import RealizedPnlItem, UnrealizedPnlItem, PnlSummary
 from app.services import pnl_service as svc
+from app.services import result_cache
 
 router = APIRouter(prefix="/api/v1/pnl", tags=["P&L"])
 
 
 @router.get("/summary", response_model=PnlSummary)
-def get_pnl_summary(db: Session = Depends(get_db)):
-    return svc.get_pnl_summary(db)
+async def get_pnl_summary(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    return await result_cache.conditional(
+        request, response, "pnl_summary", result_cache.PNL_DEPS, lambda: db.run_sync(svc.get_pnl_summary),
+    )
 
 
 @router.get("/realized", response_model=list[RealizedPnlItem])
-def get_realized_pnl(db: Session = Depends(get_db)):
-    return svc.get_realized_pnl(db)
+async def get_realized_pnl(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_realized_pnl)
 
 
 @router.get("/unrealized", response_model=list[UnrealizedPnlItem])
-def get_unrealized_pnl(db: Session = Depends(get_db)):
-    return svc.get_unrealized_pnl(db)
+async def get_unrealized_pnl(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_unrealized_pnl)
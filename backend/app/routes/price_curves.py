@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, Query
+import io
+import tempfile
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.schemas.common import ISODateStr
 from app.schemas.price_curve import (
     PriceCurveCreate,
     PriceCurveUpdate,
@@ -9,15 +17,23 @@ from app.schemas.price_curve import (
     CurveDataOut,
     BulkCurveDataUpload,
     CurveAverageResponse,
+    CurveCacheStats,
+    CurveIngestResult,
 )
 from app.services import price_curve_service as svc
+from app.services import columnar_service, curve_cache
 
 router = APIRouter(prefix="/api/v1/price-curves", tags=["Price Curves"])
 
 
 @router.get("/", response_model=list[PriceCurveOut])
-def list_curves(db: Session = Depends(get_db)):
-    return svc.list_curves(db)
+async def list_curves(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.list_curves)
+
+
+@router.get("/cache/stats", response_model=CurveCacheStats)
+def get_cache_stats():
+    return curve_cache.stats()
 
 
 @router.post("/", response_model=PriceCurveOut, status_code=201)
@@ -26,8 +42,8 @@ def create_curve(data: PriceCurveCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{curve_id}", response_model=PriceCurveOut)
-def get_curve(curve_id: int, db: Session = Depends(get_db)):
-    return svc.get_curve(db, curve_id)
+async def get_curve(curve_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_curve, curve_id)
 
 
 @router.patch("/{curve_id}", response_model=PriceCurveOut)
@@ -45,26 +61,105 @@ def upload_curve_data(curve_id: int, payload: BulkCurveDataUpload, db: Session =
     return svc.bulk_upload_data(db, curve_id, payload.data_points)
 
 
+async def _spool_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    """Copy the request body into a temporary file as it arrives."""
+    body = tempfile.SpooledTemporaryFile(max_size=settings.CURVE_INGEST_SPOOL_BYTES)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+
+@router.post("/{curve_id}/data/stream", response_model=CurveIngestResult, status_code=201)
+async def upload_curve_data_stream(
+    curve_id: int,
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    """Upsert a CSV or NDJSON body (format from ?format= or the Content-Type).
+
+    The body is spooled to a temporary file as it arrives, then parsed and
+    written in batches off the event loop.
+    """
+    if format is None:
+        format = "ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv"
+    with await _spool_body(request) as body:
+        lines = io.TextIOWrapper(body, encoding="utf-8", newline="")
+        return await run_in_threadpool(svc.ingest_curve_data, db, curve_id, lines, format)
+
+
+@router.post("/{curve_id}/data/parquet", response_model=CurveIngestResult, status_code=201)
+async def import_curve_parquet(curve_id: int, request: Request, db: Session = Depends(get_db)):
+    """Upsert a Parquet file (price_date, snapshot_date, price) sent as the request body."""
+    with await _spool_body(request) as body:
+        return await run_in_threadpool(columnar_service.import_curve_parquet, db, curve_id, body)
+
+
+@router.get("/{curve_id}/data/export")
+def export_curve_data(
+    curve_id: int,
+    format: str = Query("arrow", pattern="^(arrow|parquet)$"),
+    start_date: ISODateStr | None = Query(None),
+    end_date: ISODateStr | None = Query(None),
+    snapshot_date: ISODateStr | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Stream curve points as an Arrow IPC stream or Parquet file."""
+    svc.get_curve(db, curve_id)  # 404 before the response starts
+    chunks = columnar_service.export_chunks(
+        db.get_bind(), "curve_data", format,
+        start_date=start_date, end_date=end_date, curve_id=curve_id, snapshot_date=snapshot_date,
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=columnar_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="curve_{curve_id}.{format}"'},
+    )
+
+
 @router.get("/{curve_id}/data", response_model=list[CurveDataOut])
-def get_curve_data(
+async def get_curve_data(
     curve_id: int,
-    start_date: str | None = Query(None),
-    end_date: str | None = Query(None),
-    snapshot_date: str | None = Query(None),
+    response: Response,
+    start_date: ISODateStr | None = Query(None),
+    end_date: ISODateStr | None = Query(None),
+    snapshot_date: ISODateStr | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of points by (price_date, snapshot_date); X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.get_curve_data, curve_id, start_date, end_date, snapshot_date, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/{curve_id}/data/stream")
+def get_curve_data_stream(
+    curve_id: int,
+    start_date: ISODateStr | None = Query(None),
+    end_date: ISODateStr | None = Query(None),
+    snapshot_date: ISODateStr | None = Query(None),
     db: Session = Depends(get_db),
 ):
-    return svc.get_curve_data(db, curve_id, start_date, end_date, snapshot_date)
+    """All matching points as NDJSON."""
+    return StreamingResponse(
+        svc.stream_curve_data(db, curve_id, start_date, end_date, snapshot_date),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get("/{curve_id}/average", response_model=CurveAverageResponse)
-def get_curve_average(
+async def get_curve_average(
     curve_id: int,
-    start_date: str = Query(...),
-    end_date: str = Query(...),
-    snapshot_date: str | None = Query(None),
-    db: Session = Depends(get_db),
+    start_date: ISODateStr = Query(...),
+    end_date: ISODateStr = Query(...),
+    snapshot_date: ISODateStr | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    avg, count = svc.get_curve_average(db, curve_id, start_date, end_date, snapshot_date)
+    avg, count = await db.run_sync(svc.get_curve_average, curve_id, start_date, end_date, snapshot_date)
     return CurveAverageResponse(
         curve_id=curve_id,
         start_date=start_date,
@@ -41,7 +41,7 @@ def delete_formula(formula_id: int, db: Session = Depends(get_db)):
 
 @router.post("/{formula_id}/evaluate", response_model=PriceBreakdown)
 def evaluate_formula(formula_id: int, req: FormulaEvaluateRequest, db: Session = Depends(get_db)):
-    formula = svc.get_formula(db, formula_id)
+    formula = svc.get_formula_plan(db, formula_id)
     assay_values = {
         "sio2": req.sio2,
         "al2o3": req.al2o3,
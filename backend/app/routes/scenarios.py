@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas.scenario import ScenarioRunOut, ScenarioRunRequest
+from app.services.valuation_executor import run_valuation
+from app.services import scenario_service as svc
+
+router = APIRouter(prefix="/api/v1/scenarios", tags=["Scenarios"])
+
+
+@router.post("/run", response_model=ScenarioRunOut)
+async def run_scenarios(req: ScenarioRunRequest, db: Session = Depends(get_db)):
+    """MTM, exposure and P&L of the open book under curve shocks, computed in memory; nothing is written."""
+    return await run_valuation(svc.run_scenarios, db, req.valuation_date, req.snapshot_date, req.scenarios)
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, get_db
 from app.schemas.shipment import (
     ShipmentCreate,
     ShipmentUpdate,
@@ -17,8 +20,24 @@ router = APIRouter(prefix="/api/v1/shipments", tags=["Shipments"])
 
 
 @router.get("/", response_model=list[ShipmentOut])
-def list_shipments(contract_id: int | None = Query(None), db: Session = Depends(get_db)):
-    return svc.list_shipments(db, contract_id)
+async def list_shipments(
+    response: Response,
+    contract_id: int | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of shipments by id; X-Next-Cursor is set when more follow."""
+    page = await db.run_sync(svc.list_shipments, contract_id, cursor, limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/stream")
+def stream_shipments(contract_id: int | None = Query(None), db: Session = Depends(get_db)):
+    """Every matching shipment as NDJSON."""
+    return StreamingResponse(svc.stream_shipments(db, contract_id), media_type="application/x-ndjson")
 
 
 @router.post("/", response_model=ShipmentOut, status_code=201)
@@ -27,8 +46,8 @@ def create_shipment(data: ShipmentCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{shipment_id}", response_model=ShipmentOut)
-def get_shipment(shipment_id: int, db: Session = Depends(get_db)):
-    return svc.get_shipment(db, shipment_id)
+async def get_shipment(shipment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(svc.get_shipment, shipment_id)
 
 
 @router.patch("/{shipment_id}", response_model=ShipmentOut)
@@ -1,5 +1,8 @@
+from datetime import date
 from enum import Enum
-from typing import Literal
+from typing import Annotated, Literal
+
+from pydantic import AfterValidator
 
 
 class Direction(str, Enum):
@@ -34,4 +37,34 @@ class QPConvention(str, Enum):
     CUSTOM = "CUSTOM"
 
 
+class SnapshotPolicy(str, Enum):
+    VALUATION_DATE = "VALUATION_DATE"  # each date priced off its own snapshot
+    FIXED = "FIXED"  # every date priced off one snapshot (snapshot_date)
+    LATEST = "LATEST"  # latest snapshot per price_date
+
+
+class MatchingStrategy(str, Enum):
+    FIFO = "FIFO"  # earliest delivery first on both sides
+    LIFO = "LIFO"  # each contract closes the latest open contracts before it
+    NEAREST = "NEAREST"  # closest delivery starts first
+    OPTIMAL = "OPTIMAL"  # most realized P&L for the full matchable quantity
+
+
+class ShockKind(str, Enum):
+    PARALLEL = "PARALLEL"  # add value to every price
+    PERCENT = "PERCENT"  # scale every price by value %
+    TENOR = "TENOR"  # add a shift by months to delivery, interpolated between tenor points
+
+
 DirectionLiteral = Literal["BUY", "SELL"]
+
+
+def _iso_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise ValueError("must be an ISO-8601 date (YYYY-MM-DD)")
+
+
+# Dates travel as 'YYYY-MM-DD' strings; checked here so a bad one is a 422, not a failed bind
+ISODateStr = Annotated[str, AfterValidator(_iso_date)]
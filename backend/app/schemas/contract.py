@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 
-from app.schemas.common import Direction, ContractStatus, QPConvention
+from app.schemas.common import Direction, ContractStatus, QPConvention, ISODateStr
 
 
 class ContractCreate(BaseModel):
@@ -11,8 +11,8 @@ class ContractCreate(BaseModel):
     quantity: float
     uom: str = "DMT"
     incoterm: str = "CFR"
-    delivery_start: str
-    delivery_end: str
+    delivery_start: ISODateStr
+    delivery_end: ISODateStr
     status: ContractStatus = ContractStatus.OPEN
     qp_convention: QPConvention = QPConvention.MONTH_OF_BL
     qp_start_offset: int | None = None
@@ -28,8 +28,8 @@ class ContractUpdate(BaseModel):
     quantity: float | None = None
     uom: str | None = None
     incoterm: str | None = None
-    delivery_start: str | None = None
-    delivery_end: str | None = None
+    delivery_start: ISODateStr | None = None
+    delivery_end: ISODateStr | None = None
     qp_convention: QPConvention | None = None
     qp_start_offset: int | None = None
     qp_end_offset: int | None = None
@@ -0,0 +1,27 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class JobSubmit(BaseModel):
+    kind: str  # mtm_portfolio, mtm_backfill, value_all_positions, fifo_matching or matching
+    params: dict[str, Any] = {}
+    idempotency_key: str | None = None  # the Idempotency-Key header takes precedence
+
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: dict[str, Any]
+    idempotency_key: str | None
+    progress_done: int
+    progress_total: int | None
+    cancel_requested: bool
+    error: str | None
+    created_at: str
+    started_at: str | None
+    heartbeat_at: str | None
+    finished_at: str | None
+
+    model_config = {"from_attributes": True}
@@ -1,11 +1,30 @@
 from pydantic import BaseModel
 
+from app.schemas.common import MatchingStrategy, ISODateStr
+
 
 class MatchCreate(BaseModel):
     buy_contract_id: int
     sell_contract_id: int
     matched_quantity: float
-    match_date: str
+    match_date: ISODateStr
+
+
+class BulkMatchCreate(BaseModel):
+    matches: list[MatchCreate]
+
+
+class FifoRunRequest(BaseModel):
+    incremental: bool = False  # only re-match from the earliest change since the last run
+
+    model_config = {"extra": "forbid"}
+
+
+class MatchingRunRequest(BaseModel):
+    strategy: MatchingStrategy = MatchingStrategy.FIFO
+    incremental: bool = False  # FIFO only
+
+    model_config = {"extra": "forbid"}
 
 
 class MatchOut(BaseModel):
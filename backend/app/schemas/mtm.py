@@ -1,15 +1,18 @@
 from pydantic import BaseModel
 
+from app.schemas.common import SnapshotPolicy, ISODateStr
+
 
 class MtmRunRequest(BaseModel):
-    valuation_date: str
-    snapshot_date: str | None = None  # defaults to valuation_date
+    valuation_date: ISODateStr
+    snapshot_date: ISODateStr | None = None  # defaults to valuation_date
 
 
 class MtmRecordOut(BaseModel):
     id: int
     contract_id: int
     valuation_date: str
+    snapshot_date: str
     curve_price: float
     contract_price: float | None
     open_quantity: float
@@ -23,3 +26,26 @@ class MtmPortfolioOut(BaseModel):
     valuation_date: str
     records: list[MtmRecordOut]
     total_mtm: float
+
+
+class MtmBackfillRequest(BaseModel):
+    start_date: ISODateStr
+    end_date: ISODateStr  # inclusive; every calendar day is valued
+    snapshot_policy: SnapshotPolicy = SnapshotPolicy.VALUATION_DATE
+    snapshot_date: ISODateStr | None = None  # FIXED policy only
+
+
+class MtmDateTotal(BaseModel):
+    valuation_date: str
+    total_mtm: float
+
+
+class MtmBackfillResult(BaseModel):
+    start_date: str
+    end_date: str
+    snapshot_policy: SnapshotPolicy
+    snapshot_date: str | None  # snapshot key written; None under VALUATION_DATE (each date's own)
+    contracts: int
+    records_written: int
+    records_replaced: int  # existing records for the dates that were deleted
+    totals: list[MtmDateTotal]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class ContractPositionOut(BaseModel):
+    contract_id: int
+    shipped_qty: float
+    open_qty: float
+    priced_qty: float
+    avg_price: float | None
+
+    model_config = {"from_attributes": True}
+
+
+class PositionMismatch(BaseModel):
+    contract_id: int
+    field: str
+    stored: float | None
+    expected: float | None
+
+
+class PositionCheckResult(BaseModel):
+    contracts_checked: int
+    mismatches: list[PositionMismatch]
@@ -1,11 +1,13 @@
 from pydantic import BaseModel
 
+from app.schemas.common import ISODateStr
+
 
 # --- CurveData ---
 class CurveDataCreate(BaseModel):
-    price_date: str
+    price_date: ISODateStr
     price: float
-    snapshot_date: str
+    snapshot_date: ISODateStr
 
 
 class CurveDataOut(BaseModel):
@@ -50,10 +52,19 @@ class BulkCurveDataUpload(BaseModel):
     data_points: list[CurveDataCreate]
 
 
+class CurveIngestResult(BaseModel):
+    curve_id: int
+    rows: int  # rows upserted
+    batches: int
+    first_price_date: str | None
+    last_price_date: str | None
+    checksum: str  # sha256 of "price_date,snapshot_date,price\n" per row, in input order
+
+
 class CurveAverageRequest(BaseModel):
-    start_date: str
-    end_date: str
-    snapshot_date: str | None = None
+    start_date: ISODateStr
+    end_date: ISODateStr
+    snapshot_date: ISODateStr | None = None
 
 
 class CurveAverageResponse(BaseModel):
@@ -62,3 +73,9 @@ class CurveAverageResponse(BaseModel):
     end_date: str
     average_price: float
     data_point_count: int
+
+
+class CurveCacheStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
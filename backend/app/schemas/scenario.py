@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+
+from app.schemas.common import ShockKind, ISODateStr
+
+
+class TenorShift(BaseModel):
+    months: int  # months from the valuation month to the delivery month
+    shift: float
+
+
+class CurveShock(BaseModel):
+    kind: ShockKind
+    curve_id: int | None = None  # None: every curve
+    value: float = 0.0  # PARALLEL: price change; PERCENT: % change
+    tenors: list[TenorShift] = []  # TENOR only
+
+
+class Scenario(BaseModel):
+    name: str
+    shocks: list[CurveShock] = []  # applied in order
+
+
+class ScenarioRunRequest(BaseModel):
+    valuation_date: ISODateStr
+    snapshot_date: ISODateStr | None = None  # defaults to valuation_date
+    scenarios: list[Scenario]
+
+
+class ScenarioOutcome(BaseModel):
+    name: str
+    mtm: float  # unrealized P&L of the open book
+    mtm_change: float  # vs. the unshocked book
+    net_exposure_usd: float
+    exposure_change: float
+    pnf: float  # expected P&F on shipments whose QP is still open; + receivable
+    pnf_change: float
+    total_pnl: float  # realized + mtm + pnf
+
+
+class ScenarioRunOut(BaseModel):
+    valuation_date: str
+    snapshot_date: str
+    contracts: int  # open positions in the book snapshot
+    open_qp_shipments: int  # provisionally priced shipments whose QP is still open
+    realized_pnl: float
+    base: ScenarioOutcome
+    scenarios: list[ScenarioOutcome]
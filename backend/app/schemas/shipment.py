@@ -1,13 +1,13 @@
 from pydantic import BaseModel
 
-from app.schemas.common import ShipmentStatus
+from app.schemas.common import ShipmentStatus, ISODateStr
 
 
 class ShipmentCreate(BaseModel):
     reference: str
     contract_id: int
     vessel_name: str | None = None
-    bl_date: str | None = None
+    bl_date: ISODateStr | None = None
     bl_quantity: float | None = None
     status: ShipmentStatus = ShipmentStatus.PLANNED
 
@@ -15,7 +15,7 @@ class ShipmentCreate(BaseModel):
 class ShipmentUpdate(BaseModel):
     reference: str | None = None
     vessel_name: str | None = None
-    bl_date: str | None = None
+    bl_date: ISODateStr | None = None
     bl_quantity: float | None = None
 
 
@@ -13,6 +13,7 @@ Run: python -m app.seed.seed_data
 from datetime import date, timedelta
 
 from app.database import SessionLocal, Base, engine
+from app.services import curve_cache
 from app.models import (
     PriceCurve, CurveData, PricingFormula, FormulaAdjustment,
     Contract, Shipment, Assay,
@@ -179,9 +180,11 @@ def seed():
         ))
 
         db.commit()
+        curve_cache.invalidate(tsi.id)
 
         # --- 6. Compute prices on shipments ---
         from app.services.pricing_service import compute_provisional_price, compute_final_price
+        from app.services.position_service import rebuild_positions
 
         # ship1 (BUY-001): has provisional + final assay
         compute_provisional_price(db, ship1, buy1)
@@ -194,6 +197,8 @@ def seed():
         compute_provisional_price(db, ship3, sell1)
         compute_final_price(db, ship3, sell1)
 
+        rebuild_positions(db)
+
         print("Seed data created successfully!")
         print(f"  - Price curve: {tsi.code} ({len(base_prices)} data points)")
         print(f"  - Formula: {formula.name}")
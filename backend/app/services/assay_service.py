@@ -1,15 +1,33 @@
+from typing import Iterator
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 from app.models.assay import Assay
-from app.schemas.assay import AssayCreate, AssayUpdate
+from app.services.pagination import Page, paginate, stream_ndjson
+from app.schemas.assay import AssayCreate, AssayUpdate, AssayOut
+
+LIST_KEYS = (Assay.id,)
 
 
-def list_assays(db: Session, shipment_id: int | None = None) -> list[Assay]:
+def _list_query(db: Session, shipment_id: int | None):
     q = db.query(Assay)
     if shipment_id:
         q = q.filter(Assay.shipment_id == shipment_id)
-    return q.all()
+    return q
+
+
+def list_assays(
+    db: Session,
+    shipment_id: int | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> Page[Assay]:
+    return paginate(_list_query(db, shipment_id), LIST_KEYS, cursor, limit)
+
+
+def stream_assays(db: Session, shipment_id: int | None = None) -> Iterator[str]:
+    return stream_ndjson(db, lambda s: _list_query(s, shipment_id), LIST_KEYS, AssayOut)
 
 
 def get_assay(db: Session, assay_id: int) -> Assay:
@@ -0,0 +1,217 @@
+"""Arrow IPC / Parquet export of bulk tables, and Parquet import into curve_data.
+
+Exports read rows straight off a streamed DB cursor in fixed-size partitions
+and turn each partition into an Arrow RecordBatch; no ORM objects or
+Pydantic models are built. Output is produced as byte chunks, one per batch,
+so HTTP responses and files are written while the query is still running.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import BinaryIO, Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from sqlalchemy import Date, Table, select, type_coerce
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.match import Match
+from app.models.mtm import MtmRecord
+from app.models.price_curve import CurveData
+from app.schemas.price_curve import CurveIngestResult
+from app.services.price_curve_service import upsert_curve_rows
+
+BATCH_SIZE = 65_536
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    table: Table
+    schema: pa.Schema  # field names are column names on the table
+    date_column: str  # target of start_date / end_date filters
+    order_by: tuple[str, ...]
+
+
+DATASETS = {
+    "curve_data": Dataset(
+        table=CurveData.__table__,
+        schema=pa.schema([
+            ("curve_id", pa.int64()),
+            ("price_date", pa.date32()),
+            ("snapshot_date", pa.date32()),
+            ("price", pa.float64()),
+        ]),
+        date_column="price_date",
+        order_by=("curve_id", "price_date", "snapshot_date"),
+    ),
+    "mtm_history": Dataset(
+        table=MtmRecord.__table__,
+        schema=pa.schema([
+            ("id", pa.int64()),
+            ("contract_id", pa.int64()),
+            ("valuation_date", pa.date32()),
+            ("snapshot_date", pa.date32()),
+            ("direction", pa.string()),
+            ("curve_price", pa.float64()),
+            ("contract_price", pa.float64()),
+            ("open_quantity", pa.float64()),
+            ("mtm_value", pa.float64()),
+        ]),
+        date_column="valuation_date",
+        order_by=("valuation_date", "contract_id", "id"),
+    ),
+    "matches": Dataset(
+        table=Match.__table__,
+        schema=pa.schema([
+            ("id", pa.int64()),
+            ("buy_contract_id", pa.int64()),
+            ("sell_contract_id", pa.int64()),
+            ("match_date", pa.date32()),
+            ("matched_quantity", pa.float64()),
+            ("buy_price", pa.float64()),
+            ("sell_price", pa.float64()),
+            ("realized_pnl", pa.float64()),
+        ]),
+        date_column="match_date",
+        order_by=("id",),
+    ),
+}
+
+
+def _query(dataset: Dataset, start_date: str | None, end_date: str | None, equals: dict):
+    t = dataset.table
+    # Date columns are read as raw dates (not the ISO strings the models use)
+    columns = [
+        type_coerce(t.c[f.name], Date).label(f.name) if f.type == pa.date32() else t.c[f.name]
+        for f in dataset.schema
+    ]
+    stmt = select(*columns).order_by(*(t.c[name] for name in dataset.order_by))
+    if start_date:
+        stmt = stmt.where(t.c[dataset.date_column] >= start_date)
+    if end_date:
+        stmt = stmt.where(t.c[dataset.date_column] <= end_date)
+    for name, value in equals.items():
+        if value is not None:
+            stmt = stmt.where(t.c[name] == value)
+    return stmt
+
+
+def iter_record_batches(
+    bind: Engine,
+    name: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    batch_size: int = BATCH_SIZE,
+    **equals,
+) -> Iterator[pa.RecordBatch]:
+    """Record batches of a dataset, filtered on its date column and column equality."""
+    dataset = DATASETS[name]
+    stmt = _query(dataset, start_date, end_date, equals)
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for rows in result.partitions():
+            columns = zip(*rows)
+            yield pa.record_batch(
+                [pa.array(col, type=f.type) for col, f in zip(columns, dataset.schema)],
+                schema=dataset.schema,
+            )
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def export_chunks(bind: Engine, name: str, fmt: str, **filters) -> Iterator[bytes]:
+    """Encode a dataset as an Arrow IPC stream or a Parquet file, chunk by chunk.
+
+    Each record batch becomes one IPC message or one Parquet row group.
+    """
+    schema = DATASETS[name].schema
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(out, schema)
+    elif fmt == "parquet":
+        writer = pq.ParquetWriter(out, schema)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    for batch in iter_record_batches(bind, name, **filters):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_to_file(bind: Engine, name: str, fmt: str, path: str, **filters) -> int:
+    """Write a dataset export to disk. Returns the number of bytes written."""
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in export_chunks(bind, name, fmt, **filters):
+            written += f.write(chunk)
+    return written
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, date) else date.fromisoformat(value).isoformat()
+
+
+def _parquet_rows(parquet: pq.ParquetFile) -> Iterator[tuple[str, str, float]]:
+    row = 0
+    for batch in parquet.iter_batches(batch_size=BATCH_SIZE, columns=["price_date", "snapshot_date", "price"]):
+        price_dates, snapshot_dates, prices = (batch.column(i).to_pylist() for i in range(3))
+        for price_date, snapshot_date, price in zip(price_dates, snapshot_dates, prices):
+            row += 1
+            try:
+                parsed = _iso(price_date), _iso(snapshot_date), float(price)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=422, detail=f"Row {row}: invalid curve data row")
+            yield parsed
+
+
+def import_curve_parquet(db: Session, curve_id: int, source: str | BinaryIO) -> CurveIngestResult:
+    """Upsert a Parquet file of curve points into one curve.
+
+    The file needs price_date, snapshot_date and price columns (dates as
+    date32 or ISO strings); any curve_id column is ignored, so an export
+    from one environment loads into the matching curve of another.
+    """
+    try:
+        parquet = pq.ParquetFile(source)
+    except pa.ArrowInvalid:
+        raise HTTPException(status_code=422, detail="Not a Parquet file")
+    missing = {"price_date", "snapshot_date", "price"} - set(parquet.schema_arrow.names)
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Parquet file missing columns: {', '.join(sorted(missing))}")
+    return upsert_curve_rows(db, curve_id, _parquet_rows(parquet))
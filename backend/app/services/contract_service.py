@@ -1,22 +1,43 @@
+from typing import Iterator
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 from app.models.contract import Contract
-from app.models.shipment import Shipment
+from app.services.pagination import Page, paginate, stream_ndjson
+from app.services.position_service import get_positions, refresh_positions
 from app.schemas.contract import (
     ContractCreate,
     ContractUpdate,
+    ContractOut,
     ContractOpenQuantity,
 )
 
+# Keyset order for listings (ix_contracts_delivery_start)
+LIST_KEYS = (Contract.delivery_start, Contract.id)
+
 
-def list_contracts(db: Session, direction: str | None = None, status: str | None = None) -> list[Contract]:
+def _list_query(db: Session, direction: str | None, status: str | None):
     q = db.query(Contract)
     if direction:
         q = q.filter(Contract.direction == direction)
     if status:
         q = q.filter(Contract.status == status)
-    return q.order_by(Contract.delivery_start).all()
+    return q
+
+
+def list_contracts(
+    db: Session,
+    direction: str | None = None,
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> Page[Contract]:
+    return paginate(_list_query(db, direction, status), LIST_KEYS, cursor, limit)
+
+
+def stream_contracts(db: Session, direction: str | None = None, status: str | None = None) -> Iterator[str]:
+    return stream_ndjson(db, lambda s: _list_query(s, direction, status), LIST_KEYS, ContractOut)
 
 
 def get_contract(db: Session, contract_id: int) -> Contract:
@@ -32,6 +53,8 @@ def create_contract(db: Session, data: ContractCreate) -> Contract:
         raise HTTPException(status_code=409, detail=f"Contract reference '{data.reference}' already exists")
     contract = Contract(**data.model_dump())
     db.add(contract)
+    db.flush()
+    refresh_positions(db, [contract.id])
     db.commit()
     db.refresh(contract)
     return contract
@@ -46,6 +69,8 @@ def update_contract(db: Session, contract_id: int, data: ContractUpdate) -> Cont
             raise HTTPException(status_code=409, detail=f"Contract reference '{updates['reference']}' already exists")
     for field, value in updates.items():
         setattr(contract, field, value)
+    if "quantity" in updates:
+        refresh_positions(db, [contract.id])
     db.commit()
     db.refresh(contract)
     return contract
@@ -67,16 +92,7 @@ def delete_contract(db: Session, contract_id: int) -> None:
 
 def get_open_quantity(db: Session, contract_id: int) -> ContractOpenQuantity:
     contract = get_contract(db, contract_id)
-    shipped = (
-        db.query(Shipment)
-        .filter(
-            Shipment.contract_id == contract_id,
-            Shipment.status != "CANCELLED",
-            Shipment.bl_quantity.isnot(None),
-        )
-        .all()
-    )
-    shipped_qty = sum(s.bl_quantity for s in shipped)
+    shipped_qty = get_positions(db, [contract_id])[contract_id].shipped_qty
     return ContractOpenQuantity(
         contract_id=contract.id,
         total_quantity=contract.quantity,
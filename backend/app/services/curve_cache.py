@@ -0,0 +1,155 @@
+"""In-process cache of resolved price-curve series.
+
+Each entry holds one curve's prices as sorted parallel arrays, keyed by
+(curve_id, snapshot_date). A snapshot_date of None is the "latest snapshot
+per price_date" view used whenever no snapshot is requested.
+
+Every series carries a prefix-sum index over its prices, so the average
+over any price_date window is two bisects and a subtraction.
+
+Writers must call append() / invalidate() / clear() after committing curve data.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+MAX_ENTRIES = 256
+
+
+@dataclass
+class CurveSeries:
+    """Prices for one (curve, snapshot) key, sorted by price_date.
+
+    cumsum[i] is the sum of prices[:i], so it is one longer than prices.
+    """
+
+    dates: list[str] = field(default_factory=list)
+    prices: list[float] = field(default_factory=list)
+    cumsum: list[float] = field(default_factory=lambda: [0.0])
+
+    def extend(self, dates: list[str], prices: list[float]) -> None:
+        """Append points dated strictly after the current last price_date.
+
+        Prices and sums are written before dates so a concurrent reader,
+        which bisects on dates, never indexes past the end of cumsum.
+        """
+        total = self.cumsum[-1]
+        for price in prices:
+            total += price
+            self.prices.append(price)
+            self.cumsum.append(total)
+        self.dates.extend(dates)
+
+    def window(self, start_date: str, end_date: str) -> tuple[int, int]:
+        """Index bounds [lo, hi) of price_dates within [start_date, end_date]."""
+        return bisect_left(self.dates, start_date), bisect_right(self.dates, end_date)
+
+    def at_or_before(self, price_date: str) -> float | None:
+        """Price of the last point dated on or before price_date."""
+        i = bisect_right(self.dates, price_date)
+        return self.prices[i - 1] if i else None
+
+    def average(self, start_date: str, end_date: str) -> tuple[float, int] | None:
+        """(average_price, count) over the window, or None if it is empty."""
+        lo, hi = self.window(start_date, end_date)
+        if hi <= lo:
+            return None
+        return (self.cumsum[hi] - self.cumsum[lo]) / (hi - lo), hi - lo
+
+
+_lock = threading.Lock()
+_entries: OrderedDict[tuple[int, str | None], CurveSeries] = OrderedDict()
+_generations: dict[int, int] = {}
+_epoch = 0
+_hits = 0
+_misses = 0
+
+
+def get_series(
+    curve_id: int,
+    snapshot_date: str | None,
+    loader: Callable[[], CurveSeries],
+) -> CurveSeries:
+    """Return the cached series for a key, calling loader() on a miss.
+
+    A series loaded while the curve is being invalidated is returned but not
+    stored, so a concurrent write can never leave a stale entry behind.
+    """
+    global _hits, _misses
+    key = (curve_id, snapshot_date)
+    with _lock:
+        series = _entries.get(key)
+        if series is not None:
+            _hits += 1
+            _entries.move_to_end(key)
+            return series
+        _misses += 1
+        generation = (_epoch, _generations.get(curve_id, 0))
+
+    series = loader()
+
+    with _lock:
+        if generation == (_epoch, _generations.get(curve_id, 0)):
+            _entries[key] = series
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return series
+
+
+def append(curve_id: int, points: list[tuple[str, str, float]]) -> None:
+    """Fold newly committed (price_date, snapshot_date, price) rows into the cache.
+
+    Entries whose last price_date precedes every new point are extended in
+    place; any entry the new rows would reorder or override is dropped and
+    reloaded on next use.
+    """
+    with _lock:
+        _generations[curve_id] = _generations.get(curve_id, 0) + 1
+        for key in [k for k in _entries if k[0] == curve_id]:
+            series = _entries[key]
+            snapshot_date = key[1]
+
+            # Per price_date, the row this key would resolve to
+            by_date: dict[str, tuple[str, float]] = {}
+            for price_date, snap, price in points:
+                if snapshot_date is not None and snap != snapshot_date:
+                    continue
+                current = by_date.get(price_date)
+                if current is None or snap > current[0]:
+                    by_date[price_date] = (snap, price)
+            if not by_date:
+                continue
+
+            dates = sorted(by_date)
+            if series.dates and dates[0] <= series.dates[-1]:
+                del _entries[key]
+                continue
+            series.extend(dates, [by_date[d][1] for d in dates])
+
+
+def invalidate(curve_id: int) -> None:
+    """Drop every cached series (all snapshots) for one curve."""
+    with _lock:
+        _generations[curve_id] = _generations.get(curve_id, 0) + 1
+        for key in [k for k in _entries if k[0] == curve_id]:
+            del _entries[key]
+
+
+def clear() -> None:
+    """Drop all cached series and reset the hit/miss counters."""
+    global _epoch, _hits, _misses
+    with _lock:
+        _epoch += 1
+        _entries.clear()
+        _generations.clear()
+        _hits = 0
+        _misses = 0
+
+
+def stats() -> dict[str, int]:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "entries": len(_entries)}
@@ -4,33 +4,20 @@ from collections import defaultdict
 
 from sqlalchemy.orm import Session
 
+from app.instrumentation import instrumented
 from app.models.contract import Contract
-from app.models.shipment import Shipment
-from app.services.pricing_formula_service import get_formula
+from app.services.pricing_formula_service import get_formula_plan
 from app.services.price_curve_service import get_curve_average
+from app.services.position_service import get_positions
 from app.schemas.exposure import ExposureByMonth, ExposureByDirection, ExposureSummary
 
 
-def _get_open_qty(db: Session, contract: Contract) -> float:
-    shipped = (
-        db.query(Shipment)
-        .filter(
-            Shipment.contract_id == contract.id,
-            Shipment.status != "CANCELLED",
-            Shipment.bl_quantity.isnot(None),
-        )
-        .all()
-    )
-    shipped_qty = sum(s.bl_quantity for s in shipped)
-    return contract.quantity - shipped_qty
-
-
 def _get_delivery_month(contract: Contract) -> str:
     """Extract YYYY-MM from delivery_start."""
     return contract.delivery_start[:7]
 
 
-def _try_get_curve_price(db: Session, curve_id: int, month: str) -> float:
+def get_month_curve_price(db: Session, curve_id: int, month: str) -> float:
     """Try to get a representative price for a month. Returns 0 if no data."""
     start = f"{month}-01"
     # End of month approximation
@@ -50,8 +37,10 @@ def _try_get_curve_price(db: Session, curve_id: int, month: str) -> float:
         return 0.0
 
 
+@instrumented
 def compute_exposure(db: Session) -> ExposureSummary:
     contracts = db.query(Contract).filter(Contract.status.in_(["OPEN", "EXECUTED"])).all()
+    positions = get_positions(db, [c.id for c in contracts])
 
     # Group by month
     month_data: dict[str, dict[str, float]] = defaultdict(lambda: {"long": 0.0, "short": 0.0})
@@ -61,12 +50,12 @@ def compute_exposure(db: Session) -> ExposureSummary:
     month_curves: dict[str, int] = {}
 
     for c in contracts:
-        open_qty = _get_open_qty(db, c)
+        open_qty = c.quantity - positions[c.id].shipped_qty
         if open_qty <= 0:
             continue
 
         month = _get_delivery_month(c)
-        formula = get_formula(db, c.pricing_formula_id)
+        formula = get_formula_plan(db, c.pricing_formula_id)
         month_curves[month] = formula.curve_id
 
         if c.direction == "BUY":
@@ -81,7 +70,7 @@ def compute_exposure(db: Session) -> ExposureSummary:
         d = month_data[month]
         net = d["long"] - d["short"]
         curve_id = month_curves.get(month)
-        price = _try_get_curve_price(db, curve_id, month) if curve_id else 0.0
+        price = get_month_curve_price(db, curve_id, month) if curve_id else 0.0
         by_month.append(ExposureByMonth(
             month=month,
             long_quantity=round(d["long"], 2),
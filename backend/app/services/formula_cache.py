@@ -0,0 +1,133 @@
+"""Compiled pricing-formula plans, cached per formula version.
+
+A plan is an immutable snapshot of a PricingFormula and its adjustments with
+each adjustment's assay element resolved to an index into ASSAY_ELEMENTS, so
+evaluation never touches the ORM.
+
+Writers must call bump() after committing a formula change.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from app.models.pricing_formula import PricingFormula
+
+ASSAY_ELEMENTS = ("sio2", "al2o3", "p", "s")
+ASSAY_COLUMNS = ("fe", "moisture", *ASSAY_ELEMENTS)  # assay inputs of evaluate_formula_batch
+
+
+@dataclass(frozen=True, slots=True)
+class AdjustmentPlan:
+    element: str  # label as configured, e.g. "SiO2"
+    index: int  # position in ASSAY_ELEMENTS
+    threshold: float
+    penalty_per_pct: float
+
+
+@dataclass(frozen=True, slots=True)
+class FormulaPlan:
+    id: int | None
+    version: int
+    name: str
+    curve_id: int
+    basis_fe: float
+    fe_rate_per_pct: float
+    moisture_threshold: float
+    moisture_penalty_per_pct: float
+    fixed_premium: float
+    adjustments: tuple[AdjustmentPlan, ...]
+
+
+def compile_formula(formula: PricingFormula, version: int = 0) -> FormulaPlan:
+    """Snapshot an ORM formula into a plan.
+
+    Adjustments on elements that no assay column carries can never apply,
+    so they are dropped here.
+    """
+    adjustments = []
+    for adj in formula.adjustments:
+        element = adj.element.lower()
+        if element in ASSAY_ELEMENTS:
+            adjustments.append(AdjustmentPlan(
+                element=adj.element,
+                index=ASSAY_ELEMENTS.index(element),
+                threshold=adj.threshold,
+                penalty_per_pct=adj.penalty_per_pct,
+            ))
+    return FormulaPlan(
+        id=formula.id,
+        version=version,
+        name=formula.name,
+        curve_id=formula.curve_id,
+        basis_fe=formula.basis_fe,
+        fe_rate_per_pct=formula.fe_rate_per_pct,
+        moisture_threshold=formula.moisture_threshold,
+        moisture_penalty_per_pct=formula.moisture_penalty_per_pct,
+        fixed_premium=formula.fixed_premium,
+        adjustments=tuple(adjustments),
+    )
+
+
+_lock = threading.Lock()
+_plans: dict[int, FormulaPlan] = {}
+_versions: dict[int, int] = {}
+_hits = 0
+_misses = 0
+
+
+def current_version(formula_id: int) -> int:
+    with _lock:
+        return _versions.get(formula_id, 0)
+
+
+def get_cached(formula_id: int) -> FormulaPlan | None:
+    """The cached plan if it is still at the current version, else None."""
+    global _hits
+    with _lock:
+        plan = _plans.get(formula_id)
+        if plan is not None and plan.version == _versions.get(formula_id, 0):
+            _hits += 1
+            return plan
+        return None
+
+
+def store(formula: PricingFormula, version: int) -> FormulaPlan:
+    """Compile a freshly loaded formula and cache it if no write raced the load."""
+    global _misses
+    plan = compile_formula(formula, version)
+    with _lock:
+        _misses += 1
+        if version == _versions.get(formula.id, 0):
+            _plans[formula.id] = plan
+    return plan
+
+
+def get_plan(formula_id: int, loader: Callable[[], PricingFormula]) -> FormulaPlan:
+    """Return the current plan for a formula, calling loader() on a miss."""
+    plan = get_cached(formula_id)
+    if plan is not None:
+        return plan
+    version = current_version(formula_id)
+    return store(loader(), version)
+
+
+def bump(formula_id: int) -> None:
+    """Advance a formula's version stamp, retiring any cached plan."""
+    with _lock:
+        _versions[formula_id] = _versions.get(formula_id, 0) + 1
+        _plans.pop(formula_id, None)
+
+
+def clear() -> None:
+    global _hits, _misses
+    with _lock:
+        _plans.clear()
+        _versions.clear()
+        _hits = 0
+        _misses = 0
+
+
+def stats() -> dict[str, int]:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "entries": len(_plans)}
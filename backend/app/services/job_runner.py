@@ -0,0 +1,81 @@
+"""Worker pool that executes background jobs.
+
+Jobs run on a pool of JOB_WORKERS processes (JOB_EXECUTOR=process), so CPU
+bound valuations neither hold request workers nor contend for the GIL with
+them. Workers are spawned, not forked, and open their own engine on the
+database the job was submitted to, which therefore has to be reachable from
+another process (a SQLite file or PostgreSQL). JOB_EXECUTOR=thread runs them
+on threads of this process instead.
+
+The pool only holds job ids; the jobs table is the queue. Jobs still queued
+when the application stops are picked up again by requeue_pending() at the
+next startup, and a job is claimed atomically, so dispatching one twice
+runs it once. Jobs left RUNNING by a worker that died (no heartbeat for
+JOB_STALE_SECONDS) are requeued first.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services import curve_cache, formula_cache, job_service, result_cache
+
+_lock = threading.Lock()
+_executor: Executor | None = None
+
+
+def _run_in_process(database_url: str, job_id: int) -> str | None:
+    # Other processes invalidate their own caches only: start every job cold
+    curve_cache.clear()
+    formula_cache.clear()
+    return job_service.execute_job(database_url, job_id)
+
+
+def _pool() -> Executor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            if settings.JOB_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix="job")
+            else:
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                )
+        return _executor
+
+
+def _database_url(bind: Engine) -> str:
+    return bind.url.render_as_string(hide_password=False)
+
+
+def dispatch(bind: Engine, job_id: int) -> Future:
+    """Hand a queued job on the database behind bind to the worker pool."""
+    executor = _pool()
+    target = job_service.execute_job if isinstance(executor, ThreadPoolExecutor) else _run_in_process
+    future = executor.submit(target, _database_url(bind), job_id)
+    # A worker process's writes are invisible to this process's result cache
+    future.add_done_callback(lambda _: result_cache.bump())
+    return future
+
+
+def requeue_pending(bind: Engine) -> list[int]:
+    """Dispatch every job still QUEUED, and abandoned RUNNING ones, at startup. Returns their ids."""
+    with Session(bind=bind) as db:
+        job_service.requeue_stale_jobs(db, settings.JOB_STALE_SECONDS)
+        job_ids = job_service.queued_job_ids(db)
+    for job_id in job_ids:
+        dispatch(bind, job_id)
+    return job_ids
+
+
+def shutdown() -> None:
+    """Wait for running jobs and discard the pool; jobs not yet started stay QUEUED."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,332 @@
+"""Background jobs for long service calls.
+
+A job row is written on submit and the call itself runs later on the job
+runner's worker pool (see job_runner), so the HTTP request returns at once
+with the job id. Each worker opens its own engine on the submitting
+database; the run's progress and outcome are written back to the jobs row,
+where they can be polled and fetched.
+
+The work runs in one session and the bookkeeping (claiming the job,
+progress, cancellation checks, the final status) in a second one, so a
+cancelled or failed run rolls back without losing its status. The wrapped
+services only write at the very end of a run, which keeps the progress
+updates from waiting on their locks.
+
+While a job runs, a heartbeat thread refreshes its heartbeat_at every
+JOB_HEARTBEAT_SECONDS. A RUNNING job whose heartbeat went quiet belonged to
+a worker that died with it; requeue_stale_jobs() puts it back in the queue
+(its work session's writes were never committed).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import build_engine
+from app.models.job import Job
+from app.schemas.match import FifoRunRequest, MatchingRunRequest, MatchOut
+from app.schemas.mtm import MtmBackfillRequest, MtmBackfillResult, MtmPortfolioOut, MtmRunRequest
+from app.services import matching_service, mtm_service, pricing_service
+from app.services.pagination import Page, paginate
+
+log = logging.getLogger(__name__)
+
+LIST_KEYS = (Job.id,)
+
+TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+# Minimum seconds between progress writes (and cancellation checks) of a run
+PROGRESS_INTERVAL = 0.5
+
+
+class _NoParams(BaseModel):
+    model_config = {"extra": "forbid"}
+
+
+@dataclass(frozen=True)
+class JobKind:
+    run: Callable[..., Any]  # run(db, **params, progress=...)
+    params: type[BaseModel]
+    result: TypeAdapter
+
+
+JOB_KINDS = {
+    "mtm_portfolio": JobKind(
+        run=mtm_service.run_mtm_portfolio,
+        params=MtmRunRequest,
+        result=TypeAdapter(MtmPortfolioOut),
+    ),
+    "mtm_backfill": JobKind(
+        run=mtm_service.backfill_mtm,
+        params=MtmBackfillRequest,
+        result=TypeAdapter(MtmBackfillResult),
+    ),
+    "value_all_positions": JobKind(
+        run=pricing_service.value_all_positions,
+        params=_NoParams,
+        result=TypeAdapter(dict[str, Any]),
+    ),
+    "fifo_matching": JobKind(
+        run=matching_service.run_fifo_matching,
+        params=FifoRunRequest,
+        result=TypeAdapter(list[MatchOut]),
+    ),
+    "matching": JobKind(
+        run=matching_service.run_matching,
+        params=MatchingRunRequest,
+        result=TypeAdapter(list[MatchOut]),
+    ),
+}
+
+
+class JobCancelled(Exception):
+    """Raised from a run's progress callback once cancellation was requested."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _validate_params(kind: str, params: dict) -> dict:
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=422, detail=f"Unknown job kind: {kind}")
+    try:
+        return JOB_KINDS[kind].params.model_validate(params).model_dump(mode="json")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid params for {kind}: {e.errors()[0]['msg']}")
+
+
+def _get_by_key(db: Session, idempotency_key: str) -> Job | None:
+    return db.query(Job).filter(Job.idempotency_key == idempotency_key).first()
+
+
+def _replay(job: Job, kind: str, params: dict) -> Job:
+    if job.kind != kind or job.params != params:
+        raise HTTPException(status_code=409, detail="Idempotency key was used for a different job")
+    return job
+
+
+def submit_job(
+    db: Session, kind: str, params: dict, idempotency_key: str | None = None,
+) -> tuple[Job, bool]:
+    """Record a QUEUED job. Returns (job, created).
+
+    Resubmitting with the same idempotency key returns the original job
+    instead of starting the work again; reusing a key for a different
+    kind or params is a 409.
+    """
+    params = _validate_params(kind, params)
+    if idempotency_key:
+        existing = _get_by_key(db, idempotency_key)
+        if existing:
+            return _replay(existing, kind, params), False
+
+    job = Job(kind=kind, params=params, idempotency_key=idempotency_key, created_at=_now())
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent submit with the same key won the insert
+        db.rollback()
+        return _replay(_get_by_key(db, idempotency_key), kind, params), False
+    db.refresh(job)
+    return job, True
+
+
+def get_job(db: Session, job_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def list_jobs(
+    db: Session,
+    kind: str | None = None,
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> Page[Job]:
+    """Jobs newest first."""
+    q = db.query(Job)
+    if kind:
+        q = q.filter(Job.kind == kind)
+    if status:
+        q = q.filter(Job.status == status)
+    return paginate(q, LIST_KEYS, cursor, limit, descending=True)
+
+
+def get_job_result(db: Session, job_id: int) -> Any:
+    job = get_job(db, job_id)
+    if job.status != "SUCCEEDED":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, no result available")
+    return job.result
+
+
+def cancel_job(db: Session, job_id: int) -> Job:
+    """Cancel a queued job outright, or ask a running one to stop.
+
+    A running job stops at its next progress report and rolls back.
+    """
+    job = get_job(db, job_id)
+    cancelled = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "QUEUED")
+        .values(status="CANCELLED", cancel_requested=True, finished_at=_now())
+    ).rowcount
+    requested = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "RUNNING").values(cancel_requested=True)
+    ).rowcount
+    db.commit()
+    db.refresh(job)
+    if not (cancelled or requested):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job
+
+
+def queued_job_ids(db: Session) -> list[int]:
+    """Jobs submitted but never started, oldest first (e.g. after a restart)."""
+    return [job_id for (job_id,) in db.query(Job.id).filter(Job.status == "QUEUED").order_by(Job.id)]
+
+
+def requeue_stale_jobs(db: Session, stale_seconds: float) -> int:
+    """Requeue RUNNING jobs without a heartbeat for stale_seconds. Returns how many.
+
+    A stale job whose cancellation was requested is marked CANCELLED instead.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=stale_seconds)).isoformat()
+    stale = (Job.status == "RUNNING", func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff)
+    cancelled = db.execute(
+        update(Job).where(*stale, Job.cancel_requested.is_(True)).values(status="CANCELLED", finished_at=_now())
+    ).rowcount
+    requeued = db.execute(
+        update(Job).where(*stale).values(
+            status="QUEUED", started_at=None, heartbeat_at=None, progress_done=0, progress_total=None,
+        )
+    ).rowcount
+    db.commit()
+    if cancelled or requeued:
+        log.warning("Requeued %d and cancelled %d abandoned RUNNING jobs", requeued, cancelled)
+    return requeued
+
+
+# --- Execution (runs on a job worker) ---
+
+_sessions: dict[str, sessionmaker] = {}
+
+
+def _session_factory(database_url: str) -> sessionmaker:
+    # One engine per database and worker process, kept for the worker's lifetime
+    if database_url not in _sessions:
+        _sessions[database_url] = sessionmaker(
+            autocommit=False, autoflush=False, bind=build_engine(database_url),
+        )
+    return _sessions[database_url]
+
+
+def _claim(control: Session, job_id: int) -> Job | None:
+    """Move a QUEUED job to RUNNING. None if another worker or a cancel got there first."""
+    claimed = control.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "QUEUED")
+        .values(status="RUNNING", started_at=_now(), heartbeat_at=_now())
+    ).rowcount
+    control.commit()
+    return control.get(Job, job_id) if claimed else None
+
+
+def _progress_reporter(control: Session, job: Job) -> Callable[[int, int], None]:
+    last = float("-inf")
+
+    def report(done: int, total: int) -> None:
+        nonlocal last
+        now = time.monotonic()
+        if now - last < PROGRESS_INTERVAL and done < total:
+            return
+        last = now
+        job.progress_done, job.progress_total = done, total
+        control.commit()
+        control.refresh(job, ["cancel_requested"])
+        if job.cancel_requested:
+            raise JobCancelled()
+
+    return report
+
+
+@contextmanager
+def _heartbeat(factory: sessionmaker, job_id: int):
+    """Refresh the job's heartbeat_at every JOB_HEARTBEAT_SECONDS until the block exits."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+            try:
+                with factory() as db:
+                    db.execute(
+                        update(Job).where(Job.id == job_id, Job.status == "RUNNING").values(heartbeat_at=_now())
+                    )
+                    db.commit()
+            except Exception:
+                log.warning("Heartbeat of job %s failed", job_id, exc_info=True)
+
+    thread = threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _finish(control: Session, job: Job, status: str, **values) -> None:
+    job.status = status
+    job.finished_at = _now()
+    for name, value in values.items():
+        setattr(job, name, value)
+    control.commit()
+
+
+def execute_job(database_url: str, job_id: int) -> str | None:
+    """Run one queued job to completion. Returns its final status.
+
+    None means the job was no longer QUEUED (already taken or cancelled).
+    """
+    factory = _session_factory(database_url)
+    with factory() as control:
+        job = _claim(control, job_id)
+        if job is None:
+            return None
+        kind = JOB_KINDS[job.kind]
+        with _heartbeat(factory, job_id), factory() as work:
+            try:
+                result = kind.run(work, **job.params, progress=_progress_reporter(control, job))
+                payload = kind.result.dump_python(
+                    kind.result.validate_python(result, from_attributes=True), mode="json",
+                )
+            except JobCancelled:
+                work.rollback()
+                _finish(control, job, "CANCELLED")
+            except HTTPException as e:
+                work.rollback()
+                _finish(control, job, "FAILED", error=str(e.detail))
+            except Exception as e:
+                log.exception("Job %s (%s) failed", job_id, job.kind)
+                work.rollback()
+                control.rollback()
+                _finish(control, job, "FAILED", error=f"{type(e).__name__}: {e}")
+            else:
+                if job.progress_total is None:
+                    job.progress_total = job.progress_done
+                _finish(control, job, "SUCCEEDED", result=payload, progress_done=job.progress_total)
+        return job.status
@@ -1,37 +1,45 @@
-"""FIFO buy/sell matching engine.
+"""Buy/sell matching engine.
 
-Sort BUYs and SELLs by delivery_start ASC, match sequentially, partial matches allowed.
+Pairs open BUY and SELL quantity by one of the strategies in
+matching_strategies (FIFO by default: BUYs and SELLs by delivery_start ASC,
+matched sequentially, partial matches allowed).
 Realized P&L = (sell_price - buy_price) × matched_qty
+
+Each FIFO run records the contract inputs it matched (matching_inputs). An
+incremental run compares the book against them: matching is cumulative in
+delivery order, so matches between contracts that all start before the
+earliest changed delivery_start cannot change and are kept, and only the
+rest of the book is matched again. Either way the result is diffed against
+the stored matches by (buy, sell) pair, so unchanged matches keep their id
+and match_date. Manual match edits drop the recorded inputs, and the next
+run is a full one, as is the first FIFO run after another strategy.
 """
 
 from datetime import date
+from typing import Callable, Iterator
 
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from app.instrumentation import instrumented
 from app.models.contract import Contract
-from app.models.shipment import Shipment
-from app.models.match import Match
+from app.models.match import Match, MatchingInput
+from app.schemas.common import MatchingStrategy
+from app.schemas.match import MatchCreate, MatchOut
+from app.services.matching_strategies import QUANTITY_TOLERANCE, STRATEGIES, ContractInput
+from app.services.pagination import Page, paginate, stream_ndjson
+from app.services.position_service import get_weighted_avg_prices
 
+LIST_KEYS = (Match.id,)
 
-def _get_weighted_avg_price(db: Session, contract_id: int) -> float | None:
-    """Weighted average price for a contract (final > provisional)."""
-    shipments = (
-        db.query(Shipment)
-        .filter(Shipment.contract_id == contract_id, Shipment.status != "CANCELLED")
-        .all()
-    )
-    total_qty = 0.0
-    total_value = 0.0
-    for s in shipments:
-        price = s.final_price or s.provisional_price
-        qty = s.bl_quantity
-        if price is not None and qty is not None:
-            total_qty += qty
-            total_value += price * qty
-    if total_qty == 0:
-        return None
-    return total_value / total_qty
+OPEN_STATUSES = ("OPEN", "EXECUTED")
+
+# Ids per IN (...) list when writing back a diff
+WRITE_BATCH_SIZE = 5000
+
+# Matched values compared when diffing a run against the stored matches
+MATCH_FIELDS = ("matched_quantity", "buy_price", "sell_price", "realized_pnl")
 
 
 def _get_matched_qty(db: Session, contract_id: int, direction: str) -> float:
@@ -43,76 +51,142 @@ def _get_matched_qty(db: Session, contract_id: int, direction: str) -> float:
     return sum(m.matched_quantity for m in matches)
 
 
-def run_fifo_matching(db: Session) -> list[Match]:
-    """Run FIFO matching across all open/executed contracts.
+def _current_inputs(db: Session) -> dict[int, ContractInput]:
+    prices = get_weighted_avg_prices(db)
+    rows = db.query(Contract.id, Contract.direction, Contract.delivery_start, Contract.quantity).filter(
+        Contract.status.in_(OPEN_STATUSES),
+    )
+    return {cid: ContractInput(cid, direction, start, qty, prices.get(cid)) for cid, direction, start, qty in rows}
 
-    Clears existing matches and re-runs from scratch.
-    """
-    # Clear existing matches
-    db.query(Match).delete()
-    db.flush()
 
-    buys = (
-        db.query(Contract)
-        .filter(Contract.direction == "BUY", Contract.status.in_(["OPEN", "EXECUTED"]))
-        .order_by(Contract.delivery_start)
-        .all()
-    )
-    sells = (
-        db.query(Contract)
-        .filter(Contract.direction == "SELL", Contract.status.in_(["OPEN", "EXECUTED"]))
-        .order_by(Contract.delivery_start)
-        .all()
-    )
+def _recorded_inputs(db: Session) -> dict[int, ContractInput]:
+    return {
+        row[0]: ContractInput(*row)
+        for row in db.query(
+            MatchingInput.contract_id, MatchingInput.direction, MatchingInput.delivery_start,
+            MatchingInput.quantity, MatchingInput.price,
+        )
+    }
 
-    # Build remaining qty maps
-    buy_remaining = {b.id: b.quantity for b in buys}
-    sell_remaining = {s.id: s.quantity for s in sells}
 
-    buy_prices = {b.id: _get_weighted_avg_price(db, b.id) for b in buys}
-    sell_prices = {s.id: _get_weighted_avg_price(db, s.id) for s in sells}
+def _changed(current: dict[int, ContractInput], recorded: dict[int, ContractInput]) -> list[int]:
+    """Contracts added, removed or changed since the recorded run."""
+    return [cid for cid in current.keys() | recorded.keys() if current.get(cid) != recorded.get(cid)]
+
+
+def _batches(items: list, size: int = WRITE_BATCH_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _record_inputs(db: Session, inputs: dict[int, ContractInput], contract_ids: list[int] | None = None) -> None:
+    """Record the current inputs of contract_ids (absent from inputs: removed), or of the whole book if None."""
+    if contract_ids is None:
+        db.execute(delete(MatchingInput))
+        contract_ids = list(inputs)
+    else:
+        for batch in _batches(contract_ids):
+            db.execute(delete(MatchingInput).where(MatchingInput.contract_id.in_(batch)))
+    rows = [inputs[cid]._asdict() for cid in contract_ids if cid in inputs]
+    if rows:
+        db.execute(insert(MatchingInput), rows)
+
+
+def _forget_inputs(db: Session) -> None:
+    """Matches were edited by hand: the next run has to start from scratch."""
+    db.execute(delete(MatchingInput))
 
-    matches = []
-    today = date.today().isoformat()
 
-    si = 0  # sell index
-    for buy in buys:
-        while si < len(sells) and buy_remaining[buy.id] > 0:
-            sell = sells[si]
-            if sell_remaining[sell.id] <= 0:
-                si += 1
-                continue
-
-            match_qty = min(buy_remaining[buy.id], sell_remaining[sell.id])
-            bp = buy_prices[buy.id]
-            sp = sell_prices[sell.id]
-
-            realized_pnl = None
-            if bp is not None and sp is not None:
-                realized_pnl = round((sp - bp) * match_qty, 2)
-
-            m = Match(
-                buy_contract_id=buy.id,
-                sell_contract_id=sell.id,
-                matched_quantity=round(match_qty, 4),
-                buy_price=round(bp, 4) if bp else None,
-                sell_price=round(sp, 4) if sp else None,
-                realized_pnl=realized_pnl,
-                match_date=today,
-            )
-            db.add(m)
-            matches.append(m)
-
-            buy_remaining[buy.id] -= match_qty
-            sell_remaining[sell.id] -= match_qty
-
-            if sell_remaining[sell.id] <= 0:
-                si += 1
+@instrumented
+def run_matching(
+    db: Session,
+    strategy: MatchingStrategy | str = MatchingStrategy.FIFO,
+    progress: Callable[[int, int], None] | None = None,
+    incremental: bool = False,
+) -> list[Match]:
+    """Match all open/executed contracts with the given strategy.
+
+    Replaces every existing match with the strategy's result. With
+    incremental (FIFO only), only the part of the book from the earliest
+    delivery_start changed since the last run is matched again; without a
+    previous run to compare against, it matches the whole book. Matches are
+    only written where they differ from the stored ones. progress(done,
+    total) is called as the strategy goes.
+    """
+    strategy = MatchingStrategy(strategy)
+    if incremental and strategy != MatchingStrategy.FIFO:
+        raise HTTPException(status_code=400, detail="Incremental matching is only supported for FIFO")
+    current = _current_inputs(db)
+    recorded = _recorded_inputs(db) if incremental else {}
+    changed_ids = _changed(current, recorded) if recorded else None
+    if changed_ids is None:
+        resume = ""  # the whole book
+    elif changed_ids:
+        resume = min(i.delivery_start for cid in changed_ids for i in (current.get(cid), recorded.get(cid)) if i)
+    else:
+        return db.query(Match).order_by(Match.id).all()
+
+    stored = db.query(
+        Match.id, Match.buy_contract_id, Match.sell_contract_id, *(getattr(Match, f) for f in MATCH_FIELDS),
+    ).all()
+
+    def settled(cid: int) -> bool:
+        return cid in current and current[cid].delivery_start < resume
+
+    # Matches between contracts before the resume point stand; the rest are redone
+    remaining = {cid: i.quantity for cid, i in current.items()}
+    redo = {}
+    stale = []
+    for row in stored:
+        key = (row.buy_contract_id, row.sell_contract_id)
+        if settled(row.buy_contract_id) and settled(row.sell_contract_id):
+            remaining[row.buy_contract_id] -= row.matched_quantity
+            remaining[row.sell_contract_id] -= row.matched_quantity
+        elif key in redo:
+            stale.append(row.id)  # a second match of the same pair, e.g. manual
+        else:
+            redo[key] = row
+
+    order = sorted(
+        (i for i in current.values() if remaining[i.contract_id] > QUANTITY_TOLERANCE),
+        key=lambda i: (i.delivery_start, i.contract_id),
+    )
+    matches = STRATEGIES[strategy](
+        [i for i in order if i.direction == "BUY"], [i for i in order if i.direction == "SELL"], remaining, progress,
+    )
 
+    # Diff against the stored matches being redone
+    today = date.today().isoformat()
+    stale += [row.id for key, row in redo.items() if key not in matches]
+    changed, added = [], []
+    for (buy_id, sell_id), values in matches.items():
+        row = redo.get((buy_id, sell_id))
+        if row is None:
+            added.append({"buy_contract_id": buy_id, "sell_contract_id": sell_id, "match_date": today, **values})
+        elif any(getattr(row, f) != values[f] for f in MATCH_FIELDS):
+            changed.append({"id": row.id, "match_date": today, **values})
+
+    for batch in _batches(stale):
+        db.execute(delete(Match).where(Match.id.in_(batch)))
+    if changed:
+        db.execute(update(Match), changed)
+    if added:
+        db.execute(insert(Match), added)
+    if strategy == MatchingStrategy.FIFO:
+        _record_inputs(db, current, changed_ids)
+    else:
+        _forget_inputs(db)
     db.commit()
-    for m in matches:
-        db.refresh(m)
-    return matches
+    return db.query(Match).order_by(Match.id).all()
+
+
+def run_fifo_matching(
+    db: Session,
+    progress: Callable[[int, int], None] | None = None,
+    incremental: bool = False,
+) -> list[Match]:
+    """Run FIFO matching across all open/executed contracts (see run_matching)."""
+    return run_matching(db, MatchingStrategy.FIFO, progress, incremental)
 
 
 def create_manual_match(
@@ -121,35 +195,61 @@ def create_manual_match(
     sell_contract_id: int,
     matched_quantity: float,
     match_date: str,
-) -> Match:
-    buy = db.query(Contract).filter(Contract.id == buy_contract_id).first()
-    sell = db.query(Contract).filter(Contract.id == sell_contract_id).first()
-    if not buy or buy.direction != "BUY":
-        raise HTTPException(status_code=400, detail="Invalid buy contract")
-    if not sell or sell.direction != "SELL":
-        raise HTTPException(status_code=400, detail="Invalid sell contract")
-
-    bp = _get_weighted_avg_price(db, buy_contract_id)
-    sp = _get_weighted_avg_price(db, sell_contract_id)
-    realized_pnl = round((sp - bp) * matched_quantity, 2) if bp and sp else None
-
-    m = Match(
-        buy_contract_id=buy_contract_id,
-        sell_contract_id=sell_contract_id,
-        matched_quantity=round(matched_quantity, 4),
-        buy_price=round(bp, 4) if bp else None,
-        sell_price=round(sp, 4) if sp else None,
-        realized_pnl=realized_pnl,
-        match_date=match_date,
-    )
-    db.add(m)
+) -> MatchOut:
+    [match] = create_manual_matches(db, [MatchCreate(
+        buy_contract_id=buy_contract_id, sell_contract_id=sell_contract_id,
+        matched_quantity=matched_quantity, match_date=match_date,
+    )])
+    return match
+
+
+@instrumented
+def create_manual_matches(db: Session, items: list[MatchCreate]) -> list[MatchOut]:
+    """Create manual matches in one transaction; any invalid pair rejects the batch.
+
+    Contracts and weighted prices are loaded once for the whole batch and the
+    matches written in one INSERT ... RETURNING.
+    """
+    ids = {i.buy_contract_id for i in items} | {i.sell_contract_id for i in items}
+    directions = dict(db.query(Contract.id, Contract.direction).filter(Contract.id.in_(ids)).all())
+    prices = get_weighted_avg_prices(db, list(ids))
+
+    rows = []
+    for index, item in enumerate(items):
+        suffix = f" (item {index})" if len(items) > 1 else ""
+        if directions.get(item.buy_contract_id) != "BUY":
+            raise HTTPException(status_code=400, detail=f"Invalid buy contract{suffix}")
+        if directions.get(item.sell_contract_id) != "SELL":
+            raise HTTPException(status_code=400, detail=f"Invalid sell contract{suffix}")
+        bp = prices.get(item.buy_contract_id)
+        sp = prices.get(item.sell_contract_id)
+        rows.append({
+            "buy_contract_id": item.buy_contract_id,
+            "sell_contract_id": item.sell_contract_id,
+            "matched_quantity": round(item.matched_quantity, 4),
+            "buy_price": round(bp, 4) if bp else None,
+            "sell_price": round(sp, 4) if sp else None,
+            "realized_pnl": round((sp - bp) * item.matched_quantity, 2) if bp and sp else None,
+            "match_date": item.match_date,
+        })
+    if not rows:
+        return []
+
+    # One multi-row INSERT: ids are assigned in row order, but RETURNING's own order is
+    # unspecified (and asking SQLAlchemy to keep it costs a statement per row on SQLite)
+    matches = sorted(db.scalars(insert(Match).returning(Match), rows), key=lambda m: m.id)
+    out = [MatchOut.model_validate(m) for m in matches]
+    _forget_inputs(db)
     db.commit()
-    db.refresh(m)
-    return m
+    return out
+
+
+def list_matches(db: Session, cursor: str | None = None, limit: int | None = None) -> Page[Match]:
+    return paginate(db.query(Match), LIST_KEYS, cursor, limit)
 
 
-def list_matches(db: Session) -> list[Match]:
-    return db.query(Match).all()
+def stream_matches(db: Session) -> Iterator[str]:
+    return stream_ndjson(db, lambda s: s.query(Match), LIST_KEYS, MatchOut)
 
 
 def delete_match(db: Session, match_id: int) -> None:
@@ -157,6 +257,7 @@ def delete_match(db: Session, match_id: int) -> None:
     if not m:
         raise HTTPException(status_code=404, detail="Match not found")
     db.delete(m)
+    _forget_inputs(db)
     db.commit()
 
 
@@ -164,5 +265,6 @@ def unwind_all(db: Session) -> int:
     """Delete all matches. Returns count deleted."""
     count = db.query(Match).count()
     db.query(Match).delete()
+    _forget_inputs(db)
     db.commit()
     return count
@@ -0,0 +1,189 @@
+"""Allocation policies pairing open BUY and SELL quantity.
+
+Every strategy has the same shape: it gets the book's buys and sells, each
+sorted by (delivery_start, contract_id), and the quantity of each contract
+still to match; it takes what it matches off remaining and returns
+{(buy_id, sell_id): matched values}. Realized P&L of a pair is
+(sell_price - buy_price) × matched_qty, None when either side is unpriced.
+
+All of them match as much quantity as the book allows (the smaller of the
+open BUY and SELL totals); they differ in which contracts get paired.
+
+FIFO     buys and sells both taken in delivery order
+LIFO     walking the book in delivery order, each contract closes the most
+         recently delivered open contracts of the other direction (a stack
+         per direction)
+NEAREST  repeatedly the open buy/sell pair with the closest delivery starts
+         (a heap over neighbours in delivery order)
+OPTIMAL  the most realized P&L. A pair's P&L splits into a sell term and a
+         buy term, so the min-cost flow over all buy/sell pairs comes down
+         to pairing the cheapest buys with the dearest sells; unpriced
+         contracts are matched last.
+"""
+
+import heapq
+from datetime import date
+from typing import Callable, NamedTuple
+
+from app.schemas.common import MatchingStrategy
+
+# Remaining quantity below half the stored precision (4 dp) counts as fully matched
+QUANTITY_TOLERANCE = 5e-5
+
+
+class ContractInput(NamedTuple):
+    contract_id: int
+    direction: str
+    delivery_start: str
+    quantity: float
+    price: float | None
+
+
+Progress = Callable[[int, int], None] | None
+Strategy = Callable[
+    [list[ContractInput], list[ContractInput], dict[int, float], Progress],
+    dict[tuple[int, int], dict],
+]
+
+
+def _values(buy: ContractInput, sell: ContractInput, quantity: float) -> dict:
+    bp = buy.price
+    sp = sell.price
+    realized_pnl = None
+    if bp is not None and sp is not None:
+        realized_pnl = round((sp - bp) * quantity, 2)
+    return {
+        "matched_quantity": round(quantity, 4),
+        "buy_price": round(bp, 4) if bp else None,
+        "sell_price": round(sp, 4) if sp else None,
+        "realized_pnl": realized_pnl,
+    }
+
+
+def _match(
+    matches: dict, remaining: dict[int, float], buy: ContractInput, sell: ContractInput,
+) -> None:
+    quantity = min(remaining[buy.contract_id], remaining[sell.contract_id])
+    matches[(buy.contract_id, sell.contract_id)] = _values(buy, sell, quantity)
+    remaining[buy.contract_id] -= quantity
+    remaining[sell.contract_id] -= quantity
+
+
+def _open(remaining: dict[int, float], contract: ContractInput) -> bool:
+    return remaining[contract.contract_id] > QUANTITY_TOLERANCE
+
+
+def _paired(
+    buys: list[ContractInput],
+    sells: list[ContractInput],
+    remaining: dict[int, float],
+    progress: Progress,
+) -> dict[tuple[int, int], dict]:
+    """Match buys against sells in the given orders, two pointers; progress counts buys."""
+    matches = {}
+    si = 0  # sell index
+    for done, buy in enumerate(buys, 1):
+        while si < len(sells) and _open(remaining, buy):
+            sell = sells[si]
+            if _open(remaining, sell):
+                _match(matches, remaining, buy, sell)
+            if not _open(remaining, sell):
+                si += 1
+        if progress:
+            progress(done, len(buys))
+    return matches
+
+
+def fifo(buys, sells, remaining, progress=None):
+    """Earliest buy against earliest sell."""
+    return _paired(buys, sells, remaining, progress)
+
+
+def lifo(buys, sells, remaining, progress=None):
+    """Each contract, in delivery order, closes the latest open contracts of the other direction."""
+    book = sorted(buys + sells, key=lambda c: (c.delivery_start, c.contract_id))
+    stacks = {"BUY": [], "SELL": []}
+    matches = {}
+    for done, contract in enumerate(book, 1):
+        other = stacks["SELL" if contract.direction == "BUY" else "BUY"]
+        while other and _open(remaining, contract):
+            top = other[-1]
+            buy, sell = (contract, top) if contract.direction == "BUY" else (top, contract)
+            _match(matches, remaining, buy, sell)
+            if not _open(remaining, top):
+                other.pop()
+        if _open(remaining, contract):
+            stacks[contract.direction].append(contract)
+        if progress:
+            progress(done, len(book))
+    return matches
+
+
+def nearest(buys, sells, remaining, progress=None):
+    """The open buy/sell pair with the closest delivery starts, until one side runs out.
+
+    The closest opposite pair is always adjacent in delivery order (anything
+    between them pairs closer with one of the two), so only neighbours go on
+    the heap: a doubly linked list over the book drops closed contracts and
+    each removal adds at most one new neighbour pair.
+    """
+    book = sorted(buys + sells, key=lambda c: (c.delivery_start, c.contract_id))
+    days = [date.fromisoformat(c.delivery_start).toordinal() for c in book]
+    prev = list(range(-1, len(book) - 1))
+    nxt = list(range(1, len(book) + 1))
+    closed = [False] * len(book)
+    heap = []
+
+    def push(left: int, right: int) -> None:
+        if left >= 0 and right < len(book) and book[left].direction != book[right].direction:
+            heapq.heappush(heap, (days[right] - days[left], left, right))
+
+    def close(i: int) -> None:
+        closed[i] = True
+        if prev[i] >= 0:
+            nxt[prev[i]] = nxt[i]
+        if nxt[i] < len(book):
+            prev[nxt[i]] = prev[i]
+
+    for i in range(len(book) - 1):
+        push(i, i + 1)
+    matches = {}
+    done = 0
+    while heap:
+        _, left, right = heapq.heappop(heap)
+        if closed[left] or closed[right] or nxt[left] != right:
+            continue  # no longer neighbours
+        a, b = book[left], book[right]
+        buy, sell = (a, b) if a.direction == "BUY" else (b, a)
+        _match(matches, remaining, buy, sell)
+        for i in (left, right):
+            if not _open(remaining, book[i]):
+                close(i)
+                done += 1
+        if closed[left] and closed[right]:
+            push(prev[left], nxt[right])
+        elif closed[left]:
+            push(prev[left], right)
+        else:
+            push(left, nxt[right])
+        if progress:
+            progress(done, len(book))
+    return matches
+
+
+def optimal(buys, sells, remaining, progress=None):
+    """Cheapest buys against dearest sells: the most realized P&L for the matchable quantity."""
+    return _paired(
+        sorted(buys, key=lambda c: (c.price is None, c.price or 0.0)),
+        sorted(sells, key=lambda c: (c.price is None, -(c.price or 0.0))),
+        remaining,
+        progress,
+    )
+
+
+STRATEGIES: dict[MatchingStrategy, Strategy] = {
+    MatchingStrategy.FIFO: fifo,
+    MatchingStrategy.LIFO: lifo,
+    MatchingStrategy.NEAREST: nearest,
+    MatchingStrategy.OPTIMAL: optimal,
+}
@@ -0,0 +1,105 @@
+"""Pure MTM arithmetic, and the process pool portfolio runs spread their partitions over.
+
+mtm_values() works on plain floats: no engine, ORM or request state. A
+portfolio run (mtm_service) cuts the book into PartitionTasks, one curve
+price plus the formulas and contract id range of the contracts priced off
+it. Tasks pickle to a few numbers: a worker process loads its partition's
+contracts and shipment aggregates on its own connection, values them and
+sends back compact (contract id, direction, values) rows, which the caller
+writes in one bulk upsert. The serial path runs the same task function in
+the calling process, so both produce identical records.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, NamedTuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MtmInput(NamedTuple):
+    index: int  # position in the portfolio
+    contract_id: int
+    direction: str  # BUY or SELL
+    open_qty: float
+    contract_price: float | None  # weighted shipment price
+
+
+class MtmValues(NamedTuple):
+    curve_price: float
+    contract_price: float | None
+    open_quantity: float
+    mtm_value: float
+
+
+class PartitionTask(NamedTuple):
+    database_url: str  # workers open their own engine on it
+    curve_price: float
+    formula_ids: tuple[int, ...]  # the formulas priced off the curve
+    first_id: int  # contract id range, inclusive
+    last_id: int
+
+
+# (contract id, direction, values) of one valued contract
+MtmRow = tuple[int, str, MtmValues]
+
+
+def mtm_values(direction: str, curve_price: float, open_qty: float, contract_price: float | None) -> MtmValues:
+    """MTM = (curve - contract price) × open quantity × direction factor, rounded for storage."""
+    if open_qty <= 0:
+        # No open position — MTM is 0 but still report actual curve price
+        return MtmValues(round(curve_price, 4), None, 0, 0)
+
+    direction_factor = 1.0 if direction == "BUY" else -1.0
+
+    if contract_price is not None:
+        mtm_value = (curve_price - contract_price) * open_qty * direction_factor
+    else:
+        mtm_value = 0.0
+
+    return MtmValues(
+        curve_price=round(curve_price, 4),
+        contract_price=round(contract_price, 4) if contract_price else None,
+        open_quantity=round(open_qty, 4),
+        mtm_value=round(mtm_value, 2),
+    )
+
+
+def split(ids: list[int], chunk_size: int) -> list[tuple[int, int]]:
+    """(first, last) id ranges of at most chunk_size sorted ids each."""
+    return [
+        (ids[start], ids[min(start + chunk_size, len(ids)) - 1])
+        for start in range(0, len(ids), chunk_size)
+    ]
+
+
+_lock = threading.Lock()
+# One pool per worker count, never replaced: a run maps on its pool while another asks for a different size
+_executors: dict[int, ProcessPoolExecutor] = {}
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    with _lock:
+        if workers not in _executors:
+            _executors[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executors[workers]
+
+
+def map_tasks(fn: Callable[[T], R], tasks: Iterable[T], workers: int = 1) -> Iterator[R]:
+    """fn over tasks, in this process or on workers > 1 processes; results in task order."""
+    if workers > 1:
+        return _pool(workers).map(fn, tasks)
+    return map(fn, tasks)
+
+
+def shutdown() -> None:
+    """Stop the worker processes (application shutdown)."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
@@ -4,41 +4,52 @@ MTM = (Curve Price - Contract Price) × Open Quantity × Direction Factor
 Direction: +1 BUY, -1 SELL
 """
 
-from sqlalchemy.orm import Session
+import functools
+from datetime import date, timedelta
+from typing import Callable, Iterator
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import Session, sessionmaker
 from fastapi import HTTPException
 
+from app.instrumentation import instrumented
+from app.config import settings
+from app.database import build_engine
 from app.models.contract import Contract
-from app.models.shipment import Shipment
-from app.models.mtm import MtmRecord
-from app.services.price_curve_service import get_curve_average
-from app.services.pricing_formula_service import get_formula
-from app.services.contract_service import get_open_quantity, get_contract
-from app.schemas.mtm import MtmRecordOut, MtmPortfolioOut
-
-
-def _get_contract_price(db: Session, contract: Contract) -> float | None:
-    """Weighted average price across shipments (final > provisional)."""
-    shipments = (
-        db.query(Shipment)
-        .filter(Shipment.contract_id == contract.id, Shipment.status != "CANCELLED")
-        .all()
-    )
+from app.models.mtm import LatestMtm, MtmRecord
+from app.models.price_curve import CurveData
+from app.services.curve_cache import CurveSeries
+from app.services.price_curve_service import get_curve_series
+from app.services.pricing_formula_service import get_formula_plan, get_formula_plans
+from app.services.contract_service import get_contract
+from app.services.mtm_compute import MtmInput, MtmRow, MtmValues, PartitionTask, map_tasks, mtm_values, split
+from app.services.pagination import Page, paginate, stream_ndjson
+from app.services.position_service import EMPTY, get_contract_aggregate, get_contract_aggregates
+from app.schemas.common import SnapshotPolicy
+from app.schemas.mtm import MtmBackfillResult, MtmDateTotal, MtmRecordOut, MtmPortfolioOut
+
+OPEN_STATUSES = ("OPEN", "EXECUTED")
+
+# Rows per INSERT statement when writing a backfill
+BACKFILL_BATCH_SIZE = 5000
+
+# Contracts per partition on the serial path, so progress moves within a busy curve
+SERIAL_CHUNK = 1000
+
+# History is listed newest first (ix_mtm_history_date_id)
+HISTORY_KEYS = (MtmRecord.valuation_date, MtmRecord.id)
 
-    total_qty = 0.0
-    total_value = 0.0
-    for s in shipments:
-        price = s.final_price or s.provisional_price
-        qty = s.bl_quantity
-        if price is not None and qty is not None:
-            total_qty += qty
-            total_value += price * qty
 
-    if total_qty == 0:
-        return None
-    return total_value / total_qty
+def _price_at(series: CurveSeries, valuation_date: str) -> float | None:
+    """Latest-snapshot fallback price for a valuation date, or None if the curve is empty."""
+    price = series.at_or_before(valuation_date)
+    if price is None and series.prices:
+        # Valuation date before the curve starts: its most recent price
+        price = series.prices[-1]
+    return price
 
 
-def _get_current_curve_price(
+def get_current_curve_price(
     db: Session,
     curve_id: int,
     valuation_date: str,
@@ -46,48 +57,110 @@ def _get_current_curve_price(
 ) -> float:
     """Get curve price for valuation date.
 
-    Falls back to the latest available price at or before the valuation date.
+    The exact date in the requested snapshot, else the latest snapshot's
+    price on or before the valuation date, else the curve's most recent price.
     """
-    from app.models.price_curve import CurveData
-    from sqlalchemy import func
+    exact = get_curve_series(db, curve_id, snapshot_date).average(valuation_date, valuation_date)
+    price = exact[0] if exact else _price_at(get_curve_series(db, curve_id), valuation_date)
+    if price is None:
+        raise HTTPException(status_code=404, detail="No curve data available for MTM valuation")
+    return price
 
-    # 1) Try exact date with snapshot
-    try:
-        avg, _ = get_curve_average(db, curve_id, valuation_date, valuation_date, snapshot_date)
-        return avg
-    except HTTPException:
-        pass
 
-    # 2) Try exact date without snapshot filter
-    try:
-        avg, _ = get_curve_average(db, curve_id, valuation_date, valuation_date)
-        return avg
-    except HTTPException:
-        pass
-
-    # 3) Fall back to the latest available price_date <= valuation_date
-    latest = (
-        db.query(CurveData)
-        .filter(CurveData.curve_id == curve_id, CurveData.price_date <= valuation_date)
-        .order_by(CurveData.price_date.desc())
-        .first()
+def _row(
+    contract_id: int, direction: str, valuation_date: str, snapshot_date: str, values: MtmValues,
+) -> dict:
+    return {
+        "contract_id": contract_id,
+        "valuation_date": valuation_date,
+        "snapshot_date": snapshot_date,
+        "direction": direction,
+        **values._asdict(),
+    }
+
+
+def _dialect_insert(db: Session, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"MTM upsert is not supported on {dialect}")
+    return dialect_insert(model)
+
+
+def _upsert_statement(db: Session):
+    """INSERT ... ON CONFLICT (contract_id, valuation_date, snapshot_date) DO UPDATE the values."""
+    stmt = _dialect_insert(db, MtmRecord)
+    return stmt.on_conflict_do_update(
+        index_elements=["contract_id", "valuation_date", "snapshot_date"],
+        set_={name: stmt.excluded[name] for name in (*MtmValues._fields, "direction")},
+    )
+
+
+def _record_latest(db: Session, rows: list[dict]) -> None:
+    """Move latest_mtm forward to any of rows that is at least as new as a contract's current one.
+
+    At most one row per contract.
+    """
+    if not rows:
+        return
+    stmt = _dialect_insert(db, LatestMtm)
+    key = ("valuation_date", "snapshot_date")
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["contract_id"],
+            set_={name: stmt.excluded[name] for name in (*key, *MtmValues._fields, "direction")},
+            where=tuple_(*(stmt.excluded[k] for k in key)) >= tuple_(*(LatestMtm.__table__.c[k] for k in key)),
+        ),
+        rows,
+        execution_options={"render_nulls": True},
     )
-    if latest:
-        return latest.price
-
-    # 4) Last resort: the most recent price in the entire curve
-    most_recent = (
-        db.query(CurveData)
-        .filter(CurveData.curve_id == curve_id)
-        .order_by(CurveData.price_date.desc())
-        .first()
+
+
+def refresh_latest_mtm(db: Session, contract_ids) -> None:
+    """Recompute latest_mtm rows for the given contracts from their history.
+
+    For contracts whose latest record may have been deleted. Does not commit.
+    """
+    ids = sorted(set(contract_ids))
+    if not ids:
+        return
+    columns = [c.name for c in LatestMtm.__table__.columns]
+    ranked = (
+        select(
+            *(MtmRecord.__table__.c[name] for name in columns),
+            func.row_number().over(
+                partition_by=MtmRecord.contract_id,
+                order_by=(MtmRecord.valuation_date.desc(), MtmRecord.snapshot_date.desc()),
+            ).label("rank"),
+        )
+        .where(MtmRecord.contract_id.in_(ids))
+        .subquery()
     )
-    if most_recent:
-        return most_recent.price
+    db.query(LatestMtm).filter(LatestMtm.contract_id.in_(ids)).delete(synchronize_session=False)
+    db.execute(insert(LatestMtm).from_select(
+        columns, select(*(ranked.c[name] for name in columns)).where(ranked.c.rank == 1),
+    ))
+
 
-    raise HTTPException(status_code=404, detail="No curve data available for MTM valuation")
+def upsert_mtm_records(db: Session, rows: list[dict]) -> list[MtmRecord]:
+    """Write MTM rows keyed on (contract, valuation date, snapshot); a rerun overwrites its key.
+
+    Returns the stored records in row order and moves latest_mtm forward.
+    Keys and contracts must be unique within rows.
+    """
+    if not rows:
+        return []
+    stmt = _upsert_statement(db).returning(MtmRecord, sort_by_parameter_order=True)
+    # render_nulls keeps rows with a None price in the same batches as the priced ones
+    records = list(db.scalars(stmt, rows, execution_options={"populate_existing": True, "render_nulls": True}))
+    _record_latest(db, rows)
+    return records
 
 
+@instrumented
 def run_mtm_for_contract(
     db: Session,
     contract_id: int,
@@ -96,79 +169,327 @@ def run_mtm_for_contract(
 ) -> MtmRecord:
     snap = snapshot_date or valuation_date
     contract = get_contract(db, contract_id)
-    formula = get_formula(db, contract.pricing_formula_id)
-
-    open_qty_info = get_open_quantity(db, contract_id)
-    open_qty = open_qty_info.open_quantity
-
-    curve_price = _get_current_curve_price(db, formula.curve_id, valuation_date, snap)
-
-    if open_qty <= 0:
-        # No open position — MTM is 0 but still report actual curve price
-        record = MtmRecord(
-            contract_id=contract_id,
-            valuation_date=valuation_date,
-            curve_price=round(curve_price, 4),
-            contract_price=None,
-            open_quantity=0,
-            direction=contract.direction,
-            mtm_value=0,
-        )
-        db.add(record)
-        db.commit()
-        db.refresh(record)
-        return record
-    contract_price = _get_contract_price(db, contract)
+    formula = get_formula_plan(db, contract.pricing_formula_id)
 
-    direction_factor = 1.0 if contract.direction == "BUY" else -1.0
+    agg = get_contract_aggregate(db, contract_id)
+    open_qty = contract.quantity - agg.shipped_qty
 
-    if contract_price is not None:
-        mtm_value = (curve_price - contract_price) * open_qty * direction_factor
-    else:
-        mtm_value = 0.0
+    curve_price = get_current_curve_price(db, formula.curve_id, valuation_date, snap)
 
-    record = MtmRecord(
-        contract_id=contract_id,
-        valuation_date=valuation_date,
-        curve_price=round(curve_price, 4),
-        contract_price=round(contract_price, 4) if contract_price else None,
-        open_quantity=round(open_qty, 4),
-        direction=contract.direction,
-        mtm_value=round(mtm_value, 2),
-    )
-    db.add(record)
+    contract_price = agg.avg_price if open_qty > 0 else None
+
+    values = mtm_values(contract.direction, curve_price, open_qty, contract_price)
+    [record] = upsert_mtm_records(db, [_row(contract.id, contract.direction, valuation_date, snap, values)])
     db.commit()
     db.refresh(record)
     return record
 
 
+def _partition_rows(db: Session, task: PartitionTask) -> list[MtmRow]:
+    """(contract id, direction, values) of the open contracts in one partition, by contract id."""
+    in_task = (
+        Contract.status.in_(OPEN_STATUSES),
+        Contract.pricing_formula_id.in_(task.formula_ids),
+        Contract.id.between(task.first_id, task.last_id),
+    )
+    contracts = db.execute(
+        select(Contract.id, Contract.direction, Contract.quantity).where(*in_task).order_by(Contract.id)
+    ).all()
+    aggregates = get_contract_aggregates(db, select(Contract.id).where(*in_task))
+    rows = []
+    for contract_id, direction, quantity in contracts:
+        agg = aggregates.get(contract_id, EMPTY)
+        values = mtm_values(direction, task.curve_price, quantity - agg.shipped_qty, agg.avg_price)
+        rows.append((contract_id, direction, values))
+    return rows
+
+
+_sessions: dict[str, sessionmaker] = {}
+
+
+def _session_factory(database_url: str) -> sessionmaker:
+    # One engine per database and worker process, kept for the worker's lifetime
+    if database_url not in _sessions:
+        _sessions[database_url] = sessionmaker(autoflush=False, bind=build_engine(database_url))
+    return _sessions[database_url]
+
+
+def _run_partition(task: PartitionTask) -> list[MtmRow]:
+    """Worker process entry point: one partition, read on the process's own connection."""
+    with _session_factory(task.database_url)() as db:
+        return _partition_rows(db, task)
+
+
+def _parallel_workers(db: Session, workers: int, contracts: int) -> int:
+    url = db.get_bind().url
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return 1  # other processes would open an empty database of their own
+    return workers if contracts >= settings.MTM_PARALLEL_MIN_CONTRACTS else 1
+
+
+@instrumented
 def run_mtm_portfolio(
     db: Session,
     valuation_date: str,
     snapshot_date: str | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    workers: int | None = None,
 ) -> MtmPortfolioOut:
-    contracts = db.query(Contract).filter(Contract.status.in_(["OPEN", "EXECUTED"])).all()
-    records = []
-    for c in contracts:
-        rec = run_mtm_for_contract(db, c.id, valuation_date, snapshot_date)
-        records.append(rec)
+    """Value every OPEN/EXECUTED contract in one pass.
 
-    total = sum(r.mtm_value for r in records)
+    The book is partitioned by curve and contract id range, and the curve
+    price resolved once per curve; each partition's contracts and shipment
+    aggregates are loaded in grouped queries and valued together. All records are upserted in a
+    single transaction, in contract id order. progress(done, total) is called
+    as partitions are valued.
+
+    With workers > 1 (default MTM_PARALLEL_WORKERS) and a book of at least
+    MTM_PARALLEL_MIN_CONTRACTS, partitions are cut into contract id ranges
+    and loaded and valued on worker processes, each on its own connection
+    (so they read committed data only). Their rows come back for the same
+    single upsert; the records are the serial path's.
+    """
+    snap = snapshot_date or valuation_date
+    workers = settings.MTM_PARALLEL_WORKERS if workers is None else workers
+    book = db.execute(
+        select(Contract.id, Contract.pricing_formula_id)
+        .where(Contract.status.in_(OPEN_STATUSES))
+        .order_by(Contract.id)
+    ).all()
+    plans = get_formula_plans(db, {formula_id for _, formula_id in book})
+
+    contract_ids: dict[int, list[int]] = {}  # curve -> its contracts, sorted
+    formula_ids: dict[int, set[int]] = {}
+    for contract_id, formula_id in book:
+        plan = plans.get(formula_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="Pricing formula not found")
+        contract_ids.setdefault(plan.curve_id, []).append(contract_id)
+        formula_ids.setdefault(plan.curve_id, set()).add(formula_id)
+
+    workers = _parallel_workers(db, workers, len(book))
+    # A few tasks per worker even out stragglers and spread one busy curve
+    chunk_size = max(1, -(-len(book) // (workers * 4))) if workers > 1 else SERIAL_CHUNK
+    database_url = db.get_bind().url.render_as_string(hide_password=False)
+    tasks = []
+    for curve_id, ids in contract_ids.items():
+        curve_price = get_current_curve_price(db, curve_id, valuation_date, snap)
+        formulas = tuple(sorted(formula_ids[curve_id]))
+        tasks.extend(
+            PartitionTask(database_url, curve_price, formulas, first, last) for first, last in split(ids, chunk_size)
+        )
+
+    run = _run_partition if workers > 1 else functools.partial(_partition_rows, db)
+    rows: list[MtmRow] = []
+    for partition in map_tasks(run, tasks, workers):
+        rows.extend(partition)
+        if progress:
+            progress(len(rows), len(book))
+    rows.sort(key=lambda row: row[0])
+
+    records = upsert_mtm_records(db, [
+        _row(contract_id, direction, valuation_date, snap, values) for contract_id, direction, values in rows
+    ])
+    out = [MtmRecordOut.model_validate(r) for r in records]
+    db.commit()
+
+    total = sum(r.mtm_value for r in out)
     return MtmPortfolioOut(
         valuation_date=valuation_date,
-        records=[MtmRecordOut.model_validate(r) for r in records],
+        records=out,
         total_mtm=round(total, 2),
     )
 
 
-def get_mtm_history(
+def _valuation_dates(start_date: str, end_date: str) -> list[str]:
+    try:
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Dates must be ISO-8601 (YYYY-MM-DD)")
+    if end < start:
+        raise HTTPException(status_code=422, detail="end_date is before start_date")
+    days = (end - start).days + 1
+    if days > settings.MTM_BACKFILL_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"Backfill is limited to {settings.MTM_BACKFILL_MAX_DAYS} days")
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def _snapshot_prices(
     db: Session,
-    contract_id: int | None = None,
-    valuation_date: str | None = None,
-) -> list[MtmRecord]:
+    curve_ids: set[int],
+    dates: list[str],
+    policy: SnapshotPolicy,
+    snapshot_date: str | None,
+) -> dict[tuple[int, str], float]:
+    """(curve_id, valuation_date) -> the date's price in the policy's snapshot, where there is one."""
+    if policy is SnapshotPolicy.LATEST or not curve_ids:
+        return {}
+    if policy is SnapshotPolicy.FIXED:
+        prices = {}
+        for curve_id in curve_ids:
+            series = get_curve_series(db, curve_id, snapshot_date)
+            lo, hi = series.window(dates[0], dates[-1])
+            prices.update(((curve_id, d), p) for d, p in zip(series.dates[lo:hi], series.prices[lo:hi]))
+        return prices
+    # VALUATION_DATE: every date's own snapshot, in one query
+    rows = db.query(CurveData.curve_id, CurveData.price_date, CurveData.price).filter(
+        CurveData.curve_id.in_(curve_ids),
+        CurveData.price_date.between(dates[0], dates[-1]),
+        CurveData.snapshot_date == CurveData.price_date,
+    )
+    return {(curve_id, price_date): price for curve_id, price_date, price in rows}
+
+
+def _newest_snapshot(db: Session, curve_ids: set[int]) -> str | None:
+    return db.query(func.max(CurveData.snapshot_date)).filter(CurveData.curve_id.in_(curve_ids)).scalar()
+
+
+@instrumented
+def backfill_mtm(
+    db: Session,
+    start_date: str,
+    end_date: str,
+    snapshot_policy: SnapshotPolicy | str = SnapshotPolicy.VALUATION_DATE,
+    snapshot_date: str | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> MtmBackfillResult:
+    """Rebuild portfolio MTM for every calendar day from start_date to end_date.
+
+    Each date gets the records run_mtm_portfolio would write for it, with the
+    snapshot chosen by the policy: the valuation date itself, one FIXED
+    snapshot_date, or the LATEST snapshot per price_date. LATEST records are
+    keyed on the newest snapshot of the priced curves. Contracts, shipment
+    aggregates, formula plans and curve series are loaded once; the sweep only
+    resolves one price per curve and date. Existing records for the dates
+    under the same snapshot key are deleted and the new ones inserted in
+    batches in the same transaction, so a rerun replaces rather than
+    duplicates, and latest_mtm follows in that transaction too.
+    progress(done, total) counts dates.
+    """
+    policy = SnapshotPolicy(snapshot_policy)
+    if policy is SnapshotPolicy.FIXED and not snapshot_date:
+        raise HTTPException(status_code=422, detail="snapshot_date is required by the FIXED policy")
+    dates = _valuation_dates(start_date, end_date)
+
+    contracts = db.query(Contract).filter(Contract.status.in_(OPEN_STATUSES)).all()
+    aggregates = get_contract_aggregates(db)
+    plans = get_formula_plans(db, {c.pricing_formula_id for c in contracts})
+
+    inputs: list[tuple[int, MtmInput]] = []
+    for index, c in enumerate(contracts):
+        plan = plans.get(c.pricing_formula_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="Pricing formula not found")
+        agg = aggregates.get(c.id, EMPTY)
+        inputs.append((plan.curve_id, MtmInput(index, c.id, c.direction, c.quantity - agg.shipped_qty, agg.avg_price)))
+
+    curve_ids = {curve_id for curve_id, _ in inputs}
+    snapshot_prices = _snapshot_prices(db, curve_ids, dates, policy, snapshot_date)
+    latest = {curve_id: get_curve_series(db, curve_id) for curve_id in curve_ids}
+
+    prices: dict[str, dict[int, float]] = {}
+    for done, valuation_date in enumerate(dates, 1):
+        day = {}
+        for curve_id in curve_ids:
+            price = snapshot_prices.get((curve_id, valuation_date))
+            if price is None:
+                price = _price_at(latest[curve_id], valuation_date)
+            if price is None:
+                raise HTTPException(status_code=404, detail="No curve data available for MTM valuation")
+            day[curve_id] = price
+        prices[valuation_date] = day
+        if progress:
+            progress(done, len(dates))
+
+    key = None
+    if policy is SnapshotPolicy.FIXED:
+        key = snapshot_date
+    elif policy is SnapshotPolicy.LATEST:
+        key = _newest_snapshot(db, curve_ids)
+
+    def replaced_by_run(model):
+        same_key = model.snapshot_date == (model.valuation_date if key is None else key)
+        return model.valuation_date.between(dates[0], dates[-1]), same_key
+
+    # Contracts no longer valued whose latest record is about to be deleted
+    stale = [
+        contract_id
+        for (contract_id,) in db.query(LatestMtm.contract_id).filter(
+            *replaced_by_run(LatestMtm), LatestMtm.contract_id.notin_([i.contract_id for _, i in inputs]),
+        )
+    ]
+    replaced = db.query(MtmRecord).filter(*replaced_by_run(MtmRecord)).delete(synchronize_session=False)
+    totals = []
+    written = 0
+    batch: list[dict] = []
+    day_rows: list[dict] = []
+    for valuation_date in dates:
+        day_rows = []
+        for curve_id, i in inputs:
+            values = mtm_values(i.direction, prices[valuation_date][curve_id], i.open_qty, i.contract_price)
+            day_rows.append(_row(i.contract_id, i.direction, valuation_date, key or valuation_date, values))
+        total = sum(row["mtm_value"] for row in day_rows)
+        batch.extend(day_rows)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            db.execute(insert(MtmRecord), batch)
+            written += len(batch)
+            batch = []
+        totals.append(MtmDateTotal(valuation_date=valuation_date, total_mtm=round(total, 2)))
+    if batch:
+        db.execute(insert(MtmRecord), batch)
+        written += len(batch)
+    # The last date's records are each contract's newest in the run
+    _record_latest(db, day_rows)
+    refresh_latest_mtm(db, stale)
+    db.commit()
+
+    return MtmBackfillResult(
+        start_date=dates[0],
+        end_date=dates[-1],
+        snapshot_policy=policy,
+        snapshot_date=key,
+        contracts=len(contracts),
+        records_written=written,
+        records_replaced=replaced,
+        totals=totals,
+    )
+
+
+def _history_query(
+    db: Session, contract_id: int | None, valuation_date: str | None, snapshot_date: str | None = None,
+):
     q = db.query(MtmRecord)
     if contract_id:
         q = q.filter(MtmRecord.contract_id == contract_id)
     if valuation_date:
         q = q.filter(MtmRecord.valuation_date == valuation_date)
-    return q.order_by(MtmRecord.valuation_date.desc()).all()
+    if snapshot_date:
+        q = q.filter(MtmRecord.snapshot_date == snapshot_date)
+    return q
+
+
+@instrumented
+def get_mtm_history(
+    db: Session,
+    contract_id: int | None = None,
+    valuation_date: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    snapshot_date: str | None = None,
+) -> Page[MtmRecord]:
+    return paginate(
+        _history_query(db, contract_id, valuation_date, snapshot_date), HISTORY_KEYS, cursor, limit,
+        descending=True,
+    )
+
+
+def stream_mtm_history(
+    db: Session,
+    contract_id: int | None = None,
+    valuation_date: str | None = None,
+    snapshot_date: str | None = None,
+) -> Iterator[str]:
+    return stream_ndjson(
+        db, lambda s: _history_query(s, contract_id, valuation_date, snapshot_date), HISTORY_KEYS, MtmRecordOut,
+        descending=True,
+    )
@@ -0,0 +1,125 @@
+"""Keyset (seek) pagination for list endpoints.
+
+A page is ordered on a unique tuple of indexed columns, e.g. (delivery_start,
+id). The cursor is the opaque, URL-safe encoding of the last row's key, and
+the next page starts strictly after it, so every page costs one index seek
+regardless of depth.
+
+A cursor that was not issued by the listing (bad encoding, wrong width, or
+values that do not fit the key columns) is a 400 before any SQL runs.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Generic, Iterator, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query, Session
+
+from app.models.types import ISODate
+
+T = TypeVar("T")
+
+# Rows fetched per page while streaming a full listing
+STREAM_PAGE_SIZE = 1000
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T] = field(default_factory=list)
+    next_cursor: str | None = None  # None on the last page
+
+
+def encode_cursor(values: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode()
+
+
+INVALID_CURSOR = "Invalid cursor: pass back the X-Next-Cursor of the previous page unchanged"
+
+
+def decode_cursor(cursor: str, width: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail=INVALID_CURSOR)
+    if not isinstance(values, list) or len(values) != width:
+        raise HTTPException(status_code=400, detail=INVALID_CURSOR)
+    return values
+
+
+def _fits(key: InstrumentedAttribute, value) -> bool:
+    """Whether a decoded cursor value can be bound against key's column."""
+    if isinstance(key.type, ISODate):  # ISO-8601 strings
+        try:
+            date.fromisoformat(value)
+        except (TypeError, ValueError):
+            return False
+        return True
+    expected = key.type.python_type
+    if expected is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def paginate(
+    query: Query,
+    keys: tuple[InstrumentedAttribute, ...],
+    cursor: str | None = None,
+    limit: int | None = None,
+    descending: bool = False,
+) -> Page:
+    """One page of query ordered by keys (all ascending or all descending).
+
+    keys must be unique together and should match an index. With no limit
+    the rest of the listing is returned as a single page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        if not all(_fits(k, v) for k, v in zip(keys, values)):
+            raise HTTPException(status_code=400, detail=INVALID_CURSOR)
+        row = tuple_(*keys)
+        after = tuple_(*(literal(v, type_=k.type) for k, v in zip(keys, values)))
+        query = query.filter(row < after if descending else row > after)
+    query = query.order_by(*(k.desc() if descending else k for k in keys))
+    if limit is None:
+        return Page(items=query.all())
+
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return Page(items=items)
+    items = items[:limit]
+    last = items[-1]
+    return Page(items=items, next_cursor=encode_cursor(tuple(getattr(last, k.key) for k in keys)))
+
+
+def stream_ndjson(
+    db: Session,
+    build_query,
+    keys: tuple[InstrumentedAttribute, ...],
+    schema,
+    descending: bool = False,
+) -> Iterator[str]:
+    """Every row of a listing as NDJSON lines, walking keyset pages.
+
+    build_query(session) returns the filtered, unordered query. A private
+    session on the same engine is used, so the stream outlives the request's
+    session, and each page is released once written.
+    """
+    session = Session(bind=db.get_bind())
+    try:
+        cursor = None
+        while True:
+            page = paginate(build_query(session), keys, cursor, STREAM_PAGE_SIZE, descending)
+            for item in page.items:
+                yield schema.model_validate(item).model_dump_json() + "\n"
+            session.expunge_all()
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+    finally:
+        session.close()
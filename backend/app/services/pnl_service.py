@@ -1,11 +1,14 @@
 """P&L service: realized (from matches) and unrealized (from open positions)."""
 
+from collections import defaultdict
+
 from sqlalchemy.orm import Session
 
+from app.instrumentation import instrumented
 from app.models.contract import Contract
-from app.models.shipment import Shipment
 from app.models.match import Match
-from app.models.mtm import MtmRecord
+from app.models.mtm import LatestMtm
+from app.services.position_service import get_weighted_avg_prices
 from app.schemas.pnl import (
     RealizedPnlItem,
     UnrealizedPnlItem,
@@ -14,31 +17,14 @@ from app.schemas.pnl import (
 )
 
 
-def _get_weighted_avg_price(db: Session, contract_id: int) -> float | None:
-    shipments = (
-        db.query(Shipment)
-        .filter(Shipment.contract_id == contract_id, Shipment.status != "CANCELLED")
-        .all()
-    )
-    total_qty = 0.0
-    total_value = 0.0
-    for s in shipments:
-        price = s.final_price or s.provisional_price
-        qty = s.bl_quantity
-        if price is not None and qty is not None:
-            total_qty += qty
-            total_value += price * qty
-    if total_qty == 0:
-        return None
-    return total_value / total_qty
-
-
+@instrumented
 def get_realized_pnl(db: Session) -> list[RealizedPnlItem]:
     matches = db.query(Match).all()
+    prices = get_weighted_avg_prices(db)
     items = []
     for m in matches:
-        bp = m.buy_price or _get_weighted_avg_price(db, m.buy_contract_id)
-        sp = m.sell_price or _get_weighted_avg_price(db, m.sell_contract_id)
+        bp = m.buy_price or prices.get(m.buy_contract_id)
+        sp = m.sell_price or prices.get(m.sell_contract_id)
         realized = round((sp - bp) * m.matched_quantity, 2) if bp and sp else m.realized_pnl
         items.append(RealizedPnlItem(
             match_id=m.id,
@@ -52,19 +38,19 @@ def get_realized_pnl(db: Session) -> list[RealizedPnlItem]:
     return items
 
 
+@instrumented
 def get_unrealized_pnl(db: Session) -> list[UnrealizedPnlItem]:
     """Unrealized P&L from latest MTM records per contract."""
-    contracts = db.query(Contract).filter(Contract.status.in_(["OPEN", "EXECUTED"])).all()
+    rows = (
+        db.query(Contract, LatestMtm)
+        .outerjoin(LatestMtm, LatestMtm.contract_id == Contract.id)
+        .filter(Contract.status.in_(["OPEN", "EXECUTED"]))
+        .all()
+    )
+    prices = get_weighted_avg_prices(db)
     items = []
-    for c in contracts:
-        # Get latest MTM record
-        latest_mtm = (
-            db.query(MtmRecord)
-            .filter(MtmRecord.contract_id == c.id)
-            .order_by(MtmRecord.valuation_date.desc())
-            .first()
-        )
-        contract_price = _get_weighted_avg_price(db, c.id)
+    for c, latest_mtm in rows:
+        contract_price = prices.get(c.id)
 
         if latest_mtm and latest_mtm.open_quantity > 0:
             items.append(UnrealizedPnlItem(
@@ -78,31 +64,33 @@ def get_unrealized_pnl(db: Session) -> list[UnrealizedPnlItem]:
     return items
 
 
+@instrumented
 def get_pnl_summary(db: Session) -> PnlSummary:
-    contracts = db.query(Contract).filter(Contract.status != "CANCELLED").all()
+    rows = (
+        db.query(Contract, LatestMtm)
+        .outerjoin(LatestMtm, LatestMtm.contract_id == Contract.id)
+        .filter(Contract.status != "CANCELLED")
+        .all()
+    )
+    prices = get_weighted_avg_prices(db)
+    matches_by_buy: dict[int, list[Match]] = defaultdict(list)
+    for m in db.query(Match).all():
+        matches_by_buy[m.buy_contract_id].append(m)
 
     by_contract = []
     total_realized = 0.0
     total_unrealized = 0.0
 
-    for c in contracts:
+    for c, latest_mtm in rows:
         # Realized from matches — compute dynamically from current shipment prices
-        buy_matches = db.query(Match).filter(Match.buy_contract_id == c.id).all()
-
         realized_buy = 0.0
-        for m in buy_matches:
-            bp = m.buy_price or _get_weighted_avg_price(db, m.buy_contract_id)
-            sp = m.sell_price or _get_weighted_avg_price(db, m.sell_contract_id)
+        for m in matches_by_buy.get(c.id, []):
+            bp = m.buy_price or prices.get(m.buy_contract_id)
+            sp = m.sell_price or prices.get(m.sell_contract_id)
             if bp is not None and sp is not None:
                 realized_buy += round((sp - bp) * m.matched_quantity, 2)
 
         # Unrealized from latest MTM
-        latest_mtm = (
-            db.query(MtmRecord)
-            .filter(MtmRecord.contract_id == c.id)
-            .order_by(MtmRecord.valuation_date.desc())
-            .first()
-        )
         unrealized = latest_mtm.mtm_value if latest_mtm else 0.0
 
         # Only add realized for buy-side to avoid double counting
@@ -0,0 +1,202 @@
+"""Per-contract shipment aggregates shared by MTM, matching and P&L.
+
+shipped_qty  = sum of BL quantity over non-CANCELLED shipments
+avg_price    = BL-quantity-weighted average of (final > provisional) price
+               over those shipments that have both a quantity and a price
+
+The same figures are persisted per contract in the contract_positions
+rollup. Services that write shipments, reprice them or change a contract's
+quantity call refresh_positions() before committing, so the rollup moves in
+the same transaction as the raw rows.
+
+Refreshes lock the contracts' rows (SELECT ... FOR UPDATE, in id order)
+before aggregating. Under READ COMMITTED a concurrent writer on the same
+contract then waits for the first to commit, and its aggregate and rollup
+lookup see the first one's shipment and row: no lost update and no second
+INSERT of the same rollup row. SQLite serialises writers on its own.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import Select, and_, case, func
+from sqlalchemy.orm import Session
+
+from app.instrumentation import instrumented
+from app.models.contract import Contract
+from app.models.position import ContractPosition
+from app.models.shipment import Shipment
+from app.schemas.position import PositionMismatch, PositionCheckResult
+
+
+@dataclass(frozen=True)
+class ContractAggregate:
+    shipped_qty: float = 0.0
+    priced_qty: float = 0.0
+    priced_value: float = 0.0
+
+    @property
+    def avg_price(self) -> float | None:
+        if self.priced_qty == 0:
+            return None
+        return self.priced_value / self.priced_qty
+
+
+EMPTY = ContractAggregate()
+
+
+def _effective_price():
+    """Final price, falling back to provisional when final is NULL or 0."""
+    return case(
+        (and_(Shipment.final_price.isnot(None), Shipment.final_price != 0), Shipment.final_price),
+        else_=Shipment.provisional_price,
+    )
+
+
+@instrumented
+def get_contract_aggregates(
+    db: Session,
+    contract_ids: list[int] | Select | None = None,
+) -> dict[int, ContractAggregate]:
+    """Aggregates for the given contracts (all contracts if None) in one GROUP BY.
+
+    contract_ids may also be a SELECT of contract ids, filtered in the same query.
+
+    Contracts without shipments are absent; use .get(id, EMPTY).
+    """
+    price = _effective_price()
+    priced = and_(Shipment.bl_quantity.isnot(None), price.isnot(None))
+    q = (
+        db.query(
+            Shipment.contract_id,
+            func.sum(Shipment.bl_quantity),
+            func.sum(case((priced, Shipment.bl_quantity), else_=0.0)),
+            func.sum(case((priced, price * Shipment.bl_quantity), else_=0.0)),
+        )
+        .filter(Shipment.status != "CANCELLED")
+        .group_by(Shipment.contract_id)
+    )
+    if contract_ids is not None:
+        q = q.filter(Shipment.contract_id.in_(contract_ids))
+    return {
+        contract_id: ContractAggregate(
+            shipped_qty=shipped or 0.0,
+            priced_qty=priced_qty or 0.0,
+            priced_value=priced_value or 0.0,
+        )
+        for contract_id, shipped, priced_qty, priced_value in q
+    }
+
+
+def get_contract_aggregate(db: Session, contract_id: int) -> ContractAggregate:
+    return get_contract_aggregates(db, [contract_id]).get(contract_id, EMPTY)
+
+
+def get_weighted_avg_prices(db: Session, contract_ids: list[int] | None = None) -> dict[int, float | None]:
+    """contract_id -> weighted-average price (None when nothing is priced)."""
+    return {cid: agg.avg_price for cid, agg in get_contract_aggregates(db, contract_ids).items()}
+
+
+def _apply(position: ContractPosition, quantity: float, agg: ContractAggregate) -> None:
+    position.shipped_qty = agg.shipped_qty
+    position.open_qty = quantity - agg.shipped_qty
+    position.priced_qty = agg.priced_qty
+    position.priced_value = agg.priced_value
+    position.avg_price = agg.avg_price
+
+
+def refresh_positions(db: Session, contract_ids) -> None:
+    """Recompute rollup rows for the given contracts from their shipments.
+
+    Flushes pending changes first and does not commit; call it inside the
+    transaction that changed the shipments.
+    """
+    ids = sorted({cid for cid in contract_ids if cid is not None})
+    if not ids:
+        return
+    db.flush()
+    quantities = dict(
+        db.query(Contract.id, Contract.quantity)
+        .filter(Contract.id.in_(ids))
+        .order_by(Contract.id)
+        .with_for_update()
+        .all()
+    )
+    aggregates = get_contract_aggregates(db, ids)
+    existing = {
+        p.contract_id: p
+        for p in db.query(ContractPosition).filter(ContractPosition.contract_id.in_(ids))
+    }
+    for cid in ids:
+        position = existing.get(cid)
+        if cid not in quantities:
+            if position is not None:
+                db.delete(position)
+            continue
+        if position is None:
+            position = ContractPosition(contract_id=cid)
+            db.add(position)
+        _apply(position, quantities[cid], aggregates.get(cid, EMPTY))
+    db.flush()
+
+
+def get_positions(db: Session, contract_ids: list[int]) -> dict[int, ContractPosition | ContractAggregate]:
+    """Rollup rows for contracts, falling back to a live aggregate where a row is missing.
+
+    Returned values expose shipped_qty, priced_qty and avg_price either way.
+    """
+    positions: dict = {
+        p.contract_id: p
+        for p in db.query(ContractPosition).filter(ContractPosition.contract_id.in_(contract_ids))
+    }
+    missing = [cid for cid in contract_ids if cid not in positions]
+    if missing:
+        aggregates = get_contract_aggregates(db, missing)
+        for cid in missing:
+            positions[cid] = aggregates.get(cid, EMPTY)
+    return positions
+
+
+def rebuild_positions(db: Session) -> int:
+    """Recompute the whole rollup from raw rows. Returns the number of contracts."""
+    contracts = db.query(Contract.id, Contract.quantity).order_by(Contract.id).with_for_update().all()
+    db.query(ContractPosition).delete(synchronize_session=False)
+    aggregates = get_contract_aggregates(db)
+    for cid, quantity in contracts:
+        position = ContractPosition(contract_id=cid)
+        _apply(position, quantity, aggregates.get(cid, EMPTY))
+        db.add(position)
+    db.commit()
+    return len(contracts)
+
+
+def check_positions(db: Session, tolerance: float = 1e-6) -> PositionCheckResult:
+    """Compare every stored rollup row against a fresh aggregate of the raw rows."""
+    aggregates = get_contract_aggregates(db)
+    stored = {p.contract_id: p for p in db.query(ContractPosition)}
+    contracts = db.query(Contract.id, Contract.quantity).all()
+
+    mismatches: list[PositionMismatch] = []
+    for cid, quantity in contracts:
+        agg = aggregates.get(cid, EMPTY)
+        position = stored.pop(cid, None)
+        if position is None:
+            mismatches.append(PositionMismatch(contract_id=cid, field="row", stored=None, expected=1))
+            continue
+        expected = {
+            "shipped_qty": agg.shipped_qty,
+            "open_qty": quantity - agg.shipped_qty,
+            "priced_qty": agg.priced_qty,
+            "avg_price": agg.avg_price,
+        }
+        for field, value in expected.items():
+            actual = getattr(position, field)
+            if (actual is None) != (value is None) or (
+                value is not None and abs(actual - value) > tolerance
+            ):
+                mismatches.append(PositionMismatch(contract_id=cid, field=field, stored=actual, expected=value))
+
+    # Rows left over belong to contracts that no longer exist
+    for cid in stored:
+        mismatches.append(PositionMismatch(contract_id=cid, field="row", stored=1, expected=None))
+
+    return PositionCheckResult(contracts_checked=len(contracts), mismatches=mismatches)
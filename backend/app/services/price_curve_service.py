@@ -1,11 +1,23 @@
+import csv
+import hashlib
+import json
+from datetime import date
+from typing import Iterable, Iterator
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from app.config import settings
 from app.models.price_curve import PriceCurve, CurveData
+from app.services import curve_cache
+from app.services.curve_cache import CurveSeries
+from app.services.pagination import Page, paginate, stream_ndjson
 from app.schemas.price_curve import (
     PriceCurveCreate,
     PriceCurveUpdate,
     CurveDataCreate,
+    CurveDataOut,
+    CurveIngestResult,
 )
 
 
@@ -47,29 +59,158 @@ def delete_curve(db: Session, curve_id: int) -> None:
     curve = get_curve(db, curve_id)
     db.delete(curve)
     db.commit()
+    curve_cache.invalidate(curve_id)
 
 
-def bulk_upload_data(db: Session, curve_id: int, data_points: list[CurveDataCreate]) -> list[CurveData]:
+def bulk_upload_data(db: Session, curve_id: int, data_points: list[CurveDataCreate]) -> list[CurveDataOut]:
     get_curve(db, curve_id)  # ensure exists
-    records = []
-    for dp in data_points:
-        record = CurveData(curve_id=curve_id, **dp.model_dump())
-        db.add(record)
-        records.append(record)
+    records = [CurveData(curve_id=curve_id, **dp.model_dump()) for dp in data_points]
+    db.add_all(records)
+    db.flush()
+    # Snapshot the rows while ids and values are loaded; after commit every
+    # attribute would be expired and reloaded one row at a time.
+    out = [CurveDataOut.model_validate(r) for r in records]
     db.commit()
-    for r in records:
-        db.refresh(r)
-    return records
+    curve_cache.append(
+        curve_id, [(dp.price_date, dp.snapshot_date, dp.price) for dp in data_points],
+    )
+    return out
 
 
-def get_curve_data(
+def _parse_row(line_no: int, price_date, price, snapshot_date) -> tuple[str, str, float]:
+    try:
+        return (
+            date.fromisoformat(str(price_date).strip()).isoformat(),
+            date.fromisoformat(str(snapshot_date).strip()).isoformat(),
+            float(price),
+        )
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail=f"Line {line_no}: invalid curve data row")
+
+
+def _parse_csv(lines: Iterable[str]) -> Iterator[tuple[str, str, float]]:
+    """Rows from CSV with a header naming price_date, price and snapshot_date."""
+    reader = csv.DictReader(lines)
+    missing = {"price_date", "price", "snapshot_date"} - set(reader.fieldnames or ())
+    if missing:
+        raise HTTPException(status_code=422, detail=f"CSV header missing: {', '.join(sorted(missing))}")
+    for row in reader:
+        yield _parse_row(reader.line_num, row["price_date"], row["price"], row["snapshot_date"])
+
+
+def _parse_ndjson(lines: Iterable[str]) -> Iterator[tuple[str, str, float]]:
+    """Rows from newline-delimited JSON objects; blank lines are skipped."""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            yield _parse_row(line_no, obj["price_date"], obj["price"], obj["snapshot_date"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=422, detail=f"Line {line_no}: invalid curve data row")
+
+
+PARSERS = {"csv": _parse_csv, "ndjson": _parse_ndjson}
+
+# Keyset order for data listings; unique within one curve (ix_curve_data_curve_date)
+DATA_KEYS = (CurveData.price_date, CurveData.snapshot_date)
+
+
+def _upsert_statement(db: Session):
+    """INSERT ... ON CONFLICT (curve_id, price_date, snapshot_date) DO UPDATE SET price."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Curve upsert is not supported on {dialect}")
+    stmt = insert(CurveData.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["curve_id", "price_date", "snapshot_date"],
+        set_={"price": stmt.excluded.price},
+    )
+
+
+def upsert_curve_rows(
     db: Session,
     curve_id: int,
-    start_date: str | None = None,
-    end_date: str | None = None,
-    snapshot_date: str | None = None,
-) -> list[CurveData]:
+    rows: Iterable[tuple[str, str, float]],
+    batch_size: int | None = None,
+) -> CurveIngestResult:
+    """Upsert (price_date, snapshot_date, price) rows into curve_data in batches.
+
+    Rows are consumed lazily and written in executemany batches; only counts
+    and a checksum of the accepted rows are kept. The whole load is one
+    transaction, so a bad row anywhere rejects it.
+    """
     get_curve(db, curve_id)
+    batch_size = batch_size or settings.CURVE_INGEST_BATCH_SIZE
+    stmt = _upsert_statement(db)
+    digest = hashlib.sha256()
+    count = batches = 0
+    first = last = None
+
+    # Keyed by (price_date, snapshot_date): a key repeated within one batch
+    # keeps its last price, as a single ON CONFLICT statement cannot touch
+    # the same row twice on PostgreSQL.
+    batch: dict[tuple[str, str], float] = {}
+
+    def flush() -> None:
+        nonlocal batches
+        db.execute(stmt, [
+            {"curve_id": curve_id, "price_date": pd, "snapshot_date": sd, "price": price}
+            for (pd, sd), price in batch.items()
+        ])
+        batch.clear()
+        batches += 1
+
+    try:
+        for price_date, snapshot_date, price in rows:
+            digest.update(f"{price_date},{snapshot_date},{price!r}\n".encode())
+            count += 1
+            first = price_date if first is None or price_date < first else first
+            last = price_date if last is None or price_date > last else last
+            batch[(price_date, snapshot_date)] = price
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    curve_cache.invalidate(curve_id)
+
+    return CurveIngestResult(
+        curve_id=curve_id,
+        rows=count,
+        batches=batches,
+        first_price_date=first,
+        last_price_date=last,
+        checksum=digest.hexdigest(),
+    )
+
+
+def ingest_curve_data(
+    db: Session,
+    curve_id: int,
+    lines: Iterable[str],
+    fmt: str = "csv",
+    batch_size: int | None = None,
+) -> CurveIngestResult:
+    """Stream CSV or NDJSON rows into curve_data, upserting on the unique key."""
+    get_curve(db, curve_id)  # 404 before reading the body
+    return upsert_curve_rows(db, curve_id, PARSERS[fmt](lines), batch_size)
+
+
+def _data_query(
+    db: Session,
+    curve_id: int,
+    start_date: str | None,
+    end_date: str | None,
+    snapshot_date: str | None,
+):
     q = db.query(CurveData).filter(CurveData.curve_id == curve_id)
     if start_date:
         q = q.filter(CurveData.price_date >= start_date)
@@ -77,7 +218,63 @@ def get_curve_data(
         q = q.filter(CurveData.price_date <= end_date)
     if snapshot_date:
         q = q.filter(CurveData.snapshot_date == snapshot_date)
-    return q.order_by(CurveData.price_date).all()
+    return q
+
+
+def get_curve_data(
+    db: Session,
+    curve_id: int,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    snapshot_date: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> Page[CurveData]:
+    get_curve(db, curve_id)
+    q = _data_query(db, curve_id, start_date, end_date, snapshot_date)
+    return paginate(q, DATA_KEYS, cursor, limit)
+
+
+def stream_curve_data(
+    db: Session,
+    curve_id: int,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    snapshot_date: str | None = None,
+) -> Iterator[str]:
+    get_curve(db, curve_id)
+    return stream_ndjson(
+        db, lambda s: _data_query(s, curve_id, start_date, end_date, snapshot_date), DATA_KEYS, CurveDataOut,
+    )
+
+
+def _load_series(db: Session, curve_id: int, snapshot_date: str | None) -> CurveSeries:
+    """Load one curve's prices for a snapshot, or the latest snapshot per price_date."""
+    get_curve(db, curve_id)
+    q = db.query(CurveData.price_date, CurveData.price).filter(CurveData.curve_id == curve_id)
+    if snapshot_date:
+        q = q.filter(CurveData.snapshot_date == snapshot_date).order_by(CurveData.price_date)
+    else:
+        # Ascending snapshot within each price_date: the last row seen wins
+        q = q.order_by(CurveData.price_date, CurveData.snapshot_date)
+
+    dates: list[str] = []
+    prices: list[float] = []
+    for price_date, price in q:
+        if dates and dates[-1] == price_date:
+            prices[-1] = price
+        else:
+            dates.append(price_date)
+            prices.append(price)
+
+    series = CurveSeries()
+    series.extend(dates, prices)
+    return series
+
+
+def get_curve_series(db: Session, curve_id: int, snapshot_date: str | None = None) -> CurveSeries:
+    """One snapshot of a curve, or its latest snapshot per price_date, from the curve cache."""
+    return curve_cache.get_series(curve_id, snapshot_date, lambda: _load_series(db, curve_id, snapshot_date))
 
 
 def get_curve_average(
@@ -91,50 +288,9 @@ def get_curve_average(
 
     If snapshot_date is provided, use that exact snapshot.
     Otherwise, for each price_date pick the latest available snapshot_date.
+    Served from the in-process curve cache after the first call per key.
     """
-    get_curve(db, curve_id)
-
-    if snapshot_date:
-        points = (
-            db.query(CurveData)
-            .filter(
-                CurveData.curve_id == curve_id,
-                CurveData.price_date >= start_date,
-                CurveData.price_date <= end_date,
-                CurveData.snapshot_date == snapshot_date,
-            )
-            .all()
-        )
-    else:
-        from sqlalchemy import func
-
-        # Subquery: max snapshot_date per price_date
-        sub = (
-            db.query(
-                CurveData.price_date,
-                func.max(CurveData.snapshot_date).label("max_snap"),
-            )
-            .filter(
-                CurveData.curve_id == curve_id,
-                CurveData.price_date >= start_date,
-                CurveData.price_date <= end_date,
-            )
-            .group_by(CurveData.price_date)
-            .subquery()
-        )
-        points = (
-            db.query(CurveData)
-            .join(
-                sub,
-                (CurveData.price_date == sub.c.price_date)
-                & (CurveData.snapshot_date == sub.c.max_snap)
-                & (CurveData.curve_id == curve_id),
-            )
-            .all()
-        )
-
-    if not points:
+    result = get_curve_series(db, curve_id, snapshot_date).average(start_date, end_date)
+    if result is None:
         raise HTTPException(status_code=404, detail="No curve data found for the given date range")
-
-    avg = sum(p.price for p in points) / len(points)
-    return avg, len(points)
+    return result
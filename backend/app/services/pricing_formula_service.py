@@ -1,7 +1,12 @@
-from sqlalchemy.orm import Session
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException
 
 from app.models.pricing_formula import PricingFormula, FormulaAdjustment
+from app.services import formula_cache
+from app.services.formula_cache import ASSAY_ELEMENTS, FormulaPlan, compile_formula
 from app.schemas.pricing_formula import (
     PricingFormulaCreate,
     PricingFormulaUpdate,
@@ -20,6 +25,47 @@ def get_formula(db: Session, formula_id: int) -> PricingFormula:
     return formula
 
 
+def get_formula_plan(db: Session, formula_id: int) -> FormulaPlan:
+    """Compiled plan for a formula, loaded from the database only on a cache miss."""
+    def load() -> PricingFormula:
+        formula = _load_formulas(db, [formula_id]).get(formula_id)
+        if not formula:
+            raise HTTPException(status_code=404, detail="Pricing formula not found")
+        return formula
+
+    return formula_cache.get_plan(formula_id, load)
+
+
+def get_formula_plans(db: Session, formula_ids) -> dict[int, FormulaPlan]:
+    """Compiled plans for many formulas; misses are loaded in one query.
+
+    Unknown ids are left out of the result.
+    """
+    plans: dict[int, FormulaPlan] = {}
+    missing = []
+    for formula_id in set(formula_ids):
+        plan = formula_cache.get_cached(formula_id)
+        if plan is not None:
+            plans[formula_id] = plan
+        else:
+            missing.append(formula_id)
+    if missing:
+        versions = {fid: formula_cache.current_version(fid) for fid in missing}
+        for formula in _load_formulas(db, missing).values():
+            plans[formula.id] = formula_cache.store(formula, versions[formula.id])
+    return plans
+
+
+def _load_formulas(db: Session, formula_ids: list[int]) -> dict[int, PricingFormula]:
+    formulas = (
+        db.query(PricingFormula)
+        .options(selectinload(PricingFormula.adjustments))
+        .filter(PricingFormula.id.in_(formula_ids))
+        .all()
+    )
+    return {f.id: f for f in formulas}
+
+
 def create_formula(db: Session, data: PricingFormulaCreate) -> PricingFormula:
     adjustments_data = data.adjustments
     formula_dict = data.model_dump(exclude={"adjustments"})
@@ -31,6 +77,7 @@ def create_formula(db: Session, data: PricingFormulaCreate) -> PricingFormula:
         db.add(FormulaAdjustment(formula_id=formula.id, **adj.model_dump()))
 
     db.commit()
+    formula_cache.bump(formula.id)
     db.refresh(formula)
     return formula
 
@@ -40,6 +87,7 @@ def update_formula(db: Session, formula_id: int, data: PricingFormulaUpdate) ->
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(formula, field, value)
     db.commit()
+    formula_cache.bump(formula_id)
     db.refresh(formula)
     return formula
 
@@ -48,10 +96,11 @@ def delete_formula(db: Session, formula_id: int) -> None:
     formula = get_formula(db, formula_id)
     db.delete(formula)
     db.commit()
+    formula_cache.bump(formula_id)
 
 
 def evaluate_formula(
-    formula: PricingFormula,
+    formula: FormulaPlan | PricingFormula,
     qp_average: float,
     fe: float | None = None,
     moisture: float | None = None,
@@ -59,8 +108,12 @@ def evaluate_formula(
 ) -> PriceBreakdown:
     """Core formula evaluation logic.
 
+    formula: a compiled FormulaPlan; an ORM PricingFormula is compiled on the fly.
     assay_values: dict of element -> actual value (e.g. {"sio2": 4.5, "al2o3": 2.1})
     """
+    if not isinstance(formula, FormulaPlan):
+        formula = compile_formula(formula)
+
     base_price = qp_average
 
     # Fe adjustment
@@ -77,8 +130,9 @@ def evaluate_formula(
     # Impurity penalties from formula adjustments
     impurity_penalties: dict[str, float] = {}
     if assay_values:
+        values = tuple(assay_values.get(element) for element in ASSAY_ELEMENTS)
         for adj in formula.adjustments:
-            actual = assay_values.get(adj.element.lower())
+            actual = values[adj.index]
             if actual is not None and actual > adj.threshold:
                 penalty = -((actual - adj.threshold) * adj.penalty_per_pct)
                 impurity_penalties[adj.element] = penalty
@@ -101,3 +155,92 @@ def evaluate_formula(
         fixed_premium=round(fixed_premium, 4),
         total_price=round(total, 4),
     )
+
+
+@dataclass
+class BatchPriceBreakdown:
+    """Column-wise price components for many assays priced with one formula.
+
+    Components are unrounded float64 arrays; missing inputs contribute 0.
+    """
+
+    base_price: np.ndarray
+    fe_adjustment: np.ndarray
+    moisture_penalty: np.ndarray
+    impurity_penalties: dict[str, np.ndarray]
+    fixed_premium: np.ndarray
+    total_price: np.ndarray
+
+
+def _column(values, n: int) -> np.ndarray:
+    """Float64 column of length n; None entries (or a None column) become NaN."""
+    if values is None:
+        return np.full(n, np.nan)
+    arr = np.asarray(values, dtype=float)
+    return np.broadcast_to(arr, (n,)) if arr.ndim == 0 else arr
+
+
+def evaluate_formula_batch(
+    formula: FormulaPlan | PricingFormula,
+    qp_average,
+    fe=None,
+    moisture=None,
+    sio2=None,
+    al2o3=None,
+    p=None,
+    s=None,
+) -> BatchPriceBreakdown:
+    """Vectorized evaluate_formula over columns of assays.
+
+    Each argument is an array-like of equal length (scalars broadcast).
+    NaN marks a missing value, with the same effect as None in the scalar path.
+    """
+    if not isinstance(formula, FormulaPlan):
+        formula = compile_formula(formula)
+
+    n = max(np.size(v) for v in (qp_average, fe, moisture, sio2, al2o3, p, s) if v is not None)
+    base_price = _column(qp_average, n)
+    fe_col = _column(fe, n)
+    moisture_col = _column(moisture, n)
+    elements = (sio2, al2o3, p, s)  # ASSAY_ELEMENTS order
+
+    # Fe adjustment
+    fe_adjustment = np.zeros(n)
+    if formula.fe_rate_per_pct != 0:
+        fe_adjustment = np.where(
+            np.isnan(fe_col), 0.0, (fe_col - formula.basis_fe) * formula.fe_rate_per_pct,
+        )
+
+    # Moisture penalty
+    moisture_penalty = np.zeros(n)
+    if formula.moisture_penalty_per_pct != 0:
+        excess = np.maximum(0.0, moisture_col - formula.moisture_threshold)
+        moisture_penalty = -np.where(np.isnan(excess), 0.0, excess * formula.moisture_penalty_per_pct)
+
+    # Impurity penalties (NaN > threshold is False, so missing values never penalize)
+    impurity_penalties: dict[str, np.ndarray] = {}
+    for adj in formula.adjustments:
+        values = elements[adj.index]
+        if values is None:
+            continue
+        actual = _column(values, n)
+        impurity_penalties[adj.element] = np.where(
+            actual > adj.threshold, -(actual - adj.threshold) * adj.penalty_per_pct, 0.0,
+        )
+
+    fixed_premium = np.full(n, formula.fixed_premium, dtype=float)
+
+    impurity_total = np.zeros(n)
+    for penalty in impurity_penalties.values():
+        impurity_total = impurity_total + penalty
+
+    total = base_price + fe_adjustment + moisture_penalty + impurity_total + fixed_premium
+
+    return BatchPriceBreakdown(
+        base_price=np.asarray(base_price, dtype=float),
+        fe_adjustment=fe_adjustment,
+        moisture_penalty=moisture_penalty,
+        impurity_penalties=impurity_penalties,
+        fixed_premium=fixed_premium,
+        total_price=total,
+    )
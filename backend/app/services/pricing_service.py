@@ -2,15 +2,21 @@
 
 from datetime import date, timedelta
 from calendar import monthrange
+from typing import Callable
 
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from app.instrumentation import instrumented
 from app.models.contract import Contract
 from app.models.shipment import Shipment
 from app.models.assay import Assay
 from app.services.price_curve_service import get_curve_average
-from app.services.pricing_formula_service import evaluate_formula, get_formula
+from app.services.pricing_formula_service import (
+    evaluate_formula, evaluate_formula_batch, get_formula_plan, get_formula_plans,
+)
+from app.services.formula_cache import ASSAY_COLUMNS, FormulaPlan
+from app.services.position_service import refresh_positions
 from app.schemas.pricing_formula import PriceBreakdown
 
 
@@ -56,58 +62,89 @@ def resolve_qp_dates(
     return start.isoformat(), end.isoformat()
 
 
-def value_all_positions(db: Session) -> dict:
+@instrumented
+def value_all_positions(db: Session, progress: Callable[[int, int], None] | None = None) -> dict:
     """Compute provisional/final prices for all eligible shipments.
 
     For each non-CANCELLED shipment:
       - Compute provisional if provisional assay exists
       - Compute final (+ P&F) if final assay exists
     Skips shipments that lack required assays. Returns a summary.
+
+    Shipments, contracts, assays and compiled formula plans are
+    prefetched in grouped queries and curve windows come from the curve
+    cache. Each shipment's QP average is resolved first; prices are then
+    evaluated with evaluate_formula_batch, one call per assay type and
+    formula (provisional before final, so P&F settles against the fresh
+    provisional price). All price updates are committed in a single
+    transaction. progress(done, total) is called after each shipment.
     """
     shipments = (
         db.query(Shipment)
         .filter(Shipment.status != "CANCELLED")
+        .order_by(Shipment.id)
         .all()
     )
 
-    provisional_count = 0
-    final_count = 0
+    contracts = {
+        c.id: c
+        for c in db.query(Contract).filter(
+            Contract.id.in_(db.query(Shipment.contract_id).filter(Shipment.status != "CANCELLED"))
+        )
+    }
+    assays = {
+        (a.shipment_id, a.assay_type): a
+        for a in db.query(Assay)
+        .join(Shipment, Shipment.id == Assay.shipment_id)
+        .filter(Shipment.status != "CANCELLED")
+    }
+    formulas = get_formula_plans(db, {c.pricing_formula_id for c in contracts.values()})
+
     errors: list[str] = []
+    # assay type -> formula id -> [(shipment, QP average, assay)]
+    groups: dict[str, dict[int, list]] = {"PROVISIONAL": {}, "FINAL": {}}
 
-    for shipment in shipments:
-        contract = db.query(Contract).filter(Contract.id == shipment.contract_id).first()
+    for done, shipment in enumerate(shipments, 1):
+        if progress:
+            progress(done - 1, len(shipments))
+        contract = contracts.get(shipment.contract_id)
         if not contract or not shipment.bl_date:
             continue
-
-        # Try provisional
-        prov_assay = (
-            db.query(Assay)
-            .filter(Assay.shipment_id == shipment.id, Assay.assay_type == "PROVISIONAL")
-            .first()
-        )
-        if prov_assay:
+        formula = formulas.get(contract.pricing_formula_id)
+        for assay_type, by_formula in groups.items():
+            assay = assays.get((shipment.id, assay_type))
+            if not assay:
+                continue
             try:
-                compute_provisional_price(db, shipment, contract)
-                provisional_count += 1
+                qp_avg = _qp_average(db, contract, formula, shipment.bl_date)
             except HTTPException as e:
-                errors.append(f"{shipment.reference} provisional: {e.detail}")
-
-        # Try final
-        final_assay = (
-            db.query(Assay)
-            .filter(Assay.shipment_id == shipment.id, Assay.assay_type == "FINAL")
-            .first()
-        )
-        if final_assay:
-            try:
-                compute_final_price(db, shipment, contract)
-                final_count += 1
-            except HTTPException as e:
-                errors.append(f"{shipment.reference} final: {e.detail}")
+                errors.append(f"{shipment.reference} {assay_type.lower()}: {e.detail}")
+                continue
+            by_formula.setdefault(formula.id, []).append((shipment, qp_avg, assay))
+
+    counts = dict.fromkeys(groups, 0)
+    for assay_type, by_formula in groups.items():
+        for formula_id, rows in by_formula.items():
+            priced, qp_averages, group_assays = zip(*rows)
+            columns = {column: [getattr(a, column) for a in group_assays] for column in ASSAY_COLUMNS}
+            totals = evaluate_formula_batch(formulas[formula_id], qp_averages, **columns).total_price
+            for shipment, total in zip(priced, totals.tolist()):
+                price = round(total, 4)  # as PriceBreakdown.total_price
+                if assay_type == "PROVISIONAL":
+                    shipment.provisional_price = price
+                else:
+                    shipment.final_price = price
+                    shipment.pnf_amount = _pnf_amount(shipment, price)
+            counts[assay_type] += len(rows)
+
+    if progress:
+        progress(len(shipments), len(shipments))
+    refresh_positions(db, contracts.keys())
+    db.commit()
 
     return {
-        "provisional_computed": provisional_count,
-        "final_computed": final_count,
+        "provisional_computed": counts["PROVISIONAL"],
+        "final_computed": counts["FINAL"],
         "errors": errors,
     }
 
@@ -121,6 +158,52 @@ def _assay_to_dict(assay: Assay) -> dict[str, float | None]:
     }
 
 
+def _qp_average(db: Session, contract: Contract, formula: FormulaPlan | None, bl_date: str) -> float:
+    """Curve average over the contract's QP window for a BL date."""
+    if formula is None:
+        raise HTTPException(status_code=404, detail="Pricing formula not found")
+
+    # Resolve QP dates
+    qp_start, qp_end = resolve_qp_dates(
+        contract.qp_convention,
+        bl_date,
+        contract.qp_start_offset,
+        contract.qp_end_offset,
+    )
+
+    # Get QP average
+    qp_avg, _ = get_curve_average(db, formula.curve_id, qp_start, qp_end)
+    return qp_avg
+
+
+def _price_with_assay(
+    db: Session,
+    contract: Contract,
+    formula: FormulaPlan | None,
+    bl_date: str,
+    assay: Assay,
+) -> PriceBreakdown:
+    """Evaluate the contract formula over its QP window for one assay."""
+    qp_avg = _qp_average(db, contract, formula, bl_date)
+
+    # Evaluate formula
+    return evaluate_formula(
+        formula=formula,
+        qp_average=qp_avg,
+        fe=assay.fe,
+        moisture=assay.moisture,
+        assay_values=_assay_to_dict(assay),
+    )
+
+
+def _pnf_amount(shipment: Shipment, final_price: float) -> float | None:
+    """P&F settlement against the cached provisional price, if both sides are known."""
+    if shipment.provisional_price is not None and shipment.bl_quantity is not None:
+        return round((final_price - shipment.provisional_price) * shipment.bl_quantity, 2)
+    return None
+
+
+@instrumented
 def compute_provisional_price(
     db: Session,
     shipment: Shipment,
@@ -139,36 +222,19 @@ def compute_provisional_price(
     if not prov_assay:
         raise HTTPException(status_code=400, detail="No provisional assay found for this shipment")
 
-    formula = get_formula(db, contract.pricing_formula_id)
-
-    # Resolve QP dates
-    qp_start, qp_end = resolve_qp_dates(
-        contract.qp_convention,
-        shipment.bl_date,
-        contract.qp_start_offset,
-        contract.qp_end_offset,
-    )
-
-    # Get QP average
-    qp_avg, _ = get_curve_average(db, formula.curve_id, qp_start, qp_end)
-
-    # Evaluate formula
-    breakdown = evaluate_formula(
-        formula=formula,
-        qp_average=qp_avg,
-        fe=prov_assay.fe,
-        moisture=prov_assay.moisture,
-        assay_values=_assay_to_dict(prov_assay),
-    )
+    formula = get_formula_plan(db, contract.pricing_formula_id)
+    breakdown = _price_with_assay(db, contract, formula, shipment.bl_date, prov_assay)
 
     # Cache on shipment
     shipment.provisional_price = breakdown.total_price
+    refresh_positions(db, [shipment.contract_id])
     db.commit()
     db.refresh(shipment)
 
     return breakdown.total_price, breakdown
 
 
+@instrumented
 def compute_final_price(
     db: Session,
     shipment: Shipment,
@@ -190,35 +256,18 @@ def compute_final_price(
     if not final_assay:
         raise HTTPException(status_code=400, detail="No final assay found for this shipment")
 
-    formula = get_formula(db, contract.pricing_formula_id)
-
-    qp_start, qp_end = resolve_qp_dates(
-        contract.qp_convention,
-        shipment.bl_date,
-        contract.qp_start_offset,
-        contract.qp_end_offset,
-    )
-
-    qp_avg, _ = get_curve_average(db, formula.curve_id, qp_start, qp_end)
-
-    breakdown = evaluate_formula(
-        formula=formula,
-        qp_average=qp_avg,
-        fe=final_assay.fe,
-        moisture=final_assay.moisture,
-        assay_values=_assay_to_dict(final_assay),
-    )
+    formula = get_formula_plan(db, contract.pricing_formula_id)
+    breakdown = _price_with_assay(db, contract, formula, shipment.bl_date, final_assay)
 
     final_price = breakdown.total_price
 
     # P&F settlement
-    pnf_amount = None
-    if shipment.provisional_price is not None and shipment.bl_quantity is not None:
-        pnf_amount = round((final_price - shipment.provisional_price) * shipment.bl_quantity, 2)
+    pnf_amount = _pnf_amount(shipment, final_price)
 
     # Cache on shipment
     shipment.final_price = final_price
     shipment.pnf_amount = pnf_amount
+    refresh_positions(db, [shipment.contract_id])
     db.commit()
     db.refresh(shipment)
 
@@ -0,0 +1,163 @@
+"""Cached read results (dashboard, exposure, P&L summaries) keyed by data version.
+
+A version vector counts committed writes per data domain (contracts,
+shipments, ...). Session hooks note the tables each flush or DML statement
+writes and bump their domains once the transaction commits; a rollback
+drops them. A cached result is stored with the versions of the domains it
+depends on and served until one of them moves, so repeated reads are a
+memory hit between writes.
+
+The ETag of a result is derived from the same versions plus an epoch that
+changes on every restart and clear(), so a matching If-None-Match is
+answered with 304 without touching the database.
+
+Versions live in this process. Job workers in other processes report their
+writes through job_runner, which bumps the vector when a job ends, but
+writes from any other process (a second API worker, the admin CLI, another
+client of the database) are not seen: the cache is only correct with a
+single API worker process, which is how the image runs uvicorn.
+"""
+
+import secrets
+import threading
+from typing import Any, Awaitable, Callable, TypeVar
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+DOMAINS = ("contracts", "shipments", "assays", "curves", "formulas", "matches", "mtm")
+
+# Domain each written table belongs to; other tables (jobs, ...) are not tracked
+TABLE_DOMAINS = {
+    "contracts": "contracts",
+    "shipments": "shipments",
+    "contract_positions": "shipments",
+    "assays": "assays",
+    "price_curves": "curves",
+    "curve_data": "curves",
+    "pricing_formulas": "formulas",
+    "formula_adjustments": "formulas",
+    "matches": "matches",
+    "mtm_history": "mtm",
+    "latest_mtm": "mtm",
+}
+
+EXPOSURE_DEPS = ("contracts", "shipments", "curves", "formulas")
+PNL_DEPS = ("contracts", "shipments", "matches", "mtm")
+DASHBOARD_DEPS = tuple(d for d in DOMAINS if d in EXPOSURE_DEPS or d in PNL_DEPS)
+
+_lock = threading.Lock()
+_versions = dict.fromkeys(DOMAINS, 0)
+_entries: dict[str, tuple[tuple[int, ...], Any]] = {}
+# Distinguishes this process's ETags from those issued before a restart or clear()
+_epoch = secrets.token_hex(4)
+_hits = 0
+_misses = 0
+
+
+def versions(deps: tuple[str, ...] = DOMAINS) -> tuple[int, ...]:
+    with _lock:
+        return tuple(_versions[d] for d in deps)
+
+
+def bump(*domains: str) -> None:
+    """Record a committed write to the given domains (all domains if none given)."""
+    with _lock:
+        for d in domains or DOMAINS:
+            _versions[d] += 1
+
+
+def etag(name: str, deps: tuple[str, ...]) -> str:
+    return f'W/"{name}-{_epoch}-{".".join(map(str, versions(deps)))}"'
+
+
+async def get(name: str, deps: tuple[str, ...], loader: Callable[[], Awaitable[T]]) -> T:
+    """The cached result for name, awaiting loader() if any of deps moved since it was stored.
+
+    Versions are read before loading: a write committing during the load
+    moves them past the stored key, so the next read loads again.
+    """
+    global _hits, _misses
+    key = versions(deps)
+    with _lock:
+        entry = _entries.get(name)
+        if entry is not None and entry[0] == key:
+            _hits += 1
+            return entry[1]
+        _misses += 1
+    value = await loader()
+    with _lock:
+        _entries[name] = (key, value)
+    return value
+
+
+async def conditional(
+    request: Request, response: Response, name: str, deps: tuple[str, ...],
+    loader: Callable[[], Awaitable[T]],
+) -> T | Response:
+    """Serve a cached result with its ETag, or 304 when If-None-Match already holds it."""
+    tag = etag(name, deps)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if tag in (t.strip() for t in request.headers.get("If-None-Match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return await get(name, deps, loader)
+
+
+def stats() -> dict:
+    with _lock:
+        return {"entries": len(_entries), "hits": _hits, "misses": _misses, "versions": dict(_versions)}
+
+
+def clear() -> None:
+    """Drop cached results, reset the versions and retire every ETag issued so far (database reset, tests)."""
+    global _epoch, _hits, _misses
+    with _lock:
+        _entries.clear()
+        _versions.update(dict.fromkeys(DOMAINS, 0))
+        _epoch = secrets.token_hex(4)
+        _hits = _misses = 0
+
+
+# --- Write tracking ---
+
+def _note(session: Session, tables) -> None:
+    domains = {TABLE_DOMAINS[t.name] for t in tables if t.name in TABLE_DOMAINS}
+    if domains:
+        session.info.setdefault("written_domains", set()).update(domains)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    _note(session, {
+        obj.__table__
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(obj, "__table__")
+    })
+
+
+def _do_orm_execute(state) -> None:
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if state.is_insert or state.is_update or state.is_delete:
+        _note(state.session, [state.statement.table])
+
+
+def _after_commit(session: Session) -> None:
+    domains = session.info.pop("written_domains", None)
+    if domains:
+        bump(*domains)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop("written_domains", None)
+
+
+def install() -> None:
+    """Track writes on every Session (sync, and the sync side of AsyncSession)."""
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,302 @@
+"""What-if scenarios: curve shocks applied to the open book in memory.
+
+The book is loaded once and reduced to price points, each with a curve and
+a tenor (months from the valuation month):
+
+- MTM points, one per (curve, delivery month), carry the curve price at the
+  valuation date (as in run_mtm_portfolio) and the signed open quantity
+  with a contract price;
+- exposure points, one per delivery month, carry that month's average price
+  on the curve compute_exposure picks for it and the signed open quantity;
+- P&F points, one per provisionally priced shipment whose QP window is
+  still open, carry the QP average so far and the share of it still to fix.
+
+MTM and exposure are linear in the point prices:
+
+    MTM       = prices · mtm_weights - Σ signed open qty × contract price
+    exposure  = prices · exposure_weights
+
+P&F re-prices each open-QP shipment with its formula at the shocked QP
+average (evaluate_formula_batch over all scenarios at once) and settles it
+against the provisional price. Nothing is written: MTM history,
+latest_mtm, shipments and the curves are left as they are.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.instrumentation import instrumented
+from app.models.assay import Assay
+from app.models.contract import Contract
+from app.models.shipment import Shipment
+from app.schemas.common import ShockKind
+from app.schemas.scenario import Scenario, ScenarioOutcome, ScenarioRunOut
+from app.services.exposure_service import get_month_curve_price
+from app.services.formula_cache import ASSAY_COLUMNS, FormulaPlan
+from app.services.mtm_service import OPEN_STATUSES, get_current_curve_price
+from app.services.pnl_service import get_realized_pnl
+from app.services.position_service import EMPTY, get_contract_aggregates
+from app.services.price_curve_service import get_curve_series
+from app.services.pricing_formula_service import evaluate_formula_batch, get_formula_plans
+from app.services.pricing_service import resolve_qp_dates
+
+
+@dataclass(frozen=True)
+class PnfGroup:
+    """Open-QP shipments priced with one formula, as columns for evaluate_formula_batch."""
+
+    plan: FormulaPlan
+    points: np.ndarray  # per shipment, index of its P&F point
+    floating: np.ndarray  # per shipment, share of the QP average not fixed yet
+    assays: dict[str, np.ndarray]  # ASSAY_COLUMNS; NaN where not assayed
+    provisional: np.ndarray  # per shipment, provisional price
+    signed_qty: np.ndarray  # per shipment, BL quantity; + on SELL (P&F received), - on BUY
+
+
+@dataclass(frozen=True)
+class BookSnapshot:
+    """The open book as price points and the quantities priced off them."""
+
+    valuation_date: str
+    snapshot_date: str
+    contracts: int  # open positions
+    curve_ids: np.ndarray  # per point
+    tenors: np.ndarray  # per point, months to delivery
+    base_prices: np.ndarray  # per point
+    mtm_weights: np.ndarray  # per point; 0 on exposure points
+    exposure_weights: np.ndarray  # per point; 0 on MTM points
+    mtm_cost: float  # Σ signed open quantity × contract price
+    pnf_groups: list[PnfGroup]
+    realized_pnl: float
+
+
+def _month_index(iso: str) -> int:
+    return int(iso[:4]) * 12 + int(iso[5:7]) - 1
+
+
+def _open_qp_shipments(db: Session, valuation_date: str):
+    """Provisionally priced, not yet finalised shipments whose QP ends after the valuation date.
+
+    Yields (plan, qp_end, qp_average, floating share, assay values,
+    provisional price, signed BL quantity). The QP average is taken as
+    pricing_service does (latest snapshot per date); its floating share is
+    the fraction of its price points dated after the valuation date.
+    Shipments whose QP cannot be resolved or has no curve data are left out.
+    """
+    rows = (
+        db.query(Shipment, Contract)
+        .join(Contract, Contract.id == Shipment.contract_id)
+        .filter(
+            Shipment.status != "CANCELLED",
+            Shipment.final_price.is_(None),
+            Shipment.provisional_price.is_not(None),
+            Shipment.bl_date.is_not(None),
+            Shipment.bl_quantity.is_not(None),
+        )
+        .all()
+    )
+    if not rows:
+        return
+    assays = {
+        (a.shipment_id, a.assay_type): a
+        for a in db.query(Assay).filter(Assay.shipment_id.in_([shipment.id for shipment, _ in rows]))
+    }
+    plans = get_formula_plans(db, {contract.pricing_formula_id for _, contract in rows})
+    after = (date.fromisoformat(valuation_date) + timedelta(days=1)).isoformat()
+    for shipment, contract in rows:
+        assay = assays.get((shipment.id, "FINAL")) or assays.get((shipment.id, "PROVISIONAL"))
+        plan = plans.get(contract.pricing_formula_id)
+        if assay is None or plan is None:
+            continue
+        try:
+            qp_start, qp_end = resolve_qp_dates(
+                contract.qp_convention, shipment.bl_date, contract.qp_start_offset, contract.qp_end_offset,
+            )
+        except HTTPException:
+            continue
+        if qp_end <= valuation_date:
+            continue  # QP fully fixed
+        series = get_curve_series(db, plan.curve_id)
+        window = series.average(qp_start, qp_end)
+        if window is None:
+            continue
+        qp_average, count = window
+        floating = series.average(max(qp_start, after), qp_end)
+        yield (
+            plan, qp_end, qp_average, (floating[1] if floating else 0) / count,
+            {column: getattr(assay, column) for column in ASSAY_COLUMNS},
+            shipment.provisional_price,
+            shipment.bl_quantity if contract.direction == "SELL" else -shipment.bl_quantity,
+        )
+
+
+@instrumented
+def load_book(db: Session, valuation_date: str, snapshot_date: str | None = None) -> BookSnapshot:
+    """Snapshot the open book and the curve prices it is valued at."""
+    try:
+        date.fromisoformat(valuation_date)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="valuation_date must be ISO-8601 (YYYY-MM-DD)")
+    snap = snapshot_date or valuation_date
+    contracts = db.query(
+        Contract.id, Contract.direction, Contract.quantity, Contract.delivery_start, Contract.pricing_formula_id,
+    ).filter(Contract.status.in_(OPEN_STATUSES)).all()
+    aggregates = get_contract_aggregates(db)
+    plans = get_formula_plans(db, {c.pricing_formula_id for c in contracts})
+
+    valuation_month = _month_index(valuation_date)
+    mtm: dict[tuple[int, int], float] = {}
+    exposure: dict[str, float] = {}
+    month_curves: dict[str, int] = {}  # as compute_exposure: the curve of the month's last contract
+    mtm_cost = 0.0
+    positions = 0
+    for c in contracts:
+        agg = aggregates.get(c.id, EMPTY)
+        open_qty = c.quantity - agg.shipped_qty
+        if open_qty <= 0:
+            continue
+        plan = plans.get(c.pricing_formula_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="Pricing formula not found")
+        positions += 1
+        signed = open_qty if c.direction == "BUY" else -open_qty
+        month = c.delivery_start[:7]
+        exposure[month] = exposure.get(month, 0.0) + signed
+        month_curves[month] = plan.curve_id
+        if agg.avg_price is not None:
+            tenor = max(0, _month_index(c.delivery_start) - valuation_month)
+            mtm[(plan.curve_id, tenor)] = mtm.get((plan.curve_id, tenor), 0.0) + signed
+            mtm_cost += signed * agg.avg_price
+
+    curve_prices = {
+        curve_id: get_current_curve_price(db, curve_id, valuation_date, snap) for curve_id in {k[0] for k in mtm}
+    }
+    points = [(curve_id, tenor, curve_prices[curve_id], qty, 0.0) for (curve_id, tenor), qty in mtm.items()]
+    for month, qty in exposure.items():
+        curve_id = month_curves[month]
+        price = get_month_curve_price(db, curve_id, month)
+        if price:  # no curve data for the month: no USD exposure, as in compute_exposure
+            tenor = max(0, _month_index(month) - valuation_month)
+            points.append((curve_id, tenor, price, 0.0, qty))
+
+    shipments: dict[int, list] = {}
+    for plan, qp_end, qp_average, *values in _open_qp_shipments(db, valuation_date):
+        shipments.setdefault(plan.id, [plan]).append((len(points), *values))
+        points.append((plan.curve_id, max(0, _month_index(qp_end) - valuation_month), qp_average, 0.0, 0.0))
+    pnf_groups = []
+    for plan, *rows in shipments.values():
+        indices, floating, assays, provisional, signed_qty = zip(*rows)
+        pnf_groups.append(PnfGroup(
+            plan=plan,
+            points=np.array(indices, dtype=np.int64),
+            floating=np.array(floating, dtype=np.float64),
+            assays={column: np.array([a[column] for a in assays], dtype=np.float64) for column in ASSAY_COLUMNS},
+            provisional=np.array(provisional, dtype=np.float64),
+            signed_qty=np.array(signed_qty, dtype=np.float64),
+        ))
+
+    columns = list(zip(*points)) or [()] * 5
+    return BookSnapshot(
+        valuation_date=valuation_date,
+        snapshot_date=snap,
+        contracts=positions,
+        curve_ids=np.array(columns[0], dtype=np.int64),
+        tenors=np.array(columns[1], dtype=np.float64),
+        base_prices=np.array(columns[2], dtype=np.float64),
+        mtm_weights=np.array(columns[3], dtype=np.float64),
+        exposure_weights=np.array(columns[4], dtype=np.float64),
+        mtm_cost=mtm_cost,
+        pnf_groups=pnf_groups,
+        realized_pnl=sum(i.realized_pnl or 0.0 for i in get_realized_pnl(db)),
+    )
+
+
+def _validate(scenarios: list[Scenario]) -> None:
+    if not scenarios:
+        raise HTTPException(status_code=422, detail="At least one scenario is required")
+    if len(scenarios) > settings.SCENARIO_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {settings.SCENARIO_MAX} scenarios per run")
+    for scenario in scenarios:
+        for shock in scenario.shocks:
+            if shock.kind is ShockKind.TENOR and not shock.tenors:
+                raise HTTPException(status_code=422, detail=f"TENOR shock without tenors in {scenario.name!r}")
+
+
+def shocked_prices(book: BookSnapshot, scenarios: list[Scenario]) -> np.ndarray:
+    """(scenarios × points) prices after each scenario's shocks, applied in order."""
+    prices = np.tile(book.base_prices, (len(scenarios), 1))
+    for row, scenario in zip(prices, scenarios):
+        for shock in scenario.shocks:
+            on = slice(None) if shock.curve_id is None else book.curve_ids == shock.curve_id
+            if shock.kind is ShockKind.PARALLEL:
+                row[on] += shock.value
+            elif shock.kind is ShockKind.PERCENT:
+                row[on] *= 1 + shock.value / 100
+            else:
+                tenors = sorted(shock.tenors, key=lambda t: t.months)
+                row[on] += np.interp(book.tenors[on], [t.months for t in tenors], [t.shift for t in tenors])
+    return prices
+
+
+def pnf_values(book: BookSnapshot, prices: np.ndarray) -> np.ndarray:
+    """Expected P&F of the open-QP shipments for each row of point prices.
+
+    Only the floating share of a QP average moves with its point's price;
+    the shipment is re-priced with its formula at that average and settled
+    against its provisional price.
+    """
+    pnf = np.zeros(len(prices))
+    for group in book.pnf_groups:
+        base = book.base_prices[group.points]
+        qp_average = base + group.floating * (prices[:, group.points] - base)  # (rows × shipments)
+        final = evaluate_formula_batch(
+            group.plan, qp_average.ravel(),
+            **{column: np.tile(values, len(prices)) for column, values in group.assays.items()},
+        ).total_price.reshape(qp_average.shape)
+        pnf += (final - group.provisional) @ group.signed_qty
+    return pnf
+
+
+def evaluate(book: BookSnapshot, scenarios: list[Scenario]) -> ScenarioRunOut:
+    """MTM, exposure and P&L of the book under each scenario, against the unshocked book."""
+    _validate(scenarios)
+    prices = np.vstack([book.base_prices, shocked_prices(book, scenarios)])
+    mtm = prices @ book.mtm_weights - book.mtm_cost
+    exposure = prices @ book.exposure_weights
+    pnf = pnf_values(book, prices)
+
+    def outcome(name: str, i: int) -> ScenarioOutcome:
+        return ScenarioOutcome(
+            name=name,
+            mtm=round(float(mtm[i]), 2),
+            mtm_change=round(float(mtm[i] - mtm[0]), 2),
+            net_exposure_usd=round(float(exposure[i]), 2),
+            exposure_change=round(float(exposure[i] - exposure[0]), 2),
+            pnf=round(float(pnf[i]), 2),
+            pnf_change=round(float(pnf[i] - pnf[0]), 2),
+            total_pnl=round(book.realized_pnl + float(mtm[i]) + float(pnf[i]), 2),
+        )
+
+    return ScenarioRunOut(
+        valuation_date=book.valuation_date,
+        snapshot_date=book.snapshot_date,
+        contracts=book.contracts,
+        open_qp_shipments=sum(len(g.points) for g in book.pnf_groups),
+        realized_pnl=round(book.realized_pnl, 2),
+        base=outcome("BASE", 0),
+        scenarios=[outcome(s.name, i) for i, s in enumerate(scenarios, 1)],
+    )
+
+
+@instrumented
+def run_scenarios(
+    db: Session, valuation_date: str, snapshot_date: str | None, scenarios: list[Scenario],
+) -> ScenarioRunOut:
+    """Value the open book under every scenario without writing anything."""
+    _validate(scenarios)
+    return evaluate(load_book(db, valuation_date, snapshot_date), scenarios)
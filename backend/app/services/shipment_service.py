@@ -1,15 +1,34 @@
+from typing import Iterator
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 from app.models.shipment import Shipment
-from app.schemas.shipment import ShipmentCreate, ShipmentUpdate
+from app.services.pagination import Page, paginate, stream_ndjson
+from app.services.position_service import refresh_positions
+from app.schemas.shipment import ShipmentCreate, ShipmentUpdate, ShipmentOut
+
+LIST_KEYS = (Shipment.id,)
 
 
-def list_shipments(db: Session, contract_id: int | None = None) -> list[Shipment]:
+def _list_query(db: Session, contract_id: int | None):
     q = db.query(Shipment)
     if contract_id:
         q = q.filter(Shipment.contract_id == contract_id)
-    return q.all()
+    return q
+
+
+def list_shipments(
+    db: Session,
+    contract_id: int | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> Page[Shipment]:
+    return paginate(_list_query(db, contract_id), LIST_KEYS, cursor, limit)
+
+
+def stream_shipments(db: Session, contract_id: int | None = None) -> Iterator[str]:
+    return stream_ndjson(db, lambda s: _list_query(s, contract_id), LIST_KEYS, ShipmentOut)
 
 
 def get_shipment(db: Session, shipment_id: int) -> Shipment:
@@ -25,6 +44,7 @@ def create_shipment(db: Session, data: ShipmentCreate) -> Shipment:
         raise HTTPException(status_code=409, detail=f"Shipment reference '{data.reference}' already exists")
     shipment = Shipment(**data.model_dump())
     db.add(shipment)
+    refresh_positions(db, [shipment.contract_id])
     db.commit()
     db.refresh(shipment)
     return shipment
@@ -37,8 +57,10 @@ def update_shipment(db: Session, shipment_id: int, data: ShipmentUpdate) -> Ship
         existing = db.query(Shipment).filter(Shipment.reference == updates["reference"]).first()
         if existing:
             raise HTTPException(status_code=409, detail=f"Shipment reference '{updates['reference']}' already exists")
+    previous_contract_id = shipment.contract_id
     for field, value in updates.items():
         setattr(shipment, field, value)
+    refresh_positions(db, [previous_contract_id, shipment.contract_id])
     db.commit()
     db.refresh(shipment)
     return shipment
@@ -47,6 +69,7 @@ def update_shipment(db: Session, shipment_id: int, data: ShipmentUpdate) -> Ship
 def update_shipment_status(db: Session, shipment_id: int, status: str) -> Shipment:
     shipment = get_shipment(db, shipment_id)
     shipment.status = status
+    refresh_positions(db, [shipment.contract_id])
     db.commit()
     db.refresh(shipment)
     return shipment
@@ -55,4 +78,5 @@ def update_shipment_status(db: Session, shipment_id: int, status: str) -> Shipme
 def delete_shipment(db: Session, shipment_id: int) -> None:
     shipment = get_shipment(db, shipment_id)
     db.delete(shipment)
+    refresh_positions(db, [shipment.contract_id])
     db.commit()
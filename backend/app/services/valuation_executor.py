@@ -0,0 +1,72 @@
+"""Bounded executor for long-running valuations.
+
+MTM runs and position valuation can take tens of seconds. Async routes hand
+them to this small dedicated thread pool instead of the shared request
+threadpool, so CRUD requests keep their workers while valuations run.
+
+At most VALUATION_WORKERS jobs run at once and VALUATION_QUEUE more may
+wait; past that a request is turned away with 503 instead of queueing
+without bound. A slot is held until the job itself finishes, even if the
+client disconnects first.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+
+
+def _pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.VALUATION_WORKERS, thread_name_prefix="valuation",
+            )
+            _slots = threading.BoundedSemaphore(settings.VALUATION_WORKERS + settings.VALUATION_QUEUE)
+        return _executor, _slots
+
+
+async def run_valuation(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a sync valuation on the valuation pool and await its result."""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Valuation capacity exhausted, retry later",
+            headers={"Retry-After": "5"},
+        )
+
+    def job() -> T:
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            slots.release()
+
+    try:
+        # In the caller's context, so the request's instrumentation sees the job's queries
+        future = executor.submit(contextvars.copy_context().run, job)
+    except BaseException:
+        slots.release()
+        raise
+    return await asyncio.wrap_future(future)
+
+
+def shutdown() -> None:
+    """Wait for running valuations and discard the pool (application shutdown)."""
+    global _executor, _slots
+    with _lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=True)
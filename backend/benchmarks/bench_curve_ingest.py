@@ -0,0 +1,67 @@
+"""Benchmark: JSON bulk_upload_data vs streaming CSV ingest_curve_data.
+
+Each path loads the same synthetic daily curve into a fresh SQLite file.
+
+Run: python -m benchmarks.bench_curve_ingest [rows]
+"""
+
+import io
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, build_engine
+from app.models.price_curve import PriceCurve
+from app.schemas.price_curve import CurveDataCreate
+from app.services.price_curve_service import bulk_upload_data, ingest_curve_data
+import app.models  # noqa: F401
+
+
+def make_rows(rows: int) -> list[tuple[str, str, float]]:
+    """Daily prices, one snapshot per month, walking back from 2025-01-01."""
+    start = date(2025, 1, 1)
+    out = []
+    for i in range(rows):
+        d = start - timedelta(days=i)
+        out.append((d.isoformat(), d.replace(day=1).isoformat(), 100.0 + (i % 500) * 0.05))
+    return out
+
+
+def timed_load(path: Path, load) -> float:
+    engine = build_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    curve = PriceCurve(code="BENCH", name="Bench")
+    db.add(curve)
+    db.commit()
+    start = time.perf_counter()
+    load(db, curve.id)
+    elapsed = time.perf_counter() - start
+    db.close()
+    engine.dispose()
+    return elapsed
+
+
+def main(rows: int = 200_000) -> None:
+    data = make_rows(rows)
+    csv_body = "price_date,price,snapshot_date\n" + "".join(f"{pd},{p},{sd}\n" for pd, sd, p in data)
+    points = [CurveDataCreate(price_date=pd, price=p, snapshot_date=sd) for pd, sd, p in data]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_s = timed_load(Path(tmp) / "json.db", lambda db, cid: bulk_upload_data(db, cid, points))
+        stream_s = timed_load(
+            Path(tmp) / "stream.db", lambda db, cid: ingest_curve_data(db, cid, io.StringIO(csv_body), "csv"),
+        )
+
+    print(f"rows:     {rows:,}")
+    print(f"json:     {json_s:.3f}s ({rows / json_s:,.0f} rows/s)")
+    print(f"stream:   {stream_s:.3f}s ({rows / stream_s:,.0f} rows/s)")
+    print(f"speedup:  {json_s / stream_s:,.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,66 @@
+"""Benchmark: scalar evaluate_formula loop vs evaluate_formula_batch.
+
+Both sides get the same compiled FormulaPlan, as value_all_positions does,
+so the scalar loop is not timed recompiling the formula on every row.
+
+Run: python -m benchmarks.bench_evaluate_formula [rows]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from app.models.pricing_formula import PricingFormula, FormulaAdjustment
+from app.services.formula_cache import compile_formula
+from app.services.pricing_formula_service import evaluate_formula, evaluate_formula_batch
+
+
+def make_formula() -> PricingFormula:
+    formula = PricingFormula(
+        name="Bench IO 62", curve_id=1, basis_fe=62.0, fe_rate_per_pct=1.50,
+        moisture_threshold=8.0, moisture_penalty_per_pct=0.50, fixed_premium=1.00,
+    )
+    formula.adjustments = [
+        FormulaAdjustment(element="SiO2", threshold=4.5, penalty_per_pct=1.00),
+        FormulaAdjustment(element="Al2O3", threshold=2.5, penalty_per_pct=1.00),
+        FormulaAdjustment(element="P", threshold=0.08, penalty_per_pct=3.00),
+        FormulaAdjustment(element="S", threshold=0.02, penalty_per_pct=2.00),
+    ]
+    return formula
+
+
+def main(rows: int = 100_000) -> None:
+    rng = np.random.default_rng(42)
+    cols = {
+        "qp_average": rng.uniform(95, 125, rows),
+        "fe": rng.uniform(60, 64, rows),
+        "moisture": rng.uniform(6, 10, rows),
+        "sio2": rng.uniform(3.5, 5.5, rows),
+        "al2o3": rng.uniform(1.8, 3.0, rows),
+        "p": rng.uniform(0.05, 0.11, rows),
+        "s": rng.uniform(0.01, 0.03, rows),
+    }
+    formula = compile_formula(make_formula())
+
+    start = time.perf_counter()
+    evaluate_formula_batch(formula, **cols)
+    batch_s = time.perf_counter() - start
+
+    records = [dict(zip(cols, values)) for values in zip(*(c.tolist() for c in cols.values()))]
+    start = time.perf_counter()
+    for r in records:
+        evaluate_formula(
+            formula, qp_average=r["qp_average"], fe=r["fe"], moisture=r["moisture"],
+            assay_values={"sio2": r["sio2"], "al2o3": r["al2o3"], "p": r["p"], "s": r["s"]},
+        )
+    scalar_s = time.perf_counter() - start
+
+    print(f"rows:     {rows:,}")
+    print(f"scalar:   {scalar_s:.3f}s ({rows / scalar_s:,.0f} rows/s)")
+    print(f"batch:    {batch_s:.4f}s ({rows / batch_s:,.0f} rows/s)")
+    print(f"speedup:  {scalar_s / batch_s:,.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,104 @@
+"""Benchmark: incremental vs full FIFO rematch after one late trade.
+
+Loads a synthetic book of BUY and SELL contracts spread over two years of
+delivery into a fresh SQLite file, matches it once, then books one SELL
+near the end of the delivery order and rematches it both ways.
+
+Run: python -m benchmarks.bench_fifo_incremental [contracts]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, build_engine
+from app.models.contract import Contract
+from app.models.match import Match
+from app.models.price_curve import PriceCurve
+from app.models.pricing_formula import PricingFormula
+from app.services.matching_service import run_fifo_matching
+import app.models  # noqa: F401
+
+START = date(2025, 1, 1)
+DAYS = 730
+
+
+def load(db, contracts: int) -> int:
+    curve = PriceCurve(code="BENCH", name="Bench")
+    db.add(curve)
+    db.flush()
+    formula = PricingFormula(
+        name="Bench", curve_id=curve.id, basis_fe=62.0, fe_rate_per_pct=1.5,
+        moisture_threshold=8.0, moisture_penalty_per_pct=0.5, fixed_premium=0.0,
+    )
+    db.add(formula)
+    db.flush()
+    db.execute(insert(Contract), [
+        {
+            "reference": f"C-{i:07d}", "direction": "BUY" if i % 2 else "SELL", "counterparty": "Vale",
+            "quantity": 1000.0 + (i * 37) % 5000,
+            "delivery_start": (START + timedelta(days=i * DAYS // contracts)).isoformat(),
+            "delivery_end": (START + timedelta(days=DAYS)).isoformat(), "pricing_formula_id": formula.id,
+        }
+        for i in range(contracts)
+    ])
+    db.commit()
+    return formula.id
+
+
+def _timed(db, **kwargs) -> tuple[float, list[tuple]]:
+    start = time.perf_counter()
+    matches = run_fifo_matching(db, **kwargs)
+    seconds = time.perf_counter() - start
+    rows = sorted((m.buy_contract_id, m.sell_contract_id, m.matched_quantity) for m in matches)
+    db.expunge_all()
+    return seconds, rows
+
+
+def main(contracts: int = 50_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        formula_id = load(db, contracts)
+        initial_s, _ = _timed(db)
+
+        db.add(Contract(
+            reference="C-LATE", direction="SELL", counterparty="Vale", quantity=2500.0,
+            delivery_start=(START + timedelta(days=DAYS - 5)).isoformat(),
+            delivery_end=(START + timedelta(days=DAYS)).isoformat(), pricing_formula_id=formula_id,
+        ))
+        db.commit()
+        before = db.query(Match.id).count()
+        incremental_s, incremental = _timed(db, incremental=True)
+        after = db.query(Match.id).count()
+
+        # The same rematch from scratch: drop the matches and recorded inputs first
+        db.query(Match).delete()
+        db.commit()
+        full_s, full = _timed(db)
+        assert incremental == full
+
+        # Both return every match: the share of each run spent loading them
+        start = time.perf_counter()
+        db.query(Match).order_by(Match.id).all()
+        load_s = time.perf_counter() - start
+
+        print(f"contracts: {contracts + 1:,}  matches: {before:,} -> {after:,}")
+        print(f"initial full run:       {initial_s:8.2f} s")
+        print(f"incremental after edit: {incremental_s:8.2f} s")
+        print(f"full rebuild:           {full_s:8.2f} s")
+        print(f"  of which result load: {load_s:8.2f} s")
+        print(f"speedup:                {full_s / incremental_s:8.1f}x"
+              f"  ({(full_s - load_s) / (incremental_s - load_s):.1f}x before loading the result)")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
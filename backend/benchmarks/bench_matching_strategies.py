@@ -0,0 +1,49 @@
+"""Benchmark: runtime and realized P&L of each matching strategy.
+
+Runs every strategy over the same synthetic book of priced BUY and SELL
+contracts spread over two years of delivery, in memory (no database).
+
+Run: python -m benchmarks.bench_matching_strategies [contracts]
+"""
+
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app.schemas.common import MatchingStrategy
+from app.services.matching_strategies import STRATEGIES, ContractInput
+
+START = date(2025, 1, 1)
+
+
+def make_book(contracts: int) -> list[ContractInput]:
+    rng = random.Random(42)
+    return [
+        ContractInput(
+            i, "BUY" if rng.random() < 0.5 else "SELL", (START + timedelta(days=rng.randrange(730))).isoformat(),
+            float(rng.randrange(10, 200) * 500), round(rng.uniform(90, 130), 2),
+        )
+        for i in range(contracts)
+    ]
+
+
+def main(contracts: int = 50_000) -> None:
+    book = sorted(make_book(contracts), key=lambda c: (c.delivery_start, c.contract_id))
+    buys = [c for c in book if c.direction == "BUY"]
+    sells = [c for c in book if c.direction == "SELL"]
+
+    print(f"contracts: {contracts:,}  buys: {len(buys):,}  sells: {len(sells):,}")
+    print(f"{'strategy':<9} {'seconds':>8} {'matches':>9} {'quantity':>15} {'realized P&L':>17}")
+    for strategy in MatchingStrategy:
+        remaining = {c.contract_id: c.quantity for c in book}
+        start = time.perf_counter()
+        matches = STRATEGIES[strategy](buys, sells, remaining)
+        seconds = time.perf_counter() - start
+        quantity = sum(v["matched_quantity"] for v in matches.values())
+        pnl = sum(v["realized_pnl"] for v in matches.values())
+        print(f"{strategy.value:<9} {seconds:8.3f} {len(matches):9,} {quantity:15,.0f} {pnl:17,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
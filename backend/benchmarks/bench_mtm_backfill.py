@@ -0,0 +1,91 @@
+"""Benchmark: one-year daily MTM backfill vs one run_mtm_portfolio call per date.
+
+Loads synthetic contracts on a curve with a daily price and a same-day
+snapshot for the year into a fresh SQLite file, then rebuilds the year's
+history both ways with the VALUATION_DATE snapshot policy.
+
+Run: python -m benchmarks.bench_mtm_backfill [contracts]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, build_engine
+from app.models.contract import Contract
+from app.models.mtm import MtmRecord
+from app.models.price_curve import CurveData, PriceCurve
+from app.models.pricing_formula import PricingFormula
+from app.services import curve_cache, formula_cache
+from app.services.mtm_service import backfill_mtm, run_mtm_portfolio
+import app.models  # noqa: F401
+
+START = date(2024, 1, 1)
+DAYS = 366
+
+
+def load(db, contracts: int) -> None:
+    curve = PriceCurve(code="BENCH", name="Bench")
+    db.add(curve)
+    db.flush()
+    formula = PricingFormula(
+        name="Bench", curve_id=curve.id, basis_fe=62.0, fe_rate_per_pct=1.5,
+        moisture_threshold=8.0, moisture_penalty_per_pct=0.5, fixed_premium=0.0,
+    )
+    db.add(formula)
+    db.flush()
+    days = [(START + timedelta(days=i)).isoformat() for i in range(DAYS)]
+    db.execute(insert(CurveData), [
+        {"curve_id": curve.id, "price_date": d, "snapshot_date": d, "price": 100.0 + (i % 30) * 0.25}
+        for i, d in enumerate(days)
+    ])
+    db.execute(insert(Contract), [
+        {
+            "reference": f"C-{i:07d}", "direction": "BUY" if i % 2 else "SELL", "counterparty": "Vale",
+            "quantity": 1000.0 + i, "delivery_start": "2024-06-01", "delivery_end": "2024-06-30",
+            "qp_convention": "MONTH_OF_BL", "pricing_formula_id": formula.id,
+        }
+        for i in range(contracts)
+    ])
+    db.commit()
+
+
+def main(contracts: int = 500) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        load(db, contracts)
+        first, last = START.isoformat(), (START + timedelta(days=DAYS - 1)).isoformat()
+
+        curve_cache.clear()
+        formula_cache.clear()
+        start = time.perf_counter()
+        for i in range(DAYS):
+            run_mtm_portfolio(db, (START + timedelta(days=i)).isoformat())
+            db.expunge_all()
+        per_date_s = time.perf_counter() - start
+        records = db.query(MtmRecord).count()
+
+        curve_cache.clear()
+        formula_cache.clear()
+        start = time.perf_counter()
+        result = backfill_mtm(db, first, last)
+        backfill_s = time.perf_counter() - start
+        assert result.records_written == records == db.query(MtmRecord).count()
+
+        print(f"contracts: {contracts:,}  dates: {DAYS}  records: {records:,}")
+        print(f"per-date runs: {per_date_s:8.2f} s")
+        print(f"backfill:      {backfill_s:8.2f} s")
+        print(f"speedup:       {per_date_s / backfill_s:8.1f}x")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,112 @@
+"""Benchmark: serial vs multi-process portfolio MTM by worker count.
+
+Loads synthetic contracts over a handful of curves, a third of them with a
+priced shipment, into a fresh SQLite file and times run_mtm_portfolio end to
+end: partition planning, loading and valuing the partitions (on the worker
+processes when workers > 1) and the single upsert of every record. The
+"valued" column is the time until the last partition came back, the rest
+is the write. The first run per worker count pays for spawning the pool;
+that warm-up is excluded. Every mode must write the serial records.
+
+Run: python -m benchmarks.bench_mtm_parallel [contracts]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base, build_engine
+from app.models.contract import Contract
+from app.models.price_curve import CurveData, PriceCurve
+from app.models.pricing_formula import PricingFormula
+from app.models.shipment import Shipment
+from app.services import curve_cache, formula_cache, mtm_compute
+from app.services.mtm_service import run_mtm_portfolio
+import app.models  # noqa: F401
+
+CURVES = 8
+VALUATION_DATE = "2025-01-20"
+FIELDS = ("contract_id", "curve_price", "contract_price", "open_quantity", "direction", "mtm_value")
+
+
+def load(db, contracts: int) -> None:
+    formula_ids = []
+    for c in range(CURVES):
+        curve = PriceCurve(code=f"BENCH-{c}", name=f"Bench {c}")
+        db.add(curve)
+        db.flush()
+        db.add(CurveData(curve_id=curve.id, price_date=VALUATION_DATE, snapshot_date=VALUATION_DATE,
+                         price=95.0 + 3 * c))
+        formula = PricingFormula(name=f"Bench {c}", curve_id=curve.id, basis_fe=62.0)
+        db.add(formula)
+        db.flush()
+        formula_ids.append(formula.id)
+    db.execute(insert(Contract), [
+        {
+            "reference": f"C-{i:07d}", "direction": "BUY" if i % 2 else "SELL", "counterparty": "Vale",
+            "quantity": 1000.0 + i, "delivery_start": "2025-01-01", "delivery_end": "2025-01-31",
+            "qp_convention": "MONTH_OF_BL", "pricing_formula_id": formula_ids[i % CURVES],
+        }
+        for i in range(contracts)
+    ])
+    ids = db.scalars(select(Contract.id).order_by(Contract.id)).all()
+    db.execute(insert(Shipment), [
+        {
+            "reference": f"S-{i:07d}", "contract_id": contract_id, "bl_date": "2025-01-10",
+            "bl_quantity": 400.0, "status": "DELIVERED", "provisional_price": 90.0 + i % 40,
+        }
+        for i, contract_id in enumerate(ids) if i % 3 == 0
+    ])
+    db.commit()
+
+
+def timed(db, workers: int) -> tuple[float, float, list]:
+    """(seconds until every partition is valued, total seconds, records)."""
+    curve_cache.clear()
+    formula_cache.clear()
+    valued = 0.0
+
+    def progress(done: int, total: int) -> None:
+        nonlocal valued
+        valued = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = run_mtm_portfolio(db, VALUATION_DATE, progress=progress, workers=workers)
+    seconds = time.perf_counter() - start
+    db.expunge_all()
+    return valued, seconds, [tuple(getattr(r, f) for f in FIELDS) for r in result.records]
+
+
+def main(contracts: int = 200_000) -> None:
+    settings.MTM_PARALLEL_MIN_CONTRACTS = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        load(db, contracts)
+
+        timed(db, 1)  # first write of every record: later runs overwrite them
+        serial_valued, serial_s, expected = timed(db, 1)
+        print(f"contracts: {contracts:,}  curves: {CURVES}  cpus: {os.cpu_count()}")
+        print(f"{'workers':>8} {'valued s':>9} {'total s':>8} {'speedup':>8}")
+        print(f"{1:>8} {serial_valued:>9.3f} {serial_s:>8.3f} {1.0:>7.2f}x")
+        for workers in (2, 4, 8):
+            if workers > (os.cpu_count() or 1):
+                break
+            timed(db, workers)  # warm up the pool
+            valued, parallel_s, records = timed(db, workers)
+            assert records == expected, "parallel records differ from serial"
+            print(f"{workers:>8} {valued:>9.3f} {parallel_s:>8.3f} {serial_s / parallel_s:>7.2f}x")
+        mtm_compute.shutdown()
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,84 @@
+"""Benchmark: keyset vs OFFSET page latency at increasing depth.
+
+Loads synthetic contracts into a fresh SQLite file, then times one page
+of list_contracts at several depths, seeking from the cursor of the row
+before the page, against the equivalent LIMIT/OFFSET query.
+
+Run: python -m benchmarks.bench_pagination [rows]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, build_engine
+from app.models.contract import Contract
+from app.models.pricing_formula import PricingFormula
+from app.models.price_curve import PriceCurve
+from app.services.contract_service import LIST_KEYS, list_contracts
+from app.services.pagination import encode_cursor
+import app.models  # noqa: F401
+
+PAGE = 200
+REPEAT = 20
+
+
+def load(db, rows: int) -> None:
+    curve = PriceCurve(code="BENCH", name="Bench")
+    db.add(curve)
+    db.flush()
+    formula = PricingFormula(
+        name="Bench", curve_id=curve.id, basis_fe=62.0, fe_rate_per_pct=1.5,
+        moisture_threshold=8.0, moisture_penalty_per_pct=0.5, fixed_premium=0.0,
+    )
+    db.add(formula)
+    db.flush()
+    start = date(2020, 1, 1)
+    db.execute(insert(Contract), [
+        {
+            "reference": f"C-{i:07d}", "direction": "BUY" if i % 2 else "SELL", "counterparty": "Vale",
+            "quantity": 1000.0, "delivery_start": (start + timedelta(days=i % 2000)).isoformat(),
+            "delivery_end": "2030-12-31", "qp_convention": "MONTH_OF_BL", "pricing_formula_id": formula.id,
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+
+def timed(db, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+        db.expunge_all()  # no identity-map carry-over between runs
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main(rows: int = 200_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        load(db, rows)
+
+        ordered = db.query(Contract).order_by(*LIST_KEYS)
+        print(f"rows: {rows:,}  page: {PAGE}")
+        print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+        for depth in (0, rows // 10, rows // 2, rows - PAGE):
+            cursor = None
+            if depth:
+                before = ordered.offset(depth - 1).first()
+                cursor = encode_cursor((before.delivery_start, before.id))
+            offset_ms = timed(db, lambda: ordered.offset(depth).limit(PAGE).all())
+            keyset_ms = timed(db, lambda: list_contracts(db, cursor=cursor, limit=PAGE))
+            print(f"{depth:>10,} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,114 @@
+"""Benchmark: a batch of in-memory what-if scenarios vs one portfolio MTM run.
+
+Loads synthetic priced contracts on three curves, delivering over two years,
+into a fresh SQLite file, then evaluates a batch of parallel, percentage and
+tenor shocks. The alternative, editing curve_data and rerunning
+run_mtm_portfolio, costs at least one MTM run (and history writes) per
+scenario.
+
+Run: python -m benchmarks.bench_scenarios [contracts] [scenarios]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, build_engine
+from app.models.contract import Contract
+from app.models.price_curve import CurveData, PriceCurve
+from app.models.pricing_formula import PricingFormula
+from app.models.shipment import Shipment
+from app.schemas.scenario import Scenario
+from app.services.mtm_service import run_mtm_portfolio
+from app.services.scenario_service import evaluate, load_book
+import app.models  # noqa: F401
+
+START = date(2025, 1, 1)
+DAYS = 730
+VALUATION_DATE = "2025-01-15"
+
+
+def load(db, contracts: int) -> None:
+    formulas = []
+    for code in ("TSI_62", "TSI_58", "TSI_65"):
+        curve = PriceCurve(code=code, name=code)
+        db.add(curve)
+        db.flush()
+        db.execute(insert(CurveData), [
+            {"curve_id": curve.id, "price_date": (START + timedelta(days=i)).isoformat(),
+             "snapshot_date": VALUATION_DATE, "price": 100.0 + (i % 60) * 0.2}
+            for i in range(DAYS)
+        ])
+        formula = PricingFormula(
+            name=code, curve_id=curve.id, basis_fe=62.0, fe_rate_per_pct=1.5,
+            moisture_threshold=8.0, moisture_penalty_per_pct=0.5, fixed_premium=0.0,
+        )
+        db.add(formula)
+        db.flush()
+        formulas.append(formula.id)
+    db.execute(insert(Contract), [
+        {
+            "reference": f"C-{i:07d}", "direction": "BUY" if i % 2 else "SELL", "counterparty": "Vale",
+            "quantity": 50000.0 + i % 7 * 1000, "pricing_formula_id": formulas[i % 3],
+            "delivery_start": (START + timedelta(days=i * DAYS // contracts)).isoformat(),
+            "delivery_end": (START + timedelta(days=DAYS)).isoformat(),
+        }
+        for i in range(contracts)
+    ])
+    db.execute(insert(Shipment), [
+        {"reference": f"S-{i:07d}", "contract_id": i + 1, "bl_quantity": 10000.0,
+         "provisional_price": 95.0 + i % 30}
+        for i in range(contracts)
+    ])
+    db.commit()
+
+
+def scenarios(n: int) -> list[Scenario]:
+    out = []
+    for i in range(n):
+        shift = (i % 21) - 10
+        kind = ("PARALLEL", "PERCENT", "TENOR")[i % 3]
+        shock = {"kind": kind, "value": shift}
+        if kind == "TENOR":
+            shock["tenors"] = [{"months": 0, "shift": 0}, {"months": 24, "shift": shift}]
+        out.append(Scenario(name=f"S{i}", shocks=[shock]))
+    return out
+
+
+def main(contracts: int = 50_000, count: int = 500) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        load(db, contracts)
+        batch = scenarios(count)
+
+        start = time.perf_counter()
+        book = load_book(db, VALUATION_DATE)
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        result = evaluate(book, batch)
+        evaluate_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_mtm_portfolio(db, VALUATION_DATE)
+        mtm_s = time.perf_counter() - start
+        db.expunge_all()
+
+        print(f"contracts: {contracts:,}  scenarios: {count:,}  price points: {len(book.base_prices):,}")
+        print(f"book snapshot:         {load_s:8.3f} s")
+        print(f"evaluate scenarios:    {evaluate_s:8.3f} s ({evaluate_s / count * 1000:.3f} ms each)")
+        print(f"one run_mtm_portfolio: {mtm_s:8.3f} s (x{count} = {mtm_s * count:,.0f} s)")
+        print(f"base MTM: {result.base.mtm:,.0f}  worst scenario MTM change: "
+              f"{min(s.mtm_change for s in result.scenarios):,.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -1,23 +1,50 @@
+import os
+
 import pytest
-from sqlalchemy import create_engine, event
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
-from app.database import Base, get_db
+from app.database import Base, async_url, build_engine, get_async_db, get_db
 from app.main import app
+from app.services import curve_cache, formula_cache, result_cache
 
 
-@pytest.fixture(scope="function")
-def db_session():
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+# A scratch SQLite file by default (a file, not :memory:, so the async routes'
+# aiosqlite connections see the same database). Point KARGO_TEST_DATABASE_URL
+# at a scratch PostgreSQL database (e.g. `docker compose --profile postgres up
+# -d postgres`) to run the same suite against Postgres.
+TEST_DATABASE_URL = os.environ.get("KARGO_TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def db_url(tmp_path_factory):
+    return TEST_DATABASE_URL or f"sqlite:///{tmp_path_factory.mktemp('db') / 'kargo_test.db'}"
+
+
+@pytest.fixture(scope="session")
+def db_engine(db_url):
+    engine = build_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        pytest.skip(f"Test database unavailable: {e}")
+    yield engine
+    engine.dispose()
 
-    @event.listens_for(engine, "connect")
-    def _set_sqlite_pragma(dbapi_conn, connection_record):
-        cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
 
+@pytest.fixture(scope="function")
+def db_session(db_engine):
+    engine = db_engine
+    Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    curve_cache.clear()
+    formula_cache.clear()
+    result_cache.clear()
     Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     session = Session()
     try:
@@ -28,14 +55,23 @@ def db_session():
 
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, db_url):
     def _override_get_db():
         try:
             yield db_session
         finally:
             pass
 
+    # NullPool: each request's connection belongs to the event loop that opened it
+    async_engine = create_async_engine(async_url(db_url), poolclass=NullPool)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def _override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_async_db] = _override_get_async_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
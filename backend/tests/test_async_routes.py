@@ -0,0 +1,81 @@
+"""Tests for the async read routes and the bounded valuation executor."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.main import app
+from app.services import valuation_executor
+from app.services.valuation_executor import run_valuation
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    monkeypatch.setattr(settings, "VALUATION_WORKERS", 1)
+    monkeypatch.setattr(settings, "VALUATION_QUEUE", 1)
+    valuation_executor.shutdown()
+    yield
+    valuation_executor.shutdown()
+
+
+class TestAsyncReads:
+    def test_reads_see_committed_rows(self, client, seed_contracts):
+        buy, _ = seed_contracts
+        resp = client.get("/api/v1/contracts/")
+        assert [c["reference"] for c in resp.json()] == ["BUY-001", "SELL-001"]
+        assert client.get(f"/api/v1/contracts/{buy.id}").json()["quantity"] == 75000
+        assert client.get(f"/api/v1/contracts/{buy.id}/open-quantity").json()["open_quantity"] == 75000
+
+    def test_service_errors_propagate(self, client):
+        assert client.get("/api/v1/contracts/999").status_code == 404
+
+    def test_summary_routes(self, client, seed_contracts):
+        assert client.get("/api/v1/dashboard/summary").json()["open_contracts"] == 2
+        assert client.get("/api/v1/pnl/summary").status_code == 200
+        assert client.get("/api/v1/exposure/").status_code == 200
+
+    def test_valuation_routes(self, client, seed_contracts):
+        resp = client.post("/api/v1/mtm/run", json={"valuation_date": "2025-01-20", "snapshot_date": "2025-01-31"})
+        assert resp.status_code == 200
+        assert len(resp.json()["records"]) == 2
+        assert client.get("/api/v1/mtm/portfolio", params={"valuation_date": "2025-01-20"}).json()["total_mtm"] == (
+            resp.json()["total_mtm"]
+        )
+        assert client.post("/api/v1/dashboard/value-all-positions").status_code == 200
+
+
+class TestValuationExecutor:
+    def test_rejects_past_capacity(self, small_pool):
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(run_valuation(release.wait))
+            queued = asyncio.ensure_future(run_valuation(lambda: "queued"))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as exc:
+                await run_valuation(lambda: "rejected")
+            assert exc.value.status_code == 503
+            release.set()
+            return await running, await queued
+
+        assert asyncio.run(scenario()) == (True, "queued")
+
+    def test_reads_not_starved_by_valuations(self, client, seed_contracts, small_pool):
+        release = threading.Event()
+
+        async def scenario():
+            busy = [asyncio.ensure_future(run_valuation(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                resp = await asyncio.wait_for(ac.get("/api/v1/contracts/"), timeout=10)
+            assert not any(t.done() for t in busy)
+            release.set()
+            await asyncio.gather(*busy)
+            return resp
+
+        assert asyncio.run(scenario()).status_code == 200
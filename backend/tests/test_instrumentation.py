@@ -0,0 +1,98 @@
+"""Tests for query-count and latency instrumentation."""
+
+import re
+
+import pytest
+from sqlalchemy import select
+
+from app import instrumentation
+from app.instrumentation import instrumented
+from app.models.contract import Contract
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    instrumentation.clear()
+    yield
+    instrumentation.clear()
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of one series in a /metrics body."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{name}\{{(.*)\}} (\S+)", line)
+        if match and all(f'{k}="{v}"' in match.group(1).split(",") for k, v in labels.items()):
+            return float(match.group(2))
+    raise AssertionError(f"no {name} sample with {labels}")
+
+
+class TestScopes:
+    def test_counts_statements_and_fetched_rows(self, db_session, seed_contracts):
+        @instrumented
+        def load_contracts(db):
+            return db.query(Contract).all(), db.query(Contract.id).first()
+
+        load_contracts(db_session)
+        text = instrumentation.render_metrics()
+        function = "test_instrumentation.TestScopes.test_counts_statements_and_fetched_rows.<locals>.load_contracts"
+        assert _sample(text, "kargo_service_calls_total", function=function) == 1
+        assert _sample(text, "kargo_service_calls_db_statements_total", function=function) == 2
+        assert _sample(text, "kargo_service_calls_db_rows_total", function=function) == 3
+        assert _sample(text, "kargo_service_calls_duration_seconds_bucket", function=function, le="+Inf") == 1
+
+    def test_counts_streamed_rows(self, db_session, seed_contracts):
+        @instrumented
+        def stream_contracts(db):
+            result = db.connection().execute(select(Contract.id)).yield_per(1)
+            return [row for partition in result.partitions() for row in partition]
+
+        assert len(stream_contracts(db_session)) == 2
+        function = "test_instrumentation.TestScopes.test_counts_streamed_rows.<locals>.stream_contracts"
+        assert _sample(instrumentation.render_metrics(), "kargo_service_calls_db_rows_total", function=function) == 2
+
+    def test_no_scope_records_nothing(self, db_session, seed_contracts):
+        db_session.query(Contract).all()
+        assert "kargo_service_calls_total{" not in instrumentation.render_metrics()
+
+
+class TestRequests:
+    def test_dashboard_headers_and_metrics(self, client, seed_contracts):
+        resp = client.get("/api/v1/dashboard/summary")
+        assert resp.status_code == 200
+        statements = int(resp.headers["X-DB-Statements"])
+        assert statements > 0
+        assert int(resp.headers["X-DB-Rows"]) >= 2
+        assert re.fullmatch(r"db;dur=[\d.]+, app;dur=[\d.]+", resp.headers["Server-Timing"])
+
+        text = client.get("/metrics").text
+        route = {"method": "GET", "route": "/api/v1/dashboard/summary", "status": "200"}
+        assert _sample(text, "kargo_http_requests_total", **route) == 1
+        assert _sample(text, "kargo_http_requests_db_statements_total", **route) == statements
+        # Nested service calls are tagged on their own
+        assert _sample(text, "kargo_service_calls_total", function="exposure_service.compute_exposure") == 1
+        assert _sample(text, "kargo_service_calls_total", function="pnl_service.get_pnl_summary") == 1
+        assert _sample(
+            text, "kargo_service_calls_db_statements_total", function="pnl_service.get_pnl_summary",
+        ) < statements
+
+    def test_routes_labelled_by_template(self, client, seed_contracts):
+        buy, sell = seed_contracts
+        client.get(f"/api/v1/contracts/{buy.id}")
+        client.get(f"/api/v1/contracts/{sell.id}")
+        client.get("/no/such/path")
+
+        text = client.get("/metrics").text
+        assert _sample(
+            text, "kargo_http_requests_total", method="GET", route="/api/v1/contracts/{contract_id}", status="200",
+        ) == 2
+        assert _sample(text, "kargo_http_requests_total", route="unmatched", status="404") == 1
+
+    def test_valuation_pool_queries_count_towards_request(self, client, seed_contracts, seed_curve):
+        resp = client.post("/api/v1/mtm/run", json={"valuation_date": "2025-01-20", "snapshot_date": "2025-01-31"})
+        assert resp.status_code == 200
+        text = client.get("/metrics").text
+        portfolio = _sample(
+            text, "kargo_service_calls_db_statements_total", function="mtm_service.run_mtm_portfolio",
+        )
+        assert portfolio > 0
+        assert int(resp.headers["X-DB-Statements"]) >= portfolio
@@ -0,0 +1,213 @@
+"""Tests for the background job subsystem."""
+
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.models.match import Match
+from app.models.price_curve import CurveData
+from app.models.shipment import Shipment
+from app.services import job_runner
+from app.services import job_service as svc
+
+
+@pytest.fixture
+def book(db_session, seed_contracts):
+    buy, sell = seed_contracts
+    db_session.add_all([
+        Shipment(contract_id=buy.id, reference="SHP-B", bl_date="2025-01-20", bl_quantity=50000, provisional_price=100.0),
+        Shipment(contract_id=sell.id, reference="SHP-S", bl_date="2025-01-22", bl_quantity=40000, provisional_price=110.0),
+    ])
+    db_session.commit()
+    return buy, sell
+
+
+@pytest.fixture
+def thread_runner(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_EXECUTOR", "thread")
+    job_runner.shutdown()
+    yield
+    job_runner.shutdown()
+
+
+def _execute(db_session, job) -> str | None:
+    """Run a job as a worker would, then drop the session's stale copy of it."""
+    status = svc.execute_job(db_session.get_bind().url.render_as_string(hide_password=False), job.id)
+    db_session.expire_all()
+    return status
+
+
+def _wait(client, job_id: int, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in svc.TERMINAL_STATUSES or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+class TestSubmit:
+    def test_queued_with_validated_params(self, db_session):
+        job, created = svc.submit_job(db_session, "mtm_portfolio", {"valuation_date": "2025-01-31"})
+        assert created
+        assert job.status == "QUEUED"
+        assert job.params == {"valuation_date": "2025-01-31", "snapshot_date": None}
+
+    def test_unknown_kind_and_bad_params(self, db_session):
+        with pytest.raises(HTTPException) as exc:
+            svc.submit_job(db_session, "reindex", {})
+        assert exc.value.status_code == 422
+        with pytest.raises(HTTPException) as exc:
+            svc.submit_job(db_session, "mtm_portfolio", {})
+        assert exc.value.status_code == 422
+        with pytest.raises(HTTPException) as exc:
+            svc.submit_job(db_session, "fifo_matching", {"all": True})
+        assert exc.value.status_code == 422
+
+    def test_idempotency_key_returns_original(self, db_session):
+        first, _ = svc.submit_job(db_session, "fifo_matching", {}, idempotency_key="k1")
+        again, created = svc.submit_job(db_session, "fifo_matching", {}, idempotency_key="k1")
+        assert not created
+        assert again.id == first.id
+
+    def test_idempotency_key_reused_for_other_job(self, db_session):
+        svc.submit_job(db_session, "fifo_matching", {}, idempotency_key="k1")
+        with pytest.raises(HTTPException) as exc:
+            svc.submit_job(db_session, "value_all_positions", {}, idempotency_key="k1")
+        assert exc.value.status_code == 409
+
+
+class TestExecute:
+    def test_fifo_job_stores_result_and_progress(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        assert _execute(db_session, job) == "SUCCEEDED"
+
+        db_session.refresh(job)
+        assert job.progress_done == job.progress_total == 1
+        assert job.started_at and job.finished_at
+        assert [m["matched_quantity"] for m in job.result] == [60000]
+        assert db_session.query(Match).count() == 1
+
+    def test_mtm_job_result_matches_sync_shape(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "mtm_portfolio", {"valuation_date": "2025-01-31"})
+        _execute(db_session, job)
+        result = svc.get_job_result(db_session, job.id)
+        assert result["valuation_date"] == "2025-01-31"
+        assert len(result["records"]) == 2
+
+    def test_service_error_fails_job(self, db_session, book):
+        db_session.query(CurveData).delete()
+        db_session.commit()
+        job, _ = svc.submit_job(db_session, "mtm_portfolio", {"valuation_date": "2025-01-31"})
+        assert _execute(db_session, job) == "FAILED"
+        assert job.error == "No curve data available for MTM valuation"
+        with pytest.raises(HTTPException) as exc:
+            svc.get_job_result(db_session, job.id)
+        assert exc.value.status_code == 409
+
+    def test_runs_once(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        assert _execute(db_session, job) == "SUCCEEDED"
+        assert _execute(db_session, job) is None
+
+
+class TestCancel:
+    def test_queued_job_never_runs(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        assert svc.cancel_job(db_session, job.id).status == "CANCELLED"
+        assert _execute(db_session, job) is None
+        assert db_session.query(Match).count() == 0
+
+    def test_running_job_stops_and_rolls_back(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        # Cancellation requested just after a worker claimed the job
+        job.cancel_requested = True
+        db_session.commit()
+        assert _execute(db_session, job) == "CANCELLED"
+        assert db_session.query(Match).count() == 0
+
+    def test_finished_job_cannot_be_cancelled(self, db_session, book):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        _execute(db_session, job)
+        with pytest.raises(HTTPException) as exc:
+            svc.cancel_job(db_session, job.id)
+        assert exc.value.status_code == 409
+
+
+class TestAbandonedJobs:
+    def _running(self, db_session, heartbeat: str, cancel: bool = False):
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        job.status, job.started_at, job.heartbeat_at = "RUNNING", "2025-01-01T00:00:00+00:00", heartbeat
+        job.cancel_requested = cancel
+        db_session.commit()
+        return job
+
+    def test_startup_requeues_only_stale_running_jobs(self, db_session, book, thread_runner):
+        stale = self._running(db_session, "2025-01-01T00:00:00+00:00")
+        live = self._running(db_session, svc._now())
+        cancelled = self._running(db_session, "2025-01-01T00:00:00+00:00", cancel=True)
+
+        job_ids = job_runner.requeue_pending(db_session.get_bind())
+        assert job_ids == [stale.id]
+        job_runner.shutdown()  # waits for the requeued run
+        db_session.expire_all()
+        assert (stale.status, stale.progress_done) == ("SUCCEEDED", stale.progress_total)
+        assert live.status == "RUNNING"
+        assert cancelled.status == "CANCELLED"
+
+    def test_heartbeat_advances_while_running(self, db_session, book, monkeypatch):
+        from pydantic import TypeAdapter
+        from app.models.job import Job
+
+        monkeypatch.setattr(settings, "JOB_HEARTBEAT_SECONDS", 0.05)
+        beats = []
+
+        def slow(db, progress):
+            for _ in range(3):
+                time.sleep(0.15)
+                db.rollback()  # a fresh read of the committed row
+                beats.append(db.query(Job.heartbeat_at).filter(Job.id == job.id).scalar())
+            return {}
+
+        monkeypatch.setitem(svc.JOB_KINDS, "fifo_matching", svc.JobKind(slow, svc._NoParams, TypeAdapter(dict)))
+        job, _ = svc.submit_job(db_session, "fifo_matching", {})
+        assert _execute(db_session, job) == "SUCCEEDED"
+        assert beats == sorted(set(beats))
+        assert beats[0] > job.started_at
+
+
+class TestJobRoutes:
+    def test_submit_poll_and_fetch(self, client, book, thread_runner):
+        resp = client.post("/api/v1/jobs/", json={"kind": "fifo_matching"}, headers={"Idempotency-Key": "run-1"})
+        assert resp.status_code == 202
+        job_id = resp.json()["id"]
+        assert resp.headers["Location"] == f"/api/v1/jobs/{job_id}"
+
+        assert _wait(client, job_id)["status"] == "SUCCEEDED"
+        result = client.get(f"/api/v1/jobs/{job_id}/result").json()
+        assert result == client.get("/api/v1/matching/").json()
+
+        replay = client.post("/api/v1/jobs/", json={"kind": "fifo_matching"}, headers={"Idempotency-Key": "run-1"})
+        assert replay.status_code == 200
+        assert replay.json()["id"] == job_id
+        assert [j["id"] for j in client.get("/api/v1/jobs/", params={"kind": "fifo_matching"}).json()] == [job_id]
+
+    def test_missing_job(self, client):
+        assert client.get("/api/v1/jobs/999").status_code == 404
+        assert client.post("/api/v1/jobs/999/cancel").status_code == 404
+
+
+class TestProcessRunner:
+    def test_job_runs_in_worker_process(self, db_session, book, monkeypatch):
+        monkeypatch.setattr(settings, "JOB_EXECUTOR", "process")
+        job_runner.shutdown()
+        job, _ = svc.submit_job(db_session, "value_all_positions", {})
+        try:
+            assert job_runner.dispatch(db_session.get_bind(), job.id).result(timeout=120) == "SUCCEEDED"
+        finally:
+            job_runner.shutdown()
+        db_session.refresh(job)
+        assert job.result == {"provisional_computed": 0, "final_computed": 0, "errors": []}
+        assert job.progress_done == job.progress_total == 2
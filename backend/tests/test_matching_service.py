@@ -1,6 +1,8 @@
 """Tests for FIFO matching engine."""
 
-from app.services.matching_service import run_fifo_matching, create_manual_match, unwind_all
+import pytest
+
+from app.services.matching_service import run_fifo_matching, create_manual_match, create_manual_matches, unwind_all
 from app.services.pricing_service import compute_provisional_price
 from app.models.shipment import Shipment
 from app.models.assay import Assay
@@ -79,3 +81,153 @@ class TestManualMatch:
         assert m.matched_quantity == 30000
         assert m.buy_contract_id == buy.id
         assert m.sell_contract_id == sell.id
+
+    def _priced_book(self, db_session, seed_contracts, pairs):
+        from app.models.contract import Contract
+
+        buy, sell = seed_contracts
+        db_session.add_all([
+            Shipment(reference="SHP-MB", contract_id=buy.id, bl_quantity=1000, provisional_price=100.0),
+            Shipment(reference="SHP-MS", contract_id=sell.id, bl_quantity=1000, provisional_price=104.0),
+        ])
+        extra = [
+            Contract(reference=f"MAN-{d}-{i}", direction=d, counterparty="Vale", quantity=1000,
+                     delivery_start="2025-02-01", delivery_end="2025-02-28", pricing_formula_id=buy.pricing_formula_id)
+            for i in range(pairs - 1) for d in ("BUY", "SELL")
+        ]
+        db_session.add_all(extra)
+        db_session.commit()
+        buys = [buy.id, *(c.id for c in extra if c.direction == "BUY")]
+        sells = [sell.id, *(c.id for c in extra if c.direction == "SELL")]
+        return [
+            {"buy_contract_id": b, "sell_contract_id": s, "matched_quantity": 500, "match_date": "2025-01-20"}
+            for b, s in zip(buys, sells)
+        ]
+
+    def test_batch(self, db_session, seed_contracts):
+        from app.schemas.match import MatchCreate
+
+        items = self._priced_book(db_session, seed_contracts, 3)
+        out = create_manual_matches(db_session, [MatchCreate(**i) for i in items])
+        assert [(m.buy_contract_id, m.sell_contract_id) for m in out] == [
+            (i["buy_contract_id"], i["sell_contract_id"]) for i in items
+        ]
+        assert [m.id for m in out] == sorted(m.id for m in db_session.query(Match))
+        assert (out[0].buy_price, out[0].sell_price, out[0].realized_pnl) == (100.0, 104.0, 2000.0)
+        assert out[1].realized_pnl is None
+
+    def test_invalid_pair_rejects_batch(self, db_session, seed_contracts):
+        from fastapi import HTTPException
+        from app.schemas.match import MatchCreate
+
+        buy, sell = seed_contracts
+        items = [
+            MatchCreate(buy_contract_id=b, sell_contract_id=sell.id, matched_quantity=1, match_date="2025-01-20")
+            for b in (buy.id, sell.id)
+        ]
+        with pytest.raises(HTTPException) as exc:
+            create_manual_matches(db_session, items)
+        assert exc.value.detail == "Invalid buy contract (item 1)"
+        assert db_session.query(Match).count() == 0
+
+    def test_batch_route_statements_do_not_grow(self, client, db_session, seed_contracts):
+        items = self._priced_book(db_session, seed_contracts, 12)
+        client.post("/api/v1/matching/manual/batch", json={"matches": items[:1]})  # connection setup
+        small = client.post("/api/v1/matching/manual/batch", json={"matches": items[1:2]})
+        large = client.post("/api/v1/matching/manual/batch", json={"matches": items[2:]})
+        assert small.status_code == large.status_code == 201
+        assert len(large.json()) == 10
+        assert large.headers["X-DB-Statements"] == small.headers["X-DB-Statements"]
+
+
+class TestIncrementalFIFO:
+    FIELDS = ("id", "buy_contract_id", "sell_contract_id", "matched_quantity", "buy_price", "sell_price",
+              "realized_pnl", "match_date")
+
+    def _book(self, db_session, formula, rng, n, prefix="INC"):
+        from app.models.contract import Contract
+
+        contracts = [
+            Contract(
+                reference=f"{prefix}-{i:03d}", direction=rng.choice(["BUY", "SELL"]), counterparty="Vale",
+                quantity=float(rng.randrange(10, 100) * 1000),
+                delivery_start=f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 28):02d}",
+                delivery_end="2025-12-31", pricing_formula_id=formula.id,
+            )
+            for i in range(n)
+        ]
+        db_session.add_all(contracts)
+        db_session.commit()
+        return contracts
+
+    def _rows(self, matches):
+        return sorted(tuple(getattr(m, f) for f in self.FIELDS) for m in matches)
+
+    def test_matches_full_rebuild_after_edits(self, db_session, seed_formula):
+        import random
+        from app.models.contract import Contract
+
+        rng = random.Random(7)
+        contracts = self._book(db_session, seed_formula, rng, 60)
+        run_fifo_matching(db_session)
+        for step in range(8):
+            target = rng.choice(contracts)
+            edit = step % 4
+            if edit == 0:
+                target.quantity += 5000
+            elif edit == 1:
+                target.status = "CANCELLED" if target.status == "OPEN" else "OPEN"
+            elif edit == 2:
+                db_session.add(Shipment(reference=f"SHP-INC-{step}", contract_id=target.id, bl_quantity=1000,
+                                        provisional_price=100.0 + step, status="DELIVERED"))
+            else:
+                contracts += self._book(db_session, seed_formula, rng, 1, prefix=f"INC-NEW-{step}")
+            db_session.commit()
+
+            incremental = self._rows(run_fifo_matching(db_session, incremental=True))
+            # A full run over the same book agrees and has nothing left to write
+            assert self._rows(run_fifo_matching(db_session)) == incremental
+        assert db_session.query(Contract).count() == 62
+
+    def test_earlier_matches_keep_identity(self, db_session, seed_formula):
+        from app.models.contract import Contract
+
+        book = [("BUY", "2025-01-05", 50000), ("SELL", "2025-01-10", 30000), ("SELL", "2025-02-10", 30000),
+                ("BUY", "2025-03-01", 40000), ("SELL", "2025-03-15", 20000)]
+        db_session.add_all([
+            Contract(reference=f"ID-{i}", direction=d, counterparty="Vale", quantity=q, delivery_start=start,
+                     delivery_end="2025-12-31", pricing_formula_id=seed_formula.id)
+            for i, (d, start, q) in enumerate(book)
+        ])
+        db_session.commit()
+        before = {(m.buy_contract_id, m.sell_contract_id): m for m in run_fifo_matching(db_session)}
+        for m in before.values():
+            m.match_date = "2025-01-01"  # as if matched on an earlier day
+        db_session.commit()
+
+        late = Contract(reference="ID-late", direction="SELL", counterparty="Vale", quantity=10000,
+                        delivery_start="2025-04-01", delivery_end="2025-12-31", pricing_formula_id=seed_formula.id)
+        db_session.add(late)
+        db_session.commit()
+        after = run_fifo_matching(db_session, incremental=True)
+
+        added = [m for m in after if m.sell_contract_id == late.id]
+        assert [m.matched_quantity for m in added] == [10000]
+        unchanged = [m for m in after if m.sell_contract_id != late.id]
+        assert {(m.id, m.match_date) for m in unchanged} == {(m.id, "2025-01-01") for m in before.values()}
+
+    def test_no_changes_writes_nothing(self, db_session, seed_contracts):
+        first = run_fifo_matching(db_session)
+        assert [m.id for m in run_fifo_matching(db_session, incremental=True)] == [m.id for m in first]
+
+    def test_manual_edit_forces_full_run(self, db_session, seed_contracts):
+        from app.models.match import MatchingInput
+
+        buy, sell = seed_contracts
+        run_fifo_matching(db_session)
+        assert db_session.query(MatchingInput).count() == 2
+        create_manual_match(db_session, buy.id, sell.id, 1000, "2025-01-20")
+        assert db_session.query(MatchingInput).count() == 0
+
+        matches = run_fifo_matching(db_session, incremental=True)
+        assert [m.matched_quantity for m in matches] == [60000]
@@ -0,0 +1,131 @@
+"""Tests for the matching strategies and running them against the book."""
+
+import itertools
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.contract import Contract
+from app.models.match import MatchingInput
+from app.schemas.common import MatchingStrategy
+from app.services.matching_service import run_fifo_matching, run_matching
+from app.services.matching_strategies import STRATEGIES, ContractInput, lifo, nearest, optimal
+
+
+def _book(*contracts):
+    """(direction, delivery_start, quantity, price) tuples -> buys, sells, remaining."""
+    inputs = [ContractInput(i, d, start, qty, price) for i, (d, start, qty, price) in enumerate(contracts, 1)]
+    buys = [c for c in inputs if c.direction == "BUY"]
+    sells = [c for c in inputs if c.direction == "SELL"]
+    return buys, sells, {c.contract_id: c.quantity for c in inputs}
+
+
+def _random_book(rng, n, unit=False):
+    return _book(*(
+        (rng.choice(["BUY", "SELL"]), f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 28):02d}",
+         1.0 if unit else float(rng.randrange(1, 50) * 1000), rng.choice([None, *range(90, 121)]))
+        for _ in range(n)
+    ))
+
+
+def _pnl(matches):
+    return sum(v["realized_pnl"] or 0.0 for v in matches.values())
+
+
+class TestStrategies:
+    def test_lifo_closes_latest_open_contracts(self):
+        buys, sells, remaining = _book(
+            ("BUY", "2025-01-01", 100, 90.0), ("BUY", "2025-02-01", 100, 95.0), ("SELL", "2025-03-01", 150, 100.0),
+        )
+        matches = lifo(buys, sells, remaining)
+        assert {k: v["matched_quantity"] for k, v in matches.items()} == {(2, 3): 100, (1, 3): 50}
+
+    def test_nearest_pairs_closest_delivery(self):
+        buys, sells, remaining = _book(
+            ("BUY", "2025-01-01", 100, None), ("SELL", "2025-03-01", 100, None),
+            ("BUY", "2025-03-03", 100, None), ("SELL", "2025-06-01", 100, None),
+        )
+        # FIFO pairs 1-2 and 3-4; the closest pair is 3-2, leaving 1-4
+        assert set(nearest(buys, sells, remaining)) == {(3, 2), (1, 4)}
+
+    def test_optimal_pairs_cheapest_buy_with_dearest_sell(self):
+        buys, sells, remaining = _book(
+            ("BUY", "2025-01-01", 100, 110.0), ("BUY", "2025-02-01", 100, 90.0),
+            ("SELL", "2025-03-01", 100, 100.0), ("SELL", "2025-04-01", 100, None),
+        )
+        matches = optimal(buys, sells, remaining)
+        assert matches[(2, 3)]["realized_pnl"] == 1000.0
+        assert matches[(1, 4)]["realized_pnl"] is None
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_optimal_matches_exhaustive_search(self, seed):
+        rng = random.Random(seed)
+        buys, sells, remaining = _random_book(rng, 9, unit=True)
+        buys = [b._replace(price=b.price or 100.0) for b in buys]
+        sells = [s._replace(price=s.price or 100.0) for s in sells]
+        short, long_ = sorted((buys, sells), key=len)
+
+        def pnl(a, b):
+            buy, sell = (a, b) if a.direction == "BUY" else (b, a)
+            return sell.price - buy.price
+
+        best = max(
+            sum(pnl(a, b) for a, b in zip(short, chosen)) for chosen in itertools.permutations(long_, len(short))
+        )
+        assert _pnl(optimal(buys, sells, remaining)) == pytest.approx(best)
+
+    @pytest.mark.parametrize("strategy", list(MatchingStrategy))
+    def test_match_the_same_quantity_within_limits(self, strategy):
+        rng = random.Random(11)
+        buys, sells, remaining = _random_book(rng, 300)
+        quantities = dict(remaining)
+        matches = STRATEGIES[strategy](buys, sells, remaining)
+
+        used = dict.fromkeys(quantities, 0.0)
+        for (buy_id, sell_id), values in matches.items():
+            used[buy_id] += values["matched_quantity"]
+            used[sell_id] += values["matched_quantity"]
+        assert all(used[cid] <= quantities[cid] + 1e-6 for cid in quantities)
+        total = sum(v["matched_quantity"] for v in matches.values())
+        assert total == pytest.approx(min(sum(c.quantity for c in buys), sum(c.quantity for c in sells)))
+
+    def test_optimal_beats_the_others(self):
+        rng = random.Random(3)
+        book = _random_book(rng, 400)
+        pnl = {s: _pnl(STRATEGIES[s](*book[:2], dict(book[2]))) for s in MatchingStrategy}
+        assert pnl[MatchingStrategy.OPTIMAL] >= max(pnl.values()) - 1e-6
+
+
+class TestRunMatching:
+    def test_strategy_replaces_matches(self, db_session, seed_contracts, seed_formula):
+        buy, sell = seed_contracts
+        later_buy = Contract(reference="BUY-LATER", direction="BUY", counterparty="Rio", quantity=50000,
+                             delivery_start="2025-01-16", delivery_end="2025-02-15", pricing_formula_id=seed_formula.id)
+        db_session.add(later_buy)
+        db_session.commit()
+
+        fifo = run_fifo_matching(db_session)
+        assert [(m.buy_contract_id, m.matched_quantity) for m in fifo] == [(buy.id, 60000)]
+        lifo = run_matching(db_session, "LIFO")
+        # The SELL closes the latest BUY first
+        assert sorted((m.buy_contract_id, m.matched_quantity) for m in lifo) == [(buy.id, 10000), (later_buy.id, 50000)]
+
+    def test_incremental_only_for_fifo(self, db_session, seed_contracts):
+        with pytest.raises(HTTPException) as exc:
+            run_matching(db_session, MatchingStrategy.NEAREST, incremental=True)
+        assert exc.value.status_code == 400
+
+    def test_other_strategy_forces_full_fifo_run(self, db_session, seed_contracts):
+        run_fifo_matching(db_session)
+        assert db_session.query(MatchingInput).count() == 2
+        run_matching(db_session, "OPTIMAL")
+        assert db_session.query(MatchingInput).count() == 0
+        run_fifo_matching(db_session, incremental=True)
+        assert db_session.query(MatchingInput).count() == 2
+
+    def test_route(self, client, seed_contracts):
+        resp = client.post("/api/v1/matching/run", params={"strategy": "NEAREST"})
+        assert resp.status_code == 200
+        assert [m["matched_quantity"] for m in resp.json()] == [60000]
+        assert client.post("/api/v1/matching/run", params={"strategy": "HIFO"}).status_code == 422
@@ -1,6 +1,12 @@
 """Tests for mark-to-market service."""
 
-from app.services.mtm_service import run_mtm_for_contract, run_mtm_portfolio
+import pytest
+from fastapi import HTTPException
+
+from app.models.mtm import LatestMtm, MtmRecord
+from app.schemas.common import SnapshotPolicy
+from app.services import curve_cache, mtm_compute
+from app.services.mtm_service import backfill_mtm, run_mtm_for_contract, run_mtm_portfolio
 from app.services.pricing_service import compute_provisional_price
 from app.models.shipment import Shipment
 from app.models.assay import Assay
@@ -59,3 +65,262 @@ class TestMTM:
         record = run_mtm_for_contract(db_session, buy.id, "2025-01-15", "2025-01-31")
         assert record.open_quantity == 0
         assert record.mtm_value == 0
+
+    def test_mtm_portfolio_matches_per_contract(self, db_session, seed_contracts, seed_curve, seed_formula):
+        """Batch portfolio MTM produces the same records as the per-contract path."""
+        buy, sell = seed_contracts
+
+        for contract, ref, qty, fe in [
+            (buy, "SHP-MTM-003", 30000, 62.0),
+            (buy, "SHP-MTM-004", 20000, 63.1),
+            (sell, "SHP-MTM-005", 60000, 61.4),
+        ]:
+            shipment = Shipment(
+                reference=ref, contract_id=contract.id,
+                bl_date="2025-01-15", bl_quantity=qty, status="DELIVERED",
+            )
+            db_session.add(shipment)
+            db_session.flush()
+            db_session.add(Assay(
+                shipment_id=shipment.id, assay_type="PROVISIONAL",
+                fe=fe, moisture=8.4,
+            ))
+            db_session.commit()
+            compute_provisional_price(db_session, shipment, contract)
+
+        fields = ("contract_id", "valuation_date", "curve_price", "contract_price",
+                  "open_quantity", "direction", "mtm_value")
+        expected = [
+            {f: getattr(run_mtm_for_contract(db_session, c.id, "2025-01-20", "2025-01-31"), f) for f in fields}
+            for c in (buy, sell)
+        ]
+
+        result = run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        actual = [{f: getattr(r, f) for f in fields} for r in result.records]
+        assert actual == expected
+        assert result.total_mtm == round(sum(r["mtm_value"] for r in expected), 2)
+
+
+class TestIdempotentWrites:
+    def test_rerun_overwrites_its_key(self, db_session, seed_contracts, seed_curve):
+        from app.models.price_curve import CurveData
+
+        buy, _ = seed_contracts
+        first = run_mtm_for_contract(db_session, buy.id, "2025-01-15", "2025-01-31")
+        # A corrected price in the same snapshot
+        db_session.query(CurveData).filter(CurveData.price_date == "2025-01-15").update({"price": 120.0})
+        db_session.commit()
+        curve_cache.clear()
+
+        again = run_mtm_for_contract(db_session, buy.id, "2025-01-15", "2025-01-31")
+        assert again.id == first.id
+        assert again.curve_price == 120.0
+        assert again.snapshot_date == "2025-01-31"
+        assert db_session.query(MtmRecord).count() == 1
+
+        other = run_mtm_for_contract(db_session, buy.id, "2025-01-15")
+        assert other.snapshot_date == "2025-01-15"
+        assert db_session.query(MtmRecord).count() == 2
+
+    def test_portfolio_rerun_does_not_grow_history(self, db_session, seed_contracts, seed_curve):
+        first = run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        again = run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        assert [r.id for r in again.records] == [r.id for r in first.records]
+        assert db_session.query(MtmRecord).count() == 2
+
+
+    def test_history_rejects_bad_dates(self, client):
+        assert client.get("/api/v1/mtm/history", params={"valuation_date": "2025-01-31"}).json() == []
+        for params in ({"valuation_date": "foo"}, {"snapshot_date": "2025-13-01"}):
+            assert client.get("/api/v1/mtm/history", params=params).status_code == 422
+
+
+class TestLatestMtm:
+    def _latest(self, db_session):
+        return {
+            m.contract_id: (m.valuation_date, m.snapshot_date, m.mtm_value, m.curve_price)
+            for m in db_session.query(LatestMtm)
+        }
+
+    def _newest_in_history(self, db_session):
+        newest = {}
+        for r in db_session.query(MtmRecord).order_by(MtmRecord.valuation_date, MtmRecord.snapshot_date):
+            newest[r.contract_id] = (r.valuation_date, r.snapshot_date, r.mtm_value, r.curve_price)
+        return newest
+
+    def test_follows_newest_record(self, db_session, seed_contracts, seed_curve):
+        buy, sell = seed_contracts
+        run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        # Older valuation date and older snapshot: latest stays put
+        run_mtm_for_contract(db_session, buy.id, "2025-01-15")
+        run_mtm_for_contract(db_session, buy.id, "2025-01-20")
+        assert self._latest(db_session)[buy.id][:2] == ("2025-01-20", "2025-01-31")
+
+        run_mtm_for_contract(db_session, sell.id, "2025-01-25", "2025-01-31")
+        backfill_mtm(db_session, "2025-01-01", "2025-01-10")
+        assert self._latest(db_session) == self._newest_in_history(db_session)
+        backfill_mtm(db_session, "2025-01-01", "2025-01-28", SnapshotPolicy.FIXED, "2025-01-31")
+        assert self._latest(db_session) == self._newest_in_history(db_session)
+        assert self._latest(db_session)[buy.id][:2] == ("2025-01-28", "2025-01-31")
+
+    def test_rerun_overwrites_latest(self, db_session, seed_contracts, seed_curve):
+        from app.models.price_curve import CurveData
+
+        buy, _ = seed_contracts
+        run_mtm_for_contract(db_session, buy.id, "2025-01-20", "2025-01-31")
+        db_session.query(CurveData).filter(CurveData.price_date == "2025-01-20").update({"price": 120.0})
+        db_session.commit()
+        curve_cache.clear()
+        run_mtm_for_contract(db_session, buy.id, "2025-01-20", "2025-01-31")
+        assert self._latest(db_session)[buy.id][3] == 120.0
+
+    def test_backfill_restores_latest_of_contracts_it_skips(self, db_session, seed_contracts, seed_curve):
+        buy, sell = seed_contracts
+        run_mtm_portfolio(db_session, "2025-01-10")
+        run_mtm_portfolio(db_session, "2025-01-20")
+        sell.status = "CLOSED"
+        db_session.commit()
+
+        # Deletes the SELL contract's 2025-01-20 record without rewriting it
+        backfill_mtm(db_session, "2025-01-15", "2025-01-20")
+        assert self._latest(db_session)[sell.id][0] == "2025-01-10"
+        assert self._latest(db_session) == self._newest_in_history(db_session)
+
+
+class TestParallelMTM:
+    FIELDS = ("contract_id", "curve_price", "contract_price", "open_quantity", "direction", "mtm_value")
+
+    @pytest.fixture
+    def book(self, db_session, seed_contracts, seed_formula):
+        """40 more contracts over two curves, a few shipped, one cancelled."""
+        from app.models.contract import Contract
+        from app.models.price_curve import CurveData, PriceCurve
+        from app.models.pricing_formula import PricingFormula
+
+        curve = PriceCurve(code="TSI_58", name="TSI 58 Fe", currency="USD", uom="DMT")
+        db_session.add(curve)
+        db_session.flush()
+        db_session.add(CurveData(curve_id=curve.id, price_date="2025-01-20", snapshot_date="2025-01-31", price=92.5))
+        formula_58 = PricingFormula(name="Standard IO 58", curve_id=curve.id, basis_fe=58.0)
+        db_session.add(formula_58)
+        db_session.flush()
+        contracts = [
+            Contract(reference=f"PAR-{i:03d}", direction="BUY" if i % 3 else "SELL", counterparty="Rio",
+                     quantity=1000.0 * (i + 1), delivery_start="2025-01-20", delivery_end="2025-01-31",
+                     status="CANCELLED" if i == 17 else "OPEN",
+                     pricing_formula_id=seed_formula.id if i % 4 else formula_58.id)
+            for i in range(40)
+        ]
+        db_session.add_all(contracts)
+        db_session.flush()
+        db_session.add_all(
+            Shipment(reference=f"SHP-PAR-{i}", contract_id=contracts[i].id, bl_date="2025-01-15",
+                     bl_quantity=500.0 * i, status="DELIVERED", provisional_price=90.0 + i)
+            for i in range(0, 40, 5)
+        )
+        db_session.commit()
+
+    def _run(self, db_session, workers):
+        reported = []
+        result = run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31",
+                                   lambda done, total: reported.append((done, total)), workers)
+        return [{f: getattr(r, f) for f in self.FIELDS} for r in result.records], result.total_mtm, reported
+
+    def test_parallel_portfolio_matches_serial(self, db_session, book, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "MTM_PARALLEL_MIN_CONTRACTS", 0)
+        serial, serial_total, _ = self._run(db_session, 1)
+        try:
+            parallel, parallel_total, reported = self._run(db_session, 2)
+        finally:
+            mtm_compute.shutdown()
+        assert parallel == serial
+        assert parallel_total == serial_total
+        assert [r["contract_id"] for r in serial] == sorted(r["contract_id"] for r in serial)
+        assert len(serial) == 41 and {r["curve_price"] for r in serial} == {111.5, 92.5}
+        # Eight partitions of at most six contracts, reported as they come back
+        assert len(reported) == 8 and reported[-1] == (41, 41)
+
+    def test_small_books_stay_serial(self, db_session, book, monkeypatch):
+        from app.services import mtm_service
+
+        def no_pool(fn, tasks, workers):
+            assert workers == 1
+            return map(fn, tasks)
+
+        monkeypatch.setattr(mtm_service, "map_tasks", no_pool)
+        records, _, reported = self._run(db_session, 4)
+        assert len(records) == 41
+        # Under SERIAL_CHUNK contracts per curve: one partition each
+        assert len(reported) == 2
+
+
+class TestBackfill:
+    FIELDS = ("contract_id", "valuation_date", "curve_price", "contract_price", "open_quantity", "direction", "mtm_value")
+
+    @pytest.fixture
+    def book(self, db_session, seed_contracts, seed_curve):
+        from app.models.price_curve import CurveData
+
+        buy, _ = seed_contracts
+        db_session.add(Shipment(reference="SHP-BF", contract_id=buy.id, bl_date="2025-01-15",
+                                bl_quantity=30000, status="DELIVERED", provisional_price=104.37))
+        # Same-day snapshots for a few dates, differing from the month-end snapshot
+        for day in ("2025-01-10", "2025-01-12"):
+            db_session.add(CurveData(curve_id=seed_curve.id, price_date=day, snapshot_date=day, price=99.5))
+        db_session.commit()
+        return seed_contracts
+
+    def _stored(self, db_session, start, end):
+        rows = (
+            db_session.query(MtmRecord)
+            .filter(MtmRecord.valuation_date.between(start, end))
+            .order_by(MtmRecord.valuation_date, MtmRecord.contract_id)
+        )
+        return [{f: getattr(r, f) for f in self.FIELDS} for r in rows]
+
+    @pytest.mark.parametrize("policy,snapshot", [
+        (SnapshotPolicy.VALUATION_DATE, None),
+        (SnapshotPolicy.FIXED, "2025-01-31"),
+        (SnapshotPolicy.LATEST, None),
+    ])
+    def test_matches_per_date_runs(self, db_session, book, policy, snapshot):
+        # Starts before the curve so the most-recent-price fallback is covered too
+        dates = ["2024-12-30", "2024-12-31"] + [f"2025-01-{d:02d}" for d in range(1, 15)]
+        per_date_snapshot = {
+            SnapshotPolicy.VALUATION_DATE: lambda d: d,
+            SnapshotPolicy.FIXED: lambda d: snapshot,
+            SnapshotPolicy.LATEST: lambda d: "1900-01-01",  # no such snapshot
+        }[policy]
+        totals = [run_mtm_portfolio(db_session, d, per_date_snapshot(d)).total_mtm for d in dates]
+        expected = self._stored(db_session, dates[0], dates[-1])
+        if policy is SnapshotPolicy.LATEST:
+            # Keyed differently from the stand-in runs, so clear those first
+            db_session.query(MtmRecord).delete()
+            db_session.commit()
+
+        result = backfill_mtm(db_session, dates[0], dates[-1], policy, snapshot)
+        assert self._stored(db_session, dates[0], dates[-1]) == expected
+        assert [t.total_mtm for t in result.totals] == totals
+        assert result.records_written == len(expected)
+        if policy is SnapshotPolicy.LATEST:
+            assert result.snapshot_date == "2025-01-31"
+        else:
+            assert result.records_replaced == len(expected)
+
+    def test_rerun_replaces_only_its_dates(self, db_session, book):
+        outside = run_mtm_portfolio(db_session, "2025-01-20")
+        backfill_mtm(db_session, "2025-01-01", "2025-01-10")
+        result = backfill_mtm(db_session, "2025-01-01", "2025-01-10")
+        assert result.records_replaced == 20
+        assert db_session.query(MtmRecord).count() == 20 + len(outside.records)
+
+    def test_invalid_ranges(self, db_session, book):
+        for args in [("2025-01-10", "2025-01-01"), ("2025-01-01", "not-a-date")]:
+            with pytest.raises(HTTPException) as exc:
+                backfill_mtm(db_session, *args)
+            assert exc.value.status_code == 422
+        with pytest.raises(HTTPException) as exc:
+            backfill_mtm(db_session, "2025-01-01", "2025-01-10", SnapshotPolicy.FIXED)
+        assert exc.value.status_code == 422
@@ -0,0 +1,130 @@
+"""Tests for keyset pagination and NDJSON streaming of list endpoints."""
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.contract import Contract
+from app.models.mtm import MtmRecord
+from app.services.contract_service import list_contracts
+from app.services.mtm_service import get_mtm_history
+from app.services.pagination import encode_cursor
+from app.services.price_curve_service import get_curve_data
+
+
+@pytest.fixture
+def many_contracts(db_session, seed_formula):
+    """25 contracts over 5 delivery dates, so keys tie on delivery_start."""
+    for i in range(25):
+        db_session.add(Contract(
+            reference=f"C-{i:03d}",
+            direction="BUY" if i % 2 else "SELL",
+            counterparty="Vale",
+            quantity=1000,
+            delivery_start=f"2025-0{i % 5 + 1}-01",
+            delivery_end="2025-12-31",
+            qp_convention="MONTH_OF_BL",
+            pricing_formula_id=seed_formula.id,
+        ))
+    db_session.commit()
+
+
+def _walk(fetch, limit):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor, limit)
+        items.extend(page.items)
+        pages += 1
+        if page.next_cursor is None:
+            return items, pages
+        cursor = page.next_cursor
+
+
+class TestKeysetPagination:
+    def test_pages_cover_listing_once_in_order(self, db_session, many_contracts):
+        items, pages = _walk(lambda c, n: list_contracts(db_session, cursor=c, limit=n), 7)
+        assert pages == 4
+        assert [c.id for c in items] == [c.id for c in list_contracts(db_session).items]
+        keys = [(c.delivery_start, c.id) for c in items]
+        assert keys == sorted(keys)
+
+    def test_filters_apply_on_every_page(self, db_session, many_contracts):
+        items, _ = _walk(lambda c, n: list_contracts(db_session, direction="BUY", cursor=c, limit=n), 5)
+        assert len(items) == 12
+        assert {c.direction for c in items} == {"BUY"}
+
+    def test_exact_last_page_has_no_cursor(self, db_session, many_contracts):
+        page = list_contracts(db_session, limit=25)
+        assert len(page.items) == 25
+        assert page.next_cursor is None
+
+    def test_descending_history(self, db_session, seed_contracts):
+        buy, _ = seed_contracts
+        for day in range(1, 11):
+            db_session.add(MtmRecord(
+                contract_id=buy.id, valuation_date=f"2025-01-{day:02d}", curve_price=100.0,
+                open_quantity=1.0, direction="BUY", mtm_value=0.0,
+            ))
+        db_session.commit()
+        items, pages = _walk(lambda c, n: get_mtm_history(db_session, cursor=c, limit=n), 3)
+        assert pages == 4
+        assert [r.valuation_date for r in items] == [f"2025-01-{d:02d}" for d in range(10, 0, -1)]
+
+    def test_curve_data_pages(self, db_session, seed_curve):
+        items, pages = _walk(lambda c, n: get_curve_data(db_session, seed_curve.id, cursor=c, limit=n), 8)
+        assert pages == 4
+        assert len(items) == 30
+        assert items[0].price_date == "2025-01-01" and items[-1].price_date == "2025-01-30"
+
+    @pytest.mark.parametrize("cursor", [
+        "not-base64!", encode_cursor((1,)), encode_cursor(("a", 1, 2)),
+        encode_cursor(("2025/01/01", 3)), encode_cursor(("2025-01-01", "3")), encode_cursor(("2025-01-01", [3])),
+    ])
+    def test_invalid_cursor(self, db_session, many_contracts, cursor):
+        with pytest.raises(HTTPException) as exc:
+            list_contracts(db_session, cursor=cursor, limit=5)
+        assert exc.value.status_code == 400
+
+
+class TestListEndpoints:
+    def test_next_cursor_header(self, client, many_contracts):
+        resp = client.get("/api/v1/contracts/", params={"limit": 20})
+        assert len(resp.json()) == 20
+        cursor = resp.headers["X-Next-Cursor"]
+
+        resp = client.get("/api/v1/contracts/", params={"limit": 20, "cursor": cursor})
+        assert len(resp.json()) == 5
+        assert "X-Next-Cursor" not in resp.headers
+
+    def test_next_cursor_readable_cross_origin(self, client, many_contracts):
+        resp = client.get("/api/v1/contracts/", params={"limit": 20}, headers={"Origin": "https://ui.example"})
+        assert "X-Next-Cursor" in resp.headers["Access-Control-Expose-Headers"].split(", ")
+
+    def test_tampered_cursor(self, client, many_contracts):
+        cursor = client.get("/api/v1/contracts/", params={"limit": 5}).headers["X-Next-Cursor"]
+        last_date, last_id = json.loads(base64.urlsafe_b64decode(cursor))
+        for values in ([last_date.replace("-", "/"), last_id], ["2025-02-30", last_id], [last_date, None]):
+            resp = client.get("/api/v1/contracts/", params={"limit": 5, "cursor": encode_cursor(tuple(values))})
+            assert resp.status_code == 400
+            assert "X-Next-Cursor" in resp.json()["detail"]
+        resp = client.get("/api/v1/mtm/history", params={"cursor": cursor[:-4]})
+        assert resp.status_code == 400
+
+    def test_page_size_cap(self, client):
+        assert client.get("/api/v1/contracts/", params={"limit": 10_000}).status_code == 422
+
+    def test_ndjson_stream(self, client, many_contracts, monkeypatch):
+        from app.services import pagination
+
+        monkeypatch.setattr(pagination, "STREAM_PAGE_SIZE", 4)  # several keyset pages
+        resp = client.get("/api/v1/contracts/stream", params={"direction": "SELL"})
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+        assert len(rows) == 13
+        assert {r["direction"] for r in rows} == {"SELL"}
+
+    def test_curve_data_stream(self, client, seed_curve):
+        resp = client.get(f"/api/v1/price-curves/{seed_curve.id}/data/stream", params={"start_date": "2025-01-11"})
+        assert len(resp.text.splitlines()) == 20
@@ -1,5 +1,9 @@
 """Tests for P&L service."""
 
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
 from app.services.pnl_service import get_pnl_summary, get_realized_pnl, get_unrealized_pnl
 from app.services.matching_service import run_fifo_matching
 from app.services.mtm_service import run_mtm_for_contract
@@ -94,3 +98,61 @@ class TestPnL:
         summary = get_pnl_summary(db_session)
         assert summary.total_pnl == summary.total_realized + summary.total_unrealized
         assert len(summary.by_contract) == 2
+
+
+@contextmanager
+def count_statements(db_session):
+    engine = db_session.get_bind()
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+class TestPnlQueryCount:
+    def _add_contracts(self, db_session, template, count):
+        from app.models.contract import Contract
+
+        db_session.add_all([
+            Contract(
+                reference=f"QC-{template.reference}-{i}", direction=template.direction,
+                counterparty=template.counterparty, quantity=template.quantity,
+                delivery_start=template.delivery_start, delivery_end=template.delivery_end,
+                pricing_formula_id=template.pricing_formula_id,
+            )
+            for i in range(count)
+        ])
+        db_session.commit()
+
+    def _statements(self, db_session):
+        db_session.expire_all()
+        with count_statements(db_session) as statements:
+            unrealized = get_unrealized_pnl(db_session)
+            summary = get_pnl_summary(db_session)
+        return statements, unrealized, summary
+
+    def test_latest_mtm_read_once_regardless_of_book_size(self, db_session, seed_contracts, seed_curve):
+        from app.services.mtm_service import run_mtm_portfolio
+
+        buy, sell = seed_contracts
+        run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        small, _, _ = self._statements(db_session)
+
+        self._add_contracts(db_session, buy, 15)
+        self._add_contracts(db_session, sell, 15)
+        run_mtm_portfolio(db_session, "2025-01-10")
+        run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        large, unrealized, summary = self._statements(db_session)
+
+        assert len(large) == len(small)
+        assert not any("mtm_history" in s for s in large)
+        assert len(unrealized) == 32
+        assert len(summary.by_contract) == 32
+        history = run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        assert summary.total_unrealized == history.total_mtm
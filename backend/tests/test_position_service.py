@@ -0,0 +1,128 @@
+"""Tests for shared per-contract shipment aggregates."""
+
+import pytest
+
+from app.services.position_service import get_contract_aggregates, get_weighted_avg_prices
+from app.models.shipment import Shipment
+
+
+class TestContractAggregates:
+    def test_weighted_price_final_over_provisional(self, db_session, seed_contracts):
+        buy, sell = seed_contracts
+        db_session.add_all([
+            Shipment(reference="SHP-A-001", contract_id=buy.id, bl_quantity=30000,
+                     provisional_price=100.0, final_price=104.0, status="DELIVERED"),
+            Shipment(reference="SHP-A-002", contract_id=buy.id, bl_quantity=10000,
+                     provisional_price=110.0, status="DELIVERED"),
+            # Unpriced: counts as shipped, not in the price
+            Shipment(reference="SHP-A-003", contract_id=buy.id, bl_quantity=5000, status="IN_TRANSIT"),
+            # Cancelled: ignored entirely
+            Shipment(reference="SHP-A-004", contract_id=buy.id, bl_quantity=9999,
+                     provisional_price=1.0, status="CANCELLED"),
+        ])
+        db_session.commit()
+
+        aggs = get_contract_aggregates(db_session)
+        assert aggs[buy.id].shipped_qty == 45000
+        assert aggs[buy.id].priced_qty == 40000
+        assert aggs[buy.id].avg_price == pytest.approx((104.0 * 30000 + 110.0 * 10000) / 40000)
+        assert sell.id not in aggs
+
+    def test_zero_final_price_falls_back_to_provisional(self, db_session, seed_contracts):
+        buy, _ = seed_contracts
+        db_session.add(Shipment(reference="SHP-A-005", contract_id=buy.id, bl_quantity=1000,
+                                provisional_price=99.0, final_price=0.0, status="DELIVERED"))
+        db_session.commit()
+        assert get_weighted_avg_prices(db_session, [buy.id]) == {buy.id: 99.0}
+
+
+class TestPositionRollup:
+    def _create_shipment(self, db_session, contract_id, ref, qty):
+        from app.schemas.shipment import ShipmentCreate
+        from app.services.shipment_service import create_shipment
+
+        return create_shipment(db_session, ShipmentCreate(
+            reference=ref, contract_id=contract_id, bl_date="2025-01-15", bl_quantity=qty,
+        ))
+
+    def test_shipment_writes_maintain_rollup(self, db_session, seed_contracts):
+        from app.models.position import ContractPosition
+        from app.services.position_service import check_positions
+        from app.services.shipment_service import update_shipment_status, delete_shipment
+        from app.services.contract_service import get_open_quantity
+
+        buy, _ = seed_contracts
+        s1 = self._create_shipment(db_session, buy.id, "SHP-R-001", 30000)
+        s2 = self._create_shipment(db_session, buy.id, "SHP-R-002", 20000)
+        position = db_session.get(ContractPosition, buy.id)
+        assert position.shipped_qty == 50000
+        assert position.open_qty == 25000
+        assert get_open_quantity(db_session, buy.id).open_quantity == 25000
+
+        update_shipment_status(db_session, s1.id, "CANCELLED")
+        db_session.refresh(position)
+        assert position.shipped_qty == 20000
+
+        delete_shipment(db_session, s2.id)
+        db_session.refresh(position)
+        assert position.open_qty == 75000
+
+        result = check_positions(db_session)
+        # Only the SELL contract (created by the fixture, never written through a service) lacks a row
+        assert [(m.contract_id, m.field) for m in result.mismatches] == [(seed_contracts[1].id, "row")]
+
+    def test_rebuild_fixes_drift(self, db_session, seed_contracts):
+        from app.services.position_service import check_positions, rebuild_positions
+
+        buy, _ = seed_contracts
+        self._create_shipment(db_session, buy.id, "SHP-R-003", 10000)
+        # A raw write behind the services' back
+        db_session.add(Shipment(reference="SHP-R-004", contract_id=buy.id, bl_quantity=5000, status="DELIVERED"))
+        db_session.commit()
+
+        fields = {m.field for m in check_positions(db_session).mismatches if m.contract_id == buy.id}
+        assert fields == {"shipped_qty", "open_qty"}
+
+        assert rebuild_positions(db_session) == 2
+        assert check_positions(db_session).mismatches == []
+
+    def test_concurrent_shipment_writes(self, db_session, seed_contracts):
+        """Two transactions shipping on one contract: the second waits and counts both."""
+        import threading
+        import time
+        from sqlalchemy.orm import Session
+        from app.models.position import ContractPosition
+        from app.services.position_service import refresh_positions
+
+        engine = db_session.get_bind()
+        if engine.dialect.name != "postgresql":
+            pytest.skip("row locks need a concurrent database (set KARGO_TEST_DATABASE_URL)")
+        buy, _ = seed_contracts
+
+        def ship(session, ref, qty):
+            session.add(Shipment(reference=ref, contract_id=buy.id, bl_quantity=qty, status="DELIVERED"))
+            refresh_positions(session, [buy.id])
+
+        first, second = Session(engine), Session(engine)
+        errors = []
+
+        def other():
+            try:
+                ship(second, "SHP-C-002", 20000)
+                second.commit()
+            except Exception as e:  # surfaced below
+                errors.append(e)
+
+        try:
+            ship(first, "SHP-C-001", 10000)  # holds the contract row
+            thread = threading.Thread(target=other)
+            thread.start()
+            time.sleep(0.3)
+            first.commit()
+            thread.join(10)
+        finally:
+            first.close()
+            second.close()
+        assert errors == []
+        db_session.expire_all()
+        assert db_session.get(ContractPosition, buy.id).shipped_qty == 30000
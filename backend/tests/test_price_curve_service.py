@@ -0,0 +1,152 @@
+"""Tests for price curve averages and the curve cache."""
+
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import curve_cache
+from app.services.price_curve_service import (
+    bulk_upload_data, get_curve_average, delete_curve, ingest_curve_data,
+)
+from app.schemas.price_curve import CurveDataCreate
+
+
+class TestCurveAverage:
+    def test_average_latest_snapshot(self, db_session, seed_curve):
+        bulk_upload_data(db_session, seed_curve.id, [
+            CurveDataCreate(price_date="2025-01-01", price=120.0, snapshot_date="2025-02-01"),
+        ])
+        avg, count = get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-02")
+        assert count == 2
+        assert avg == pytest.approx((120.0 + 109.0) / 2)
+
+    def test_average_exact_snapshot(self, db_session, seed_curve):
+        bulk_upload_data(db_session, seed_curve.id, [
+            CurveDataCreate(price_date="2025-01-01", price=120.0, snapshot_date="2025-02-01"),
+        ])
+        avg, count = get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-02", "2025-01-31")
+        assert count == 2
+        assert avg == pytest.approx((108.5 + 109.0) / 2)
+
+    def test_average_no_data(self, db_session, seed_curve):
+        with pytest.raises(HTTPException):
+            get_curve_average(db_session, seed_curve.id, "2026-01-01", "2026-01-31")
+
+
+class TestCurveCache:
+    def test_hits_and_misses(self, db_session, seed_curve):
+        get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+        get_curve_average(db_session, seed_curve.id, "2025-01-10", "2025-01-20")
+        get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31", "2025-01-31")
+        stats = curve_cache.stats()
+        assert stats["misses"] == 2  # latest view + one explicit snapshot
+        assert stats["hits"] == 1
+
+    def test_upload_invalidates(self, db_session, seed_curve):
+        avg_before, _ = get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-01")
+        bulk_upload_data(db_session, seed_curve.id, [
+            CurveDataCreate(price_date="2025-01-01", price=100.0, snapshot_date="2025-02-01"),
+        ])
+        avg_after, _ = get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-01")
+        assert avg_before == 108.5
+        assert avg_after == 100.0
+
+    def test_delete_invalidates(self, db_session, seed_curve):
+        get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+        delete_curve(db_session, seed_curve.id)
+        assert curve_cache.stats()["entries"] == 0
+        with pytest.raises(HTTPException):
+            get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+
+    def test_upload_appends_incrementally(self, db_session, seed_curve):
+        get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+        bulk_upload_data(db_session, seed_curve.id, [
+            CurveDataCreate(price_date="2025-02-01", price=113.0, snapshot_date="2025-02-01"),
+            CurveDataCreate(price_date="2025-02-02", price=114.0, snapshot_date="2025-02-01"),
+        ])
+        assert curve_cache.stats()["entries"] == 1  # extended, not dropped
+
+        avg, count = get_curve_average(db_session, seed_curve.id, "2025-01-29", "2025-02-02")
+        assert count == 4
+        assert avg == pytest.approx((112.25 + 112.50 + 113.0 + 114.0) / 4)
+        assert curve_cache.stats()["misses"] == 1
+
+    def test_prefix_sum_matches_direct_sum(self, db_session, seed_curve):
+        from app.models.price_curve import CurveData
+
+        rows = db_session.query(CurveData).order_by(CurveData.price_date).all()
+        for lo in range(0, len(rows), 7):
+            for hi in range(lo, len(rows), 5):
+                window = rows[lo:hi + 1]
+                avg, count = get_curve_average(
+                    db_session, seed_curve.id, window[0].price_date, window[-1].price_date,
+                )
+                assert count == len(window)
+                assert avg == pytest.approx(sum(r.price for r in window) / len(window), abs=1e-9)
+
+
+class TestCurveIngest:
+    CSV = (
+        "price_date,price,snapshot_date\n"
+        "2025-02-01,115.0,2025-02-01\n"
+        "2025-02-02,116.0,2025-02-01\n"
+        "2025-01-01,100.0,2025-01-31\n"  # overrides the seeded point
+    )
+
+    def test_csv_upserts_in_batches(self, db_session, seed_curve):
+        from app.models.price_curve import CurveData
+
+        before = db_session.query(CurveData).count()
+        result = ingest_curve_data(db_session, seed_curve.id, io.StringIO(self.CSV), "csv", batch_size=2)
+        assert (result.rows, result.batches) == (3, 2)
+        assert (result.first_price_date, result.last_price_date) == ("2025-01-01", "2025-02-02")
+        assert db_session.query(CurveData).count() == before + 2
+
+        avg, _ = get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-01")
+        assert avg == 100.0
+
+    def test_ndjson_checksum_matches_csv(self, db_session, seed_curve):
+        ndjson = "\n".join(json.dumps(r) for r in [
+            {"price_date": "2025-02-01", "price": 115, "snapshot_date": "2025-02-01"},
+            {"price_date": "2025-02-02", "price": 116.0, "snapshot_date": "2025-02-01"},
+            {"price_date": "2025-01-01", "price": 100.0, "snapshot_date": "2025-01-31"},
+        ]) + "\n\n"
+        via_csv = ingest_curve_data(db_session, seed_curve.id, io.StringIO(self.CSV), "csv")
+        via_ndjson = ingest_curve_data(db_session, seed_curve.id, io.StringIO(ndjson), "ndjson")
+        assert via_ndjson.rows == 3
+        assert via_ndjson.checksum == via_csv.checksum
+
+    def test_bad_row_rejects_whole_file(self, db_session, seed_curve):
+        from app.models.price_curve import CurveData
+
+        before = db_session.query(CurveData).count()
+        body = "price_date,price,snapshot_date\n2025-03-01,1.0,2025-03-01\n2025-03-02,abc,2025-03-01\n"
+        with pytest.raises(HTTPException) as exc:
+            ingest_curve_data(db_session, seed_curve.id, io.StringIO(body), "csv", batch_size=1)
+        assert exc.value.status_code == 422
+        assert "Line 3" in exc.value.detail
+        assert db_session.query(CurveData).count() == before
+
+    def test_ingest_invalidates_cache(self, db_session, seed_curve):
+        get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+        ingest_curve_data(db_session, seed_curve.id, io.StringIO(self.CSV), "csv")
+        assert curve_cache.stats()["entries"] == 0
+
+    def test_stream_endpoint(self, client, seed_curve):
+        resp = client.post(
+            f"/api/v1/price-curves/{seed_curve.id}/data/stream",
+            content=self.CSV.encode(),
+            headers={"Content-Type": "text/csv"},
+        )
+        assert resp.status_code == 201
+        assert resp.json()["rows"] == 3
+
+    def test_bad_date_is_rejected_before_the_write(self, client, seed_curve):
+        resp = client.post(
+            f"/api/v1/price-curves/{seed_curve.id}/data",
+            json={"data_points": [{"price_date": "2025/01/01", "price": 100.0, "snapshot_date": "2025-01-01"}]},
+        )
+        assert resp.status_code == 422
+        assert "YYYY-MM-DD" in resp.text
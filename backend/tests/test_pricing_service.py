@@ -173,3 +173,197 @@ class TestFinalPricingAndPnF:
         # P&F = (final - provisional) × qty
         expected_pnf = round((final_price - prov_price) * 75000, 2)
         assert pnf == expected_pnf
+
+
+class TestValueAllPositions:
+    def test_bulk_matches_single_shipment_pricing(self, db_session, seed_contracts, seed_curve, seed_formula):
+        from app.services.pricing_service import value_all_positions
+
+        buy, sell = seed_contracts
+        shipments = []
+        for contract, ref, bl_date, qty in [
+            (buy, "SHP-V-001", "2025-01-15", 40000),
+            (sell, "SHP-V-002", "2025-01-18", 60000),
+        ]:
+            shipment = Shipment(
+                reference=ref, contract_id=contract.id,
+                bl_date=bl_date, bl_quantity=qty, status="DELIVERED",
+            )
+            db_session.add(shipment)
+            db_session.flush()
+            db_session.add(Assay(
+                shipment_id=shipment.id, assay_type="PROVISIONAL",
+                fe=62.5, moisture=7.8, sio2=4.7, al2o3=2.3, p=0.09, s=0.015,
+            ))
+            db_session.add(Assay(
+                shipment_id=shipment.id, assay_type="FINAL",
+                fe=62.3, moisture=8.1, sio2=4.4, al2o3=2.4, p=0.075, s=0.018,
+            ))
+            shipments.append((shipment, contract))
+        db_session.commit()
+
+        expected = []
+        for shipment, contract in shipments:
+            prov, _ = compute_provisional_price(db_session, shipment, contract)
+            final, _, pnf = compute_final_price(db_session, shipment, contract)
+            expected.append((prov, final, pnf))
+            shipment.provisional_price = shipment.final_price = shipment.pnf_amount = None
+        db_session.commit()
+
+        result = value_all_positions(db_session)
+        assert result == {"provisional_computed": 2, "final_computed": 2, "errors": []}
+        for (shipment, _), exp in zip(shipments, expected):
+            db_session.refresh(shipment)
+            assert (shipment.provisional_price, shipment.final_price, shipment.pnf_amount) == exp
+
+    def test_batched_prices_equal_scalar_across_formulas(self, db_session, seed_contracts, seed_curve, seed_formula):
+        """Many shipments over two formulas, with missing assay values: same prices as one-by-one pricing."""
+        import random
+        from app.models.contract import Contract
+        from app.models.pricing_formula import PricingFormula, FormulaAdjustment
+        from app.services.pricing_service import value_all_positions
+
+        rng = random.Random(5)
+        other = PricingFormula(name="Alumina heavy", curve_id=seed_curve.id, basis_fe=61.0, fe_rate_per_pct=2.0,
+                               moisture_threshold=9.0, moisture_penalty_per_pct=1.25, fixed_premium=-0.5)
+        db_session.add(other)
+        db_session.flush()
+        db_session.add(FormulaAdjustment(formula_id=other.id, element="Al2O3", threshold=2.2, penalty_per_pct=1.5))
+        contracts = [*seed_contracts, Contract(
+            reference="BUY-ALU", direction="BUY", counterparty="Vale", quantity=500000, delivery_start="2025-01-05",
+            delivery_end="2025-01-31", qp_convention="MONTH_OF_BL", pricing_formula_id=other.id,
+        )]
+        db_session.add(contracts[-1])
+        db_session.flush()
+
+        def value(lo, hi):
+            return None if rng.random() < 0.2 else rng.uniform(lo, hi)
+
+        shipments = []
+        for i in range(30):
+            contract = contracts[i % 3]
+            shipment = Shipment(reference=f"SHP-B-{i:03d}", contract_id=contract.id, bl_date="2025-01-15",
+                                bl_quantity=1000.0 * (i + 1), status="DELIVERED")
+            db_session.add(shipment)
+            db_session.flush()
+            for assay_type in ("PROVISIONAL", "FINAL")[:1 + i % 2]:
+                db_session.add(Assay(
+                    shipment_id=shipment.id, assay_type=assay_type, fe=value(60, 64), moisture=value(6, 10),
+                    sio2=value(3.5, 5.5), al2o3=value(1.8, 3.0), p=value(0.05, 0.11), s=value(0.01, 0.03),
+                ))
+            shipments.append((shipment, contract))
+        db_session.commit()
+
+        expected = []
+        for i, (shipment, contract) in enumerate(shipments):
+            prov, _ = compute_provisional_price(db_session, shipment, contract)
+            final = pnf = None
+            if i % 2:
+                final, _, pnf = compute_final_price(db_session, shipment, contract)
+            expected.append((prov, final, pnf))
+            shipment.provisional_price = shipment.final_price = shipment.pnf_amount = None
+        db_session.commit()
+
+        result = value_all_positions(db_session)
+        assert result == {"provisional_computed": 30, "final_computed": 15, "errors": []}
+        db_session.expire_all()
+        assert [(s.provisional_price, s.final_price, s.pnf_amount) for s, _ in shipments] == expected
+
+    def test_bulk_captures_per_shipment_errors(self, db_session, seed_contracts, seed_curve, seed_formula):
+        from app.services.pricing_service import value_all_positions
+
+        buy, _ = seed_contracts
+        buy.qp_convention = "CUSTOM"  # no offsets → QP cannot be resolved
+        good = Shipment(
+            reference="SHP-V-003", contract_id=seed_contracts[1].id,
+            bl_date="2025-01-18", bl_quantity=60000, status="DELIVERED",
+        )
+        bad = Shipment(
+            reference="SHP-V-004", contract_id=buy.id,
+            bl_date="2025-01-15", bl_quantity=75000, status="DELIVERED",
+        )
+        db_session.add_all([good, bad])
+        db_session.flush()
+        for s in (good, bad):
+            db_session.add(Assay(shipment_id=s.id, assay_type="PROVISIONAL", fe=62.0, moisture=7.5))
+        db_session.commit()
+
+        result = value_all_positions(db_session)
+        assert result["provisional_computed"] == 1
+        assert result["errors"] == ["SHP-V-004 provisional: CUSTOM QP requires start and end offsets"]
+        db_session.refresh(good)
+        assert good.provisional_price is not None
+
+
+class TestBatchFormulaEvaluation:
+    def test_batch_matches_scalar(self, seed_formula, db_session):
+        import numpy as np
+        from app.services.pricing_formula_service import evaluate_formula_batch
+
+        rng = np.random.default_rng(7)
+        n = 500
+        cols = {
+            "qp_average": rng.uniform(95, 125, n),
+            "fe": rng.uniform(60, 64, n),
+            "moisture": rng.uniform(6, 10, n),
+            "sio2": rng.uniform(3.5, 5.5, n),
+            "al2o3": rng.uniform(1.8, 3.0, n),
+            "p": rng.uniform(0.05, 0.11, n),
+            "s": rng.uniform(0.01, 0.03, n),
+        }
+        # Missing values behave like None in the scalar path
+        cols["fe"][::11] = np.nan
+        cols["moisture"][::13] = np.nan
+        cols["p"][::17] = np.nan
+
+        batch = evaluate_formula_batch(seed_formula, **cols)
+
+        def opt(v):
+            return None if np.isnan(v) else float(v)
+
+        for i in range(n):
+            scalar = evaluate_formula(
+                seed_formula,
+                qp_average=float(cols["qp_average"][i]),
+                fe=opt(cols["fe"][i]),
+                moisture=opt(cols["moisture"][i]),
+                assay_values={k: opt(cols[k][i]) for k in ("sio2", "al2o3", "p", "s")},
+            )
+            # Scalar components are rounded to 4 dp; batch components are raw
+            tol = 5e-5 + 1e-9
+            assert abs(batch.total_price[i] - scalar.total_price) <= tol
+            assert abs(batch.fe_adjustment[i] - scalar.fe_adjustment) <= tol
+            assert abs(batch.moisture_penalty[i] - scalar.moisture_penalty) <= tol
+            for element, penalty in batch.impurity_penalties.items():
+                assert abs(penalty[i] - scalar.impurity_penalties.get(element, 0.0)) <= tol
+
+    def test_batch_broadcasts_scalar_qp(self, seed_formula, db_session):
+        from app.services.pricing_formula_service import evaluate_formula_batch
+
+        batch = evaluate_formula_batch(seed_formula, qp_average=110.0, fe=[61.0, 62.0, 63.0])
+        assert batch.total_price.tolist() == [109.5, 111.0, 112.5]
+
+
+class TestFormulaPlanCache:
+    def test_plan_cached_until_update(self, db_session, seed_formula):
+        from app.services import formula_cache
+        from app.services.pricing_formula_service import get_formula_plan, update_formula
+        from app.schemas.pricing_formula import PricingFormulaUpdate
+
+        plan = get_formula_plan(db_session, seed_formula.id)
+        assert get_formula_plan(db_session, seed_formula.id) is plan
+        assert sorted(a.element for a in plan.adjustments) == ["P", "SiO2"]
+        assert formula_cache.stats()["hits"] == 1
+
+        update_formula(db_session, seed_formula.id, PricingFormulaUpdate(fixed_premium=2.0))
+        updated = get_formula_plan(db_session, seed_formula.id)
+        assert updated.version == plan.version + 1
+        assert updated.fixed_premium == 2.0
+        assert evaluate_formula(updated, qp_average=110.0).total_price == 112.0
+
+    def test_plan_matches_orm_evaluation(self, db_session, seed_formula):
+        from app.services.pricing_formula_service import get_formula_plan
+
+        plan = get_formula_plan(db_session, seed_formula.id)
+        kwargs = dict(qp_average=110.0, fe=62.5, moisture=8.5, assay_values={"sio2": 5.0, "p": 0.10})
+        assert evaluate_formula(plan, **kwargs) == evaluate_formula(seed_formula, **kwargs)
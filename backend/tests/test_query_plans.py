@@ -0,0 +1,137 @@
+"""EXPLAIN-based regression tests: hot service queries must use an index.
+
+Every SELECT issued by the service call that filters or joins one of the hot
+tables is re-run under EXPLAIN QUERY PLAN, and each step touching a hot table
+must be an index search/scan rather than a full table scan.
+"""
+
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from app.migrations import run_migrations
+from app.models.shipment import Shipment
+from app.models.assay import Assay
+
+HOT_TABLES = ("curve_data", "shipments", "assays", "mtm_history", "matches")
+
+
+@pytest.fixture(autouse=True)
+def _sqlite_only(db_session):
+    if db_session.get_bind().dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN checks are SQLite-specific")
+
+
+@contextmanager
+def capture_selects(db_session):
+    engine = db_session.get_bind()
+    statements: list[tuple[str, tuple]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+
+def assert_indexed(db_session, statements):
+    conn = db_session.connection().connection.dbapi_connection
+    checked = 0
+    for statement, parameters in statements:
+        hot = [t for t in HOT_TABLES if re.search(rf"\b{t}\b", statement)]
+        if not hot or not re.search(r"\b(WHERE|JOIN)\b", statement):
+            continue  # unfiltered loads of a whole table are allowed to scan
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        for row in plan:
+            detail = row[-1]
+            for table in hot:
+                if re.match(rf"(SCAN|SEARCH) {table}\b", detail):
+                    assert "INDEX" in detail or "PRIMARY KEY" in detail, (
+                        f"{detail!r} is a full scan\n{statement}"
+                    )
+                    checked += 1
+    assert checked, "no hot-table queries were captured"
+
+
+@pytest.fixture
+def priced_book(db_session, seed_contracts, seed_curve, seed_formula):
+    from app.services.pricing_service import compute_provisional_price
+
+    run_migrations(db_session.get_bind())
+    buy, sell = seed_contracts
+    for contract, ref in [(buy, "SHP-Q-001"), (sell, "SHP-Q-002")]:
+        ship = Shipment(reference=ref, contract_id=contract.id, bl_date="2025-01-15",
+                        bl_quantity=30000, status="DELIVERED")
+        db_session.add(ship)
+        db_session.flush()
+        db_session.add(Assay(shipment_id=ship.id, assay_type="PROVISIONAL", fe=62.0, moisture=7.5))
+        db_session.commit()
+        compute_provisional_price(db_session, ship, contract)
+    db_session.execute(text("ANALYZE"))
+    return buy, sell
+
+
+class TestHotQueryPlans:
+    def test_price_curve_service(self, db_session, priced_book, seed_curve):
+        from app.services import curve_cache
+        from app.services.price_curve_service import get_curve_average
+
+        curve_cache.clear()
+        with capture_selects(db_session) as statements:
+            get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31")
+            get_curve_average(db_session, seed_curve.id, "2025-01-01", "2025-01-31", "2025-01-31")
+        assert_indexed(db_session, statements)
+
+    def test_mtm_service(self, db_session, priced_book, seed_curve):
+        from app.services import curve_cache
+        from app.services.mtm_service import run_mtm_for_contract, run_mtm_portfolio, get_mtm_history
+
+        buy, _ = priced_book
+        curve_cache.clear()
+        with capture_selects(db_session) as statements:
+            # 2025-03-01 has no curve point: exercises the latest-price fallbacks
+            run_mtm_for_contract(db_session, buy.id, "2025-03-01")
+            run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+            get_mtm_history(db_session, contract_id=buy.id)
+        assert_indexed(db_session, statements)
+
+    def test_pnl_service(self, db_session, priced_book):
+        from app.services.matching_service import run_fifo_matching
+        from app.services.mtm_service import run_mtm_portfolio
+        from app.services.pnl_service import get_pnl_summary, get_unrealized_pnl
+
+        run_fifo_matching(db_session)
+        run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        with capture_selects(db_session) as statements:
+            get_pnl_summary(db_session)
+            get_unrealized_pnl(db_session)
+        assert_indexed(db_session, statements)
+
+
+class TestListingPlans:
+    def test_deep_pages_seek(self, db_session, priced_book, seed_curve):
+        from app.services.contract_service import list_contracts
+        from app.services.mtm_service import get_mtm_history, run_mtm_portfolio
+        from app.services.pagination import encode_cursor
+        from app.services.price_curve_service import get_curve_data
+
+        run_mtm_portfolio(db_session, "2025-01-20", "2025-01-31")
+        with capture_selects(db_session) as statements:
+            list_contracts(db_session, cursor=encode_cursor(("2025-01-01", 0)), limit=10)
+            get_mtm_history(db_session, cursor=encode_cursor(("2025-12-31", 0)), limit=10)
+            get_curve_data(db_session, seed_curve.id, cursor=encode_cursor(("2025-01-15", "2025-01-31")), limit=10)
+        assert_indexed(db_session, statements)
+
+        conn = db_session.connection().connection.dbapi_connection
+        statement, parameters = next(
+            (s, p) for s, p in statements if "FROM contracts" in s and "LIMIT" in s
+        )
+        plan = " ".join(r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        assert "ix_contracts_delivery_start" in plan
+        assert "TEMP B-TREE" not in plan  # ordered by the index, no sort
@@ -0,0 +1,80 @@
+"""Tests for version-keyed caching of dashboard, exposure and P&L summaries."""
+
+from app.models.contract import Contract
+from app.models.match import Match
+from app.services import result_cache
+from app.services.mtm_service import run_mtm_portfolio
+
+
+class TestVersions:
+    def test_commit_bumps_written_domains(self, db_session, seed_contracts):
+        buy, _ = seed_contracts
+        before = dict(zip(result_cache.DOMAINS, result_cache.versions()))
+        buy.quantity = 80000
+        db_session.commit()
+        after = dict(zip(result_cache.DOMAINS, result_cache.versions()))
+        assert after["contracts"] == before["contracts"] + 1
+        assert {d: v for d, v in after.items() if d != "contracts"} == {
+            d: v for d, v in before.items() if d != "contracts"
+        }
+
+    def test_bulk_statements_bump_and_rollback_does_not(self, db_session, seed_contracts, seed_curve):
+        mtm = result_cache.DOMAINS.index("mtm")
+        before = result_cache.versions()
+        run_mtm_portfolio(db_session, "2025-01-20")  # upserts through session.execute
+        assert result_cache.versions()[mtm] == before[mtm] + 1
+
+        db_session.query(Match).delete()
+        db_session.query(Contract).update({"counterparty": "Rio"})
+        db_session.rollback()
+        assert result_cache.versions()[mtm] == before[mtm] + 1
+        assert result_cache.versions()[:mtm] == before[:mtm]
+
+
+class TestSummaryRoutes:
+    def test_repeat_read_is_a_memory_hit(self, client, seed_contracts, seed_curve):
+        first = client.get("/api/v1/dashboard/summary")
+        again = client.get("/api/v1/dashboard/summary")
+        assert again.json() == first.json()
+        assert int(first.headers["X-DB-Statements"]) > 0
+        assert again.headers["X-DB-Statements"] == "0"
+        assert again.headers["ETag"] == first.headers["ETag"]
+
+    def test_if_none_match(self, client, seed_contracts, seed_curve):
+        tag = client.get("/api/v1/exposure/").headers["ETag"]
+        resp = client.get("/api/v1/exposure/", headers={"If-None-Match": tag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["ETag"] == tag
+        assert resp.headers["X-DB-Statements"] == "0"
+        assert client.get("/api/v1/exposure/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    def test_write_invalidates_dependents_only(self, client, db_session, seed_contracts, seed_curve):
+        buy, _ = seed_contracts
+        exposure = client.get("/api/v1/exposure/")
+        pnl = client.get("/api/v1/pnl/summary")
+
+        client.post("/api/v1/mtm/run", json={"valuation_date": "2025-01-20"})
+        # MTM feeds P&L, not exposure
+        assert client.get("/api/v1/exposure/").headers["ETag"] == exposure.headers["ETag"]
+        refreshed = client.get("/api/v1/pnl/summary")
+        assert refreshed.headers["ETag"] != pnl.headers["ETag"]
+        assert int(refreshed.headers["X-DB-Statements"]) > 0
+
+        resp = client.patch(f"/api/v1/contracts/{buy.id}", json={"quantity": 90000})
+        assert resp.status_code == 200
+        updated = client.get("/api/v1/exposure/")
+        assert updated.headers["ETag"] != exposure.headers["ETag"]
+        buy_side = next(d for d in updated.json()["by_direction"] if d["direction"] == "BUY")
+        assert buy_side["total_open_quantity"] == 90000
+
+    def test_clear_endpoint_drops_cached_results(self, client, db_session, seed_contracts):
+        before = client.get("/api/v1/dashboard/summary")
+        assert before.json()["total_contracts"] == 2
+        db_session.commit()
+
+        assert client.post("/clear").status_code == 200
+        after = client.get("/api/v1/dashboard/summary", headers={"If-None-Match": before.headers["ETag"]})
+        assert after.status_code == 200
+        assert after.json()["total_contracts"] == 0
+        assert client.get("/api/v1/contracts/").json() == []
@@ -0,0 +1,172 @@
+"""Tests for in-memory what-if scenarios."""
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.models.assay import Assay
+from app.models.contract import Contract
+from app.models.mtm import LatestMtm, MtmRecord
+from app.models.price_curve import CurveData, PriceCurve
+from app.models.pricing_formula import PricingFormula
+from app.models.shipment import Shipment
+from app.schemas.scenario import Scenario
+from app.services import result_cache
+from app.services.exposure_service import compute_exposure
+from app.services.mtm_service import run_mtm_portfolio
+from app.services.pricing_service import compute_provisional_price
+from app.services.scenario_service import run_scenarios
+
+VALUATION = ("2025-01-15", "2025-01-31")
+
+
+@pytest.fixture
+def book(db_session, seed_contracts, seed_curve, seed_formula):
+    """Priced open BUY 55k and SELL 50k for January delivery, and a priced BUY 20k for March."""
+    buy, sell = seed_contracts
+    march = Contract(reference="BUY-MAR", direction="BUY", counterparty="Vale", quantity=30000,
+                     delivery_start="2025-03-10", delivery_end="2025-03-31", pricing_formula_id=seed_formula.id)
+    db_session.add(march)
+    db_session.flush()
+    db_session.add_all([
+        Shipment(reference="SHP-SC-1", contract_id=buy.id, bl_quantity=20000, provisional_price=100.0),
+        Shipment(reference="SHP-SC-2", contract_id=sell.id, bl_quantity=10000, provisional_price=115.0),
+        Shipment(reference="SHP-SC-3", contract_id=march.id, bl_quantity=10000, provisional_price=105.0),
+        *(CurveData(curve_id=seed_curve.id, price_date=f"2025-03-{d:02d}", snapshot_date="2025-01-31", price=p)
+          for d, p in ((3, 114.0), (4, 116.0))),
+    ])
+    db_session.commit()
+    return seed_curve
+
+
+@pytest.fixture
+def second_curve(db_session, book):
+    """A 58% Fe curve at a discount, with its own January BUY and March SELL."""
+    curve = PriceCurve(code="TSI_58", name="TSI 58 Fe", currency="USD", uom="DMT")
+    db_session.add(curve)
+    db_session.flush()
+    formula = PricingFormula(name="Standard IO 58", curve_id=curve.id, basis_fe=58.0)
+    db_session.add(formula)
+    db_session.flush()
+    db_session.add_all([
+        *(CurveData(curve_id=curve.id, price_date=f"2025-{m}-{d:02d}", snapshot_date="2025-01-31", price=p)
+          for m, d, p in (("01", 15, 90.0), ("01", 16, 92.0), ("03", 3, 95.0))),
+        Contract(reference="BUY-58-JAN", direction="BUY", counterparty="FMG", quantity=40000,
+                 delivery_start="2025-01-20", delivery_end="2025-01-31", pricing_formula_id=formula.id),
+        Contract(reference="SELL-58-MAR", direction="SELL", counterparty="FMG", quantity=15000,
+                 delivery_start="2025-03-05", delivery_end="2025-03-31", pricing_formula_id=formula.id),
+    ])
+    db_session.flush()
+    sell = db_session.query(Contract).filter_by(reference="SELL-58-MAR").one()
+    db_session.add(Shipment(reference="SHP-SC-58", contract_id=sell.id, bl_quantity=5000, provisional_price=94.0))
+    db_session.commit()
+    return curve
+
+
+@pytest.fixture
+def open_qp(db_session, seed_contracts, seed_curve):
+    """A provisionally priced BUY shipment, BL mid-January: half its QP prices are dated after the 15th."""
+    buy, _ = seed_contracts
+    shipment = Shipment(reference="SHP-QP-1", contract_id=buy.id, bl_date="2025-01-10", bl_quantity=20000)
+    db_session.add(shipment)
+    db_session.flush()
+    db_session.add(Assay(shipment_id=shipment.id, assay_type="PROVISIONAL", fe=61.5, moisture=8.5, sio2=5.0))
+    db_session.commit()
+    compute_provisional_price(db_session, shipment, buy)
+    return shipment
+
+
+def _run(db_session, *scenarios):
+    return run_scenarios(db_session, *VALUATION, [Scenario.model_validate(s) for s in scenarios])
+
+
+class TestScenarios:
+    def test_base_matches_mtm_and_exposure(self, db_session, book):
+        result = _run(db_session, {"name": "flat"})
+        assert result.contracts == 3
+        assert result.scenarios[0].mtm == result.base.mtm
+        assert result.base.mtm == 111.25 * 25000 - (55000 * 100 - 50000 * 115 + 20000 * 105)
+
+        assert result.base.net_exposure_usd == pytest.approx(compute_exposure(db_session).total_net_exposure_usd)
+        assert result.base.mtm == pytest.approx(run_mtm_portfolio(db_session, *VALUATION).total_mtm)
+
+    def test_base_matches_mtm_and_exposure_across_curves(self, db_session, second_curve):
+        result = _run(db_session, {"name": "flat"})
+        assert result.contracts == 5
+        assert result.base.net_exposure_usd == pytest.approx(compute_exposure(db_session).total_net_exposure_usd)
+        assert result.base.mtm == pytest.approx(run_mtm_portfolio(db_session, *VALUATION).total_mtm)
+
+        shocked = _run(db_session, {"name": "58 down", "shocks": [
+            {"kind": "PARALLEL", "value": -5, "curve_id": second_curve.id},
+        ]}).scenarios[0]
+        # Only the March SELL's priced open quantity is on the 58 curve
+        assert shocked.mtm_change == 5 * 10000
+
+    def test_shocks(self, db_session, book):
+        result = _run(
+            db_session,
+            {"name": "down 5", "shocks": [{"kind": "PARALLEL", "value": -5}]},
+            {"name": "down 10%", "shocks": [{"kind": "PERCENT", "value": -10}]},
+            {"name": "steepener", "shocks": [
+                {"kind": "TENOR", "tenors": [{"months": 0, "shift": 0}, {"months": 4, "shift": 8}]},
+            ]},
+            {"name": "other curve", "shocks": [{"kind": "PARALLEL", "value": -5, "curve_id": book.id + 1}]},
+        )
+        down, pct, steep, other = result.scenarios
+        # MTM moves with the net priced open quantity, exposure with the net open quantity
+        assert down.mtm_change == -5 * 25000
+        assert down.exposure_change == -5 * 25000
+        assert down.total_pnl == result.realized_pnl + down.mtm + down.pnf
+        assert pct.mtm_change == pytest.approx(-0.1 * 111.25 * 25000)
+        assert pct.exposure_change == pytest.approx(-0.1 * result.base.net_exposure_usd)
+        # Only the March BUY is two months out: +4
+        assert steep.mtm_change == steep.exposure_change == 4 * 20000
+        assert other.mtm_change == other.exposure_change == 0
+
+    def test_pnf_on_open_qp(self, db_session, open_qp):
+        result = _run(
+            db_session,
+            {"name": "down 5", "shocks": [{"kind": "PARALLEL", "value": -5}]},
+            {"name": "up 10%", "shocks": [{"kind": "PERCENT", "value": 10}]},
+        )
+        assert result.open_qp_shipments == 1
+        # Provisional priced off today's curve: nothing to settle until it moves
+        assert result.base.pnf == pytest.approx(0, abs=1)
+        down, up = result.scenarios
+        # 15 of the QP's 30 prices still float: the final price moves by half the shock, paid on a BUY
+        assert down.pnf_change == pytest.approx(2.5 * 20000)
+        assert up.pnf_change < 0
+        assert down.total_pnl == pytest.approx(result.realized_pnl + down.mtm + down.pnf, abs=0.01)
+
+    def test_fixed_or_final_qp_has_no_pnf(self, db_session, open_qp):
+        shock = {"name": "down 5", "shocks": [{"kind": "PARALLEL", "value": -5}]}
+        # Valued after the QP ends, every price is fixed
+        after = run_scenarios(db_session, "2025-02-01", "2025-01-31", [Scenario.model_validate(shock)])
+        assert after.open_qp_shipments == 0
+        open_qp.final_price = open_qp.provisional_price
+        db_session.commit()
+        assert _run(db_session, shock).open_qp_shipments == 0
+
+    def test_writes_nothing(self, db_session, book):
+        versions = result_cache.versions()
+        _run(db_session, *({"name": f"s{i}", "shocks": [{"kind": "PARALLEL", "value": i}]} for i in range(200)))
+        assert db_session.query(MtmRecord).count() == 0
+        assert db_session.query(LatestMtm).count() == 0
+        assert result_cache.versions() == versions
+
+    def test_validation(self, db_session, book, monkeypatch):
+        with pytest.raises(HTTPException) as exc:
+            _run(db_session, {"name": "bad", "shocks": [{"kind": "TENOR"}]})
+        assert exc.value.status_code == 422
+        monkeypatch.setattr(settings, "SCENARIO_MAX", 2)
+        with pytest.raises(HTTPException) as exc:
+            _run(db_session, *({"name": str(i)} for i in range(3)))
+        assert exc.value.status_code == 422
+
+    def test_route(self, client, book):
+        resp = client.post("/api/v1/scenarios/run", json={
+            "valuation_date": VALUATION[0], "snapshot_date": VALUATION[1],
+            "scenarios": [{"name": "TSI -5", "shocks": [{"kind": "PARALLEL", "value": -5}]}],
+        })
+        assert resp.status_code == 200
+        assert [s["mtm_change"] for s in resp.json()["scenarios"]] == [-125000]
@@ -6,7 +6,7 @@ const BASE = '/api/v1/assays'
 export const assaysApi = {
   list: (shipmentId?: number) => {
     const qs = shipmentId ? `?shipment_id=${shipmentId}` : ''
-    return api.get<AssayOut[]>(`${BASE}${qs}`)
+    return api.getAll<AssayOut>(`${BASE}${qs}`)
   },
   get: (id: number) => api.get<AssayOut>(`${BASE}/${id}`),
   create: (data: AssayCreate) => api.post<AssayOut>(BASE, data),
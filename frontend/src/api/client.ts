@@ -13,8 +13,28 @@ async function request<T>(url: string, options?: RequestInit): Promise<T> {
   return res.json()
 }
 
+// Follows the X-Next-Cursor header of paginated list endpoints and
+// returns every page concatenated.
+async function requestAll<T>(url: string, pageSize = 1000): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | null = null
+  do {
+    const params = new URLSearchParams({ limit: String(pageSize) })
+    if (cursor) params.set('cursor', cursor)
+    const res = await fetch(`${BASE}${url}${url.includes('?') ? '&' : '?'}${params}`)
+    if (!res.ok) {
+      const body = await res.json().catch(() => ({ detail: res.statusText }))
+      throw new Error(body.detail || res.statusText)
+    }
+    items.push(...((await res.json()) as T[]))
+    cursor = res.headers.get('X-Next-Cursor')
+  } while (cursor)
+  return items
+}
+
 export const api = {
   get: <T>(url: string) => request<T>(url),
+  getAll: <T>(url: string) => requestAll<T>(url),
   post: <T>(url: string, data?: unknown) =>
     request<T>(url, { method: 'POST', body: data ? JSON.stringify(data) : undefined }),
   patch: <T>(url: string, data: unknown) =>
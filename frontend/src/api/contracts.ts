@@ -9,7 +9,7 @@ export const contractsApi = {
     if (direction) params.set('direction', direction)
     if (status) params.set('status', status)
     const qs = params.toString()
-    return api.get<ContractOut[]>(`${BASE}${qs ? `?${qs}` : ''}`)
+    return api.getAll<ContractOut>(`${BASE}${qs ? `?${qs}` : ''}`)
   },
   get: (id: number) => api.get<ContractOut>(`${BASE}/${id}`),
   create: (data: ContractCreate) => api.post<ContractOut>(BASE, data),
@@ -11,7 +11,7 @@ export const mtmApi = {
     if (contractId) params.set('contract_id', String(contractId))
     if (valuationDate) params.set('valuation_date', valuationDate)
     const qs = params.toString()
-    return api.get<MtmRecordOut[]>(`${BASE}/history${qs ? `?${qs}` : ''}`)
+    return api.getAll<MtmRecordOut>(`${BASE}/history${qs ? `?${qs}` : ''}`)
   },
   portfolio: (valuationDate?: string) => {
     const qs = valuationDate ? `?valuation_date=${valuationDate}` : ''
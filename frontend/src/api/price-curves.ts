@@ -15,7 +15,7 @@ export const priceCurvesApi = {
     if (startDate) params.set('start_date', startDate)
     if (endDate) params.set('end_date', endDate)
     const qs = params.toString()
-    return api.get<CurveDataOut[]>(`${BASE}/${id}/data${qs ? `?${qs}` : ''}`)
+    return api.getAll<CurveDataOut>(`${BASE}/${id}/data${qs ? `?${qs}` : ''}`)
   },
   getAverage: (id: number, startDate: string, endDate: string) =>
     api.get<CurveAverageResponse>(`${BASE}/${id}/average?start_date=${startDate}&end_date=${endDate}`),
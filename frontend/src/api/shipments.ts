@@ -6,7 +6,7 @@ const BASE = '/api/v1/shipments'
 export const shipmentsApi = {
   list: (contractId?: number) => {
     const qs = contractId ? `?contract_id=${contractId}` : ''
-    return api.get<ShipmentOut[]>(`${BASE}${qs}`)
+    return api.getAll<ShipmentOut>(`${BASE}${qs}`)
   },
   get: (id: number) => api.get<ShipmentOut>(`${BASE}/${id}`),
   create: (data: ShipmentCreate) => api.post<ShipmentOut>(BASE, data),
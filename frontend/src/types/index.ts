@@ -272,6 +272,7 @@ export interface MtmRecordOut {
   id: number
   contract_id: number
   valuation_date: string
+  snapshot_date: string
   curve_price: number
   contract_price: number
   open_quantity: number